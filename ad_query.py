@@ -0,0 +1,152 @@
+import re
+import time
+
+DEFAULT_RESULT_PAGE_SIZE = 1000
+SEARCH_SCOPES = ("Subtree", "OneLevel", "Base")
+OUTPUT_FORMATS = ("csv", "json")
+
+# Seconds between 1601-01-01, where Windows FILETIMEs start, and the Unix epoch
+FILETIME_EPOCH_OFFSET = 11644473600
+DN_REGEX = re.compile(r"^\s*[A-Za-z]+=(\\.|[^,\\])+(\s*,\s*[A-Za-z]+=(\\.|[^,\\])+)*\s*$")
+
+ACCOUNT_DISABLED = "(userAccountControl:1.2.840.113556.1.4.803:=2)"
+SECURITY_GROUP = "(groupType:1.2.840.113556.1.4.803:=2147483648)"
+
+# Conditions become LDAP clauses that the domain controller evaluates, so only
+# matching objects cross the wire. "{value}" is escaped user input; "{days}"
+# becomes the FILETIME that many days ago, since lastLogonTimestamp is stored as one.
+AD_OBJECT_TYPES = {
+    "Users": {
+        "cmdlet": "Get-ADUser",
+        # Returned by Get-ADUser without -Properties
+        "default_properties": ("DistinguishedName", "Enabled", "GivenName", "Name", "ObjectClass", "ObjectGUID",
+                               "SamAccountName", "SID", "Surname", "UserPrincipalName"),
+        "properties": ("Name", "SamAccountName", "Enabled", "LastLogonDate", "mail", "Department", "Title",
+                       "PasswordLastSet", "LockedOut", "whenCreated", "DistinguishedName"),
+        "selected": ("Name", "SamAccountName", "Enabled", "LastLogonDate"),
+        "conditions": {
+            "Enabled": f"(!{ACCOUNT_DISABLED})",
+            "Disabled": ACCOUNT_DISABLED,
+            "Locked out": "(lockoutTime>=1)",
+            "Password never expires": "(userAccountControl:1.2.840.113556.1.4.803:=65536)",
+            "No logon for N days": "(lastLogonTimestamp<={days})",
+            "Name starts with": "(name={value}*)",
+            "Department is": "(department={value})",
+            "Member of group (DN)": "(memberOf={value})",
+        },
+    },
+    "Groups": {
+        "cmdlet": "Get-ADGroup",
+        "default_properties": ("DistinguishedName", "GroupCategory", "GroupScope", "Name", "ObjectClass",
+                               "ObjectGUID", "SamAccountName", "SID"),
+        "properties": ("Name", "GroupCategory", "GroupScope", "Description", "ManagedBy", "whenCreated",
+                       "DistinguishedName"),
+        "selected": ("Name", "GroupCategory", "GroupScope"),
+        "conditions": {
+            "Security groups": SECURITY_GROUP,
+            "Distribution groups": f"(!{SECURITY_GROUP})",
+            "No members": "(!(member=*))",
+            "Name starts with": "(name={value}*)",
+        },
+    },
+    "Computers": {
+        "cmdlet": "Get-ADComputer",
+        "default_properties": ("DistinguishedName", "DNSHostName", "Enabled", "Name", "ObjectClass", "ObjectGUID",
+                               "SamAccountName", "SID", "UserPrincipalName"),
+        "properties": ("Name", "DNSHostName", "Enabled", "OperatingSystem", "OperatingSystemVersion",
+                       "LastLogonDate", "IPv4Address", "whenCreated", "DistinguishedName"),
+        "selected": ("Name", "Enabled", "OperatingSystem", "LastLogonDate"),
+        "conditions": {
+            "Enabled": f"(!{ACCOUNT_DISABLED})",
+            "Disabled": ACCOUNT_DISABLED,
+            "No logon for N days": "(lastLogonTimestamp<={days})",
+            "Name starts with": "(name={value}*)",
+            "Operating system starts with": "(operatingSystem={value}*)",
+        },
+    },
+}
+
+
+def condition_input(template):
+    """What a condition needs from the user: "days", "value" or None."""
+    if "{days}" in template:
+        return "days"
+    if "{value}" in template:
+        return "value"
+    return None
+
+
+def escape_ldap(value):
+    # RFC 4515: these characters can't appear literally in a filter value
+    return "".join(f"\\{ord(char):02x}" if char in "\\*()\0" else char for char in value)
+
+
+def days_ago_filetime(days, now=None):
+    now = time.time() if now is None else now
+    return int((now - days * 86400 + FILETIME_EPOCH_OFFSET) * 10 ** 7)
+
+
+def quote_ps(value):
+    # Single-quoted PowerShell strings have no escapes except a doubled quote
+    return "'" + value.replace("'", "''") + "'"
+
+
+def build_ldap_filter(object_type, conditions, now=None):
+    """ANDs the chosen conditions into one LDAP filter; `conditions` maps labels to their inputs."""
+    templates = AD_OBJECT_TYPES[object_type]["conditions"]
+    clauses = []
+    for label, value in conditions.items():
+        template = templates[label]
+        needs = condition_input(template)
+        if needs == "days":
+            days = int(value)
+            if days < 1:
+                raise ValueError(f"{label}: days must be at least 1")
+            clauses.append(template.format(days=days_ago_filetime(days, now)))
+        elif needs == "value":
+            value = str(value).strip()
+            if not value:
+                raise ValueError(f"{label}: enter a value")
+            clauses.append(template.format(value=escape_ldap(value)))
+        else:
+            clauses.append(template)
+    if not clauses:
+        return "(name=*)"
+    return clauses[0] if len(clauses) == 1 else "(&" + "".join(clauses) + ")"
+
+
+def build_ad_query(object_type, conditions=None, search_base="", scope="Subtree", properties=None,
+                   page_size=DEFAULT_RESULT_PAGE_SIZE, result_size=None, output="csv", now=None):
+    """A Get-AD* command that filters and pages on the domain controller.
+
+    Only properties outside the cmdlet's default set are requested with
+    -Properties. CSV output comes from ConvertTo-Csv; JSON output is one
+    compressed object per line, so neither PowerShell nor the viewer has to
+    hold the whole result to convert it.
+    """
+    spec = AD_OBJECT_TYPES[object_type]
+    if scope not in SEARCH_SCOPES:
+        raise ValueError(f"Unknown search scope: {scope}")
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output}")
+    if search_base and not DN_REGEX.match(search_base):
+        raise ValueError(f"Search base is not a distinguished name: {search_base}")
+    if not 1 <= page_size <= 100000:
+        raise ValueError("Page size must be between 1 and 100000")
+    properties = list(properties or spec["selected"])
+
+    parts = [spec["cmdlet"], "-LDAPFilter", quote_ps(build_ldap_filter(object_type, conditions or {}, now))]
+    if search_base:
+        parts += ["-SearchBase", quote_ps(search_base.strip())]
+    if search_base or scope != "Subtree":
+        parts += ["-SearchScope", scope]
+    parts += ["-ResultPageSize", str(page_size)]
+    if result_size:
+        parts += ["-ResultSetSize", str(result_size)]
+    extra = [name for name in properties if name.lower() not in {p.lower() for p in spec["default_properties"]}]
+    if extra:
+        parts += ["-Properties", ",".join(extra)]
+    command = " ".join(parts) + " | Select-Object " + ",".join(properties)
+    if output == "json":
+        return command + " | ForEach-Object { $_ | ConvertTo-Json -Compress -Depth 2 }"
+    return command + " | ConvertTo-Csv -NoTypeInformation"
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from shared_state import SharedState, open_kv
+
+DEFAULT_CACHE_PATH = os.environ.get("ANSWER_CACHE_DB", ".cache/answer_cache.db")
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+def normalize_question(question):
+    # "Flush DNS?" and "  flush   dns " should share one cache entry
+    question = question.strip().lower()
+    question = re.sub(r"\s+", " ", question)
+    return question.rstrip("?.! ")
+
+
+def make_cache_key(question, prompt_template, generation_config):
+    payload = json.dumps(
+        {
+            "question": normalize_question(question),
+            "prompt": prompt_template,
+            "config": generation_config,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Two-tier answer cache: in-process LRU with TTL in front of the shared store.
+
+    Answers are written to the backend in batches, so every process using
+    the same ANSWER_CACHE_DB sees them within a flush interval.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 kv=None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Keys are content hashes, so a cached answer never goes stale except by TTL
+        self._shared = SharedState(kv or open_kv(db_path=db_path), "answers", read_ttl=None,
+                                   max_entries=max_entries)
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+        }
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key):
+        now = time.time()
+        entry = self._shared.peek(key)
+        source = "memory_hits"
+        if entry is None:
+            entry = self._shared.get(key)
+            source = "disk_hits"
+        with self._lock:
+            if entry is not None and self._expired(entry["created_at"], now):
+                self._stats["expired"] += 1
+                entry = None
+                expired = True
+            else:
+                expired = False
+            if entry is None:
+                self._stats["misses"] += 1
+                result = None
+            else:
+                self._stats["hits"] += 1
+                self._stats[source] += 1
+                result = dict(entry["response"])
+        if expired:
+            self._shared.delete(key)
+        return result
+
+    def contains(self, key):
+        # A lookup that leaves the hit and miss counts alone, for the prefetcher
+        entry = self._shared.get(key)
+        return entry is not None and not self._expired(entry["created_at"], time.time())
+
+    def put(self, key, question, response):
+        self._shared.put(key, {"question": question, "response": dict(response), "created_at": time.time()})
+
+    def flush(self):
+        # Short-lived processes (batch.py) call this so their answers reach the shared store
+        self._shared.flush()
+
+    def clear(self):
+        self._shared.clear()
+
+    def stats(self):
+        shared = self._shared.stats()
+        with self._lock:
+            stats = dict(self._stats)
+        stats["evictions"] = shared["evictions"] + stats.pop("expired")
+        stats["memory_entries"] = shared["local_entries"]
+        stats["disk_entries"] = shared["backend_entries"]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.completed = False
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one upstream call.
+
+    If the leader is interrupted (a Streamlit rerun or stop is a
+    BaseException), waiting followers retry, and one of them leads instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _InFlightCall()
+                    self._calls[key] = call
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                break
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            if call.completed:
+                return call.result
+
+        try:
+            call.result = fn()
+            call.completed = True
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,262 @@
+"""Headless batch mode: answer a file of questions without the Streamlit UI.
+
+Usage:
+    python batch.py questions.txt -o answers.jsonl --concurrency 4
+    python batch.py --warm-catalog -o .cache/catalog_answers.jsonl
+
+Questions are read one per line (blank lines and lines starting with "#"
+are skipped) or, for .jsonl input, from each object's "question" field.
+Results are appended to the output file as they finish, so an interrupted
+run picks up where it left off when started again. Questions that failed
+are retried on the next run, and the output is then rewritten so each
+question keeps only its latest record.
+
+--warm-catalog answers every question the sidebar can ask, so the shared
+answer cache already holds them when users pick a command.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from answer_cache import AnswerCache, make_cache_key
+from command_catalog import catalog_questions
+from command_assistant import (
+    MODEL_NAME,
+    INVALID_INPUT_RESPONSE,
+    generation_config,
+    ask_model,
+    estimate_tokens,
+    is_valid_question,
+    prompt_settings,
+)
+from scheduler import GeminiScheduler, PRIORITY_BATCH, is_quota_error
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+
+def read_questions(path):
+    path = Path(path)
+    questions = []
+    with path.open(encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.suffix == ".jsonl":
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{number}: not valid JSON ({e.msg})") from e
+                if isinstance(record, dict):
+                    if not isinstance(record.get("question"), str):
+                        raise ValueError(f"{path}:{number}: no \"question\" field")
+                    line = record["question"]
+                else:
+                    line = str(record)
+            questions.append(line)
+    return questions
+
+
+def scan_output(output_path):
+    """The status of each question's latest record in a previous run's output.
+
+    Also says whether the file needs compacting: it has damaged lines or
+    more than one record for some question.
+    """
+    latest = {}
+    records = damaged = 0
+    output_path = Path(output_path)
+    if not output_path.exists():
+        return latest, False
+    with output_path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                question = record["question"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                # A run killed mid-write can leave a truncated last line
+                damaged += 1
+                continue
+            records += 1
+            latest[question] = record.get("status")
+    return latest, damaged > 0 or records > len(latest)
+
+
+def compact_output(output_path):
+    """Rewrites the output keeping only each question's latest record, in the order they were written."""
+    output_path = Path(output_path)
+    last_line = {}
+    with output_path.open(encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            try:
+                last_line[json.loads(line)["question"]] = number
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+    keep = set(last_line.values())
+    temporary = output_path.with_name(output_path.name + ".tmp")
+    with output_path.open(encoding="utf-8") as f, temporary.open("w", encoding="utf-8") as out:
+        for number, line in enumerate(f):
+            if number in keep:
+                out.write(line if line.endswith("\n") else line + "\n")
+    # Readers never see a half-written file
+    os.replace(temporary, output_path)
+
+
+def answer_question(model, question, cache=None, retries=DEFAULT_RETRIES,
+                    backoff=DEFAULT_BACKOFF_SECONDS, sleep=time.sleep, scheduler=None, structured=False):
+    started = time.monotonic()
+    record = {"question": question}
+
+    if not is_valid_question(question):
+        record.update(INVALID_INPUT_RESPONSE, status="invalid", attempts=0)
+        return record
+
+    cache_key = make_cache_key(question, *prompt_settings(structured))
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            record.update(cached, status="ok", attempts=0, cached=True,
+                          elapsed=round(time.monotonic() - started, 3))
+            return record
+
+    for attempt in range(1, retries + 2):
+        try:
+            if scheduler is None:
+                result = ask_model(model, question, structured=structured)
+            else:
+                # Retries are counted here, so the scheduler makes one call per attempt
+                result = scheduler.run(lambda: ask_model(model, question, structured=structured), session_id="batch",
+                                       priority=PRIORITY_BATCH, tokens=estimate_tokens(question, structured),
+                                       max_retries=0)
+        except Exception as e:
+            if attempt > retries:
+                record.update(command=None, explanation=f"Error: {e}", status="error", attempts=attempt)
+                break
+            # The scheduler already holds every caller back after a quota error
+            if scheduler is None or not is_quota_error(e):
+                # Exponential backoff with jitter so parallel workers do not retry in lockstep
+                sleep(backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+            continue
+
+        if result["command"] and cache is not None:
+            cache.put(cache_key, question, result)
+        record.update(result, status="ok" if result["command"] else "unparsed", attempts=attempt)
+        break
+
+    record["elapsed"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def run_batch(questions, model, output_path, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES,
+              backoff=DEFAULT_BACKOFF_SECONDS, cache=None, sleep=time.sleep, on_result=None, scheduler=None,
+              structured=False):
+    latest, needs_compaction = scan_output(output_path)
+    completed = {question for question, status in latest.items() if status in ("ok", "invalid")}
+    pending = []
+    for question in questions:
+        if question not in completed:
+            pending.append(question)
+            # Duplicates in the input are answered once
+            completed.add(question)
+    # Failed questions from a previous run get a new record that replaces the old one
+    retried = any(question in latest for question in pending)
+
+    summary = {"total": len(questions), "skipped": len(questions) - len(pending), "ok": 0,
+               "invalid": 0, "unparsed": 0, "error": 0, "cached": 0, "api_calls": 0}
+    if not pending:
+        if needs_compaction:
+            compact_output(output_path)
+        return summary
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    write_lock = threading.Lock()
+    unfinished = False
+    if Path(output_path).exists() and Path(output_path).stat().st_size:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            unfinished = f.read(1) != b"\n"
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if unfinished:
+            # Don't let the first record run on from a line a killed run left unfinished
+            out.write("\n")
+        futures = [
+            pool.submit(answer_question, model, question, cache, retries, backoff, sleep, scheduler, structured)
+            for question in pending
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            with write_lock:
+                out.write(json.dumps(record) + "\n")
+                # Flush per record so progress survives an interrupted run
+                out.flush()
+            summary[record["status"]] += 1
+            summary["cached"] += bool(record.get("cached"))
+            # Every attempt is a request against the API quota, failed ones included
+            summary["api_calls"] += record.get("attempts", 0)
+            if on_result is not None:
+                on_result(record)
+    if retried or needs_compaction:
+        compact_output(output_path)
+    return summary
+
+
+def create_model():
+    import google.generativeai as genai
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        sys.exit("No API key found. Please set GEMINI_API_KEY in environment variables or .env")
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name=MODEL_NAME, generation_config=generation_config)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a file of Windows command questions in bulk.")
+    parser.add_argument("input", nargs="?",
+                        help="questions file (.txt, one per line, or .jsonl with a 'question' field)")
+    parser.add_argument("--warm-catalog", action="store_true",
+                        help="answer every sidebar question instead of reading an input file")
+    parser.add_argument("-o", "--output", default="answers.jsonl", help="JSONL results file (appended to, resumable)")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="maximum requests in flight")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="retries per question on errors")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF_SECONDS, help="initial retry delay in seconds")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or fill the shared answer cache")
+    parser.add_argument("--structured", action="store_true", help="request JSON output instead of free text")
+    args = parser.parse_args(argv)
+    if bool(args.input) == args.warm_catalog:
+        parser.error("give either a questions file or --warm-catalog")
+    if args.warm_catalog and args.no_cache:
+        parser.error("--warm-catalog fills the answer cache, so it can't be combined with --no-cache")
+
+    try:
+        questions = catalog_questions() if args.warm_catalog else read_questions(args.input)
+    except ValueError as e:
+        parser.error(str(e))
+    cache = None if args.no_cache else AnswerCache()
+
+    def report(record):
+        print(f"[{record['status']}] {record['question']}", file=sys.stderr)
+
+    # Same per-minute limits as the app, so a batch run does not trip the API quota
+    scheduler = GeminiScheduler(max_concurrent=args.concurrency)
+    summary = run_batch(questions, create_model(), args.output, concurrency=args.concurrency,
+                        retries=args.retries, backoff=args.backoff, cache=cache, on_result=report,
+                        scheduler=scheduler, structured=args.structured)
+    if cache is not None:
+        cache.flush()
+    print(json.dumps(summary))
+    return 0 if summary["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Script run timings for the interactions that used to block.
+
+Usage:
+    python benchmarks/bench_blocking.py [--latency 0.2]
+
+Drives main.py through AppTest against benchmarks/fake_gemini.py: asking a
+question, adding a favorite, starting the System Monitor, and running a
+diagnostic report and a workflow on replayed outputs. Prints each
+interaction's run time, which stays short now that feedback and refresh
+timers live in the browser or in st.fragment(run_every=...) instead of
+time.sleep on the script thread. tests/test_no_blocking_sleep.py checks
+that no script run sleeps.
+
+Exits non-zero if the app shows an exception.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BENCHMARKS = Path(__file__).resolve().parent
+
+
+def interactions(at):
+    yield "first run", lambda: at.run()
+    yield "ask a question", lambda: at.text_input(key="question_input").input(
+        "explain dhcp lease renewal settings").run()
+    yield "add a favorite", lambda: next(b for b in at.button if b.label == "⭐ Favorite").click().run()
+
+    def start_monitor():
+        at.selectbox(key="monitor_source").select("Simulated").run()
+        metrics = next(m for m in at.multiselect if m.label == "Select Metrics")
+        metrics.select(metrics.options[0]).run()
+        next(b for b in at.button if b.label == "Start Monitoring").click().run()
+
+    yield "start the system monitor", start_monitor
+    yield "rerun while monitoring", lambda: at.run()
+
+    def diagnostic_report():
+        at.selectbox(key="diagnostic_target").select("Recorded outputs (replay)").run()
+        report = next(m for m in at.multiselect if m.label == "Select Diagnostic Tools to Run")
+        report.select(report.options[0]).run()
+        next(b for b in at.button if b.label == "Generate Diagnostic Report").click().run()
+
+    yield "run a diagnostic report", diagnostic_report
+
+    def workflow():
+        at.selectbox(key="workflow_target").select("Recorded outputs (replay)").run()
+        at.button(key="run_workflow").click().run()
+
+    yield "run a workflow", workflow
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the app's script runs for common interactions.")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Gemini seconds per reply")
+    args = parser.parse_args(argv)
+
+    sys.path[:0] = [str(REPO_ROOT), str(BENCHMARKS)]
+    os.chdir(REPO_ROOT)
+    passed = True
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            GEMINI_API_KEY="benchmark-key",
+            FAKE_GEMINI_LATENCY=str(args.latency),
+            ANSWER_CACHE_DB=":memory:",
+            SEMANTIC_CACHE_INDEX="",
+            METRICS_PROM_FILE="",
+            COMMAND_HISTORY_DB=os.path.join(tmp, "history.db"),
+            SHARED_STATE_DB=os.path.join(tmp, "shared_state.db"),
+        )
+        import fake_gemini
+        from streamlit.testing.v1 import AppTest
+
+        fake_gemini.install()
+        at = AppTest.from_file(str(REPO_ROOT / "main.py"), default_timeout=120)
+        for label, interact in interactions(at):
+            started = time.perf_counter()
+            interact()
+            elapsed = time.perf_counter() - started
+            errors = [str(e.value) for e in at.exception]
+            passed &= not errors
+            print(f"{'ok  ' if not errors else 'FAIL'} {label:28} {elapsed * 1000:7.0f} ms"
+                  + (f"  exception: {errors[0]}" if errors else ""))
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
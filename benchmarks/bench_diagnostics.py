@@ -0,0 +1,114 @@
+"""Diagnostic engine benchmark.
+
+Usage:
+    python benchmarks/bench_diagnostics.py [--commands 8] [--duration 0.5] [--workers 8]
+
+Runs a set of replayed diagnostics that each take --duration seconds and
+checks that they overlap: with enough workers, the whole set should finish
+in about one duration. A hanging command must come back as a timeout, an
+oversized one as truncated, and a second run must be served from the cache.
+Where a POSIX shell is available the same checks are repeated against real
+subprocesses. Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from diagnostics import LocalExecutor, ReplayExecutor, ResultCache, run_diagnostics  # noqa: E402
+
+# Wall time allowed on top of one command's duration for the whole parallel run
+OVERHEAD_TOLERANCE = 0.5
+
+
+def collect(events):
+    results = {}
+    chunks = {}
+    first_output = None
+    started = time.perf_counter()
+    for kind, name, payload in events:
+        if kind == "output":
+            chunks[name] = chunks.get(name, 0) + 1
+            if first_output is None:
+                first_output = time.perf_counter() - started
+        else:
+            results[name] = payload
+    return results, chunks, first_output, time.perf_counter() - started
+
+
+def check(label, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {label:32} {detail}")
+    return ok
+
+
+def replay_checks(args):
+    recordings = {f"diag {i}": {"output": f"line {i}\n" * 50, "exit_code": 0, "duration": args.duration}
+                  for i in range(args.commands)}
+    recordings["hang"] = {"output": "partial\n" * 10, "exit_code": 0, "duration": 3600}
+    recordings["flood"] = {"output": "x" * 100_000, "exit_code": 0, "duration": 0.1}
+    executor = ReplayExecutor(recordings)
+    cache = ResultCache()
+    commands = {name: name for name in recordings if name.startswith("diag")}
+
+    results, chunks, first_output, elapsed = collect(
+        run_diagnostics(commands, executor, cache=cache, max_workers=args.workers, timeout=5))
+    passed = check("replay: all commands ok", all(r["status"] == "ok" for r in results.values()),
+                   f"{len(results)} results")
+    passed &= check("replay: ran in parallel", elapsed < args.duration + OVERHEAD_TOLERANCE,
+                    f"{elapsed:.2f}s wall for {args.commands} x {args.duration}s")
+    passed &= check("replay: output streamed", first_output is not None and first_output < args.duration,
+                    f"first chunk after {first_output:.2f}s, {sum(chunks.values())} chunks")
+
+    results, _, _, elapsed = collect(run_diagnostics(commands, executor, cache=cache, max_workers=args.workers))
+    passed &= check("replay: second run cached", all(r["cached"] for r in results.values()) and elapsed < 0.05,
+                    f"{elapsed * 1000:.1f}ms")
+
+    results, _, _, elapsed = collect(run_diagnostics({"hang": "hang", "flood": "flood"}, executor,
+                                                     timeout=0.5, max_output_bytes=10_000))
+    passed &= check("replay: hang times out", results["hang"]["status"] == "timeout", f"{elapsed:.2f}s wall")
+    passed &= check("replay: flood truncated", results["flood"]["truncated"]
+                    and len(results["flood"]["output"]) <= 10_000, f"{len(results['flood']['output'])} chars kept")
+    return passed
+
+
+def local_checks(args):
+    commands = {f"sleep {i}": f"echo start; sleep {args.duration}; echo done {i}" for i in range(args.commands)}
+    results, _, first_output, elapsed = collect(
+        run_diagnostics(commands, LocalExecutor(), max_workers=args.workers, timeout=5))
+    passed = check("local: all commands ok", all(r["status"] == "ok" for r in results.values()),
+                   f"{len(results)} results")
+    passed &= check("local: ran in parallel", elapsed < args.duration + OVERHEAD_TOLERANCE,
+                    f"{elapsed:.2f}s wall for {args.commands} x {args.duration}s")
+    passed &= check("local: output streamed", first_output is not None and first_output < args.duration,
+                    f"first chunk after {first_output:.2f}s")
+
+    results, _, _, elapsed = collect(run_diagnostics(
+        {"hang": "echo partial; sleep 60", "flood": "yes", "missing": "no-such-command-here"},
+        LocalExecutor(), timeout=0.5, max_output_bytes=10_000))
+    passed &= check("local: hang killed at timeout", results["hang"]["status"] == "timeout"
+                    and "partial" in results["hang"]["output"], f"{elapsed:.2f}s wall")
+    passed &= check("local: flood truncated", results["flood"]["truncated"]
+                    and len(results["flood"]["output"]) <= 10_000, f"{len(results['flood']['output'])} chars kept")
+    passed &= check("local: missing command failed", results["missing"]["status"] == "failed",
+                    f"exit code {results['missing']['exit_code']}")
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the diagnostic engine's concurrency, timeouts and caps.")
+    parser.add_argument("--commands", type=int, default=8, help="diagnostics to run at once")
+    parser.add_argument("--duration", type=float, default=0.5, help="seconds each diagnostic takes")
+    parser.add_argument("--workers", type=int, default=8, help="parallel workers")
+    args = parser.parse_args(argv)
+
+    passed = replay_checks(args)
+    if os.name == "posix":
+        passed &= local_checks(args)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
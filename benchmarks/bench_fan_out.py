@@ -0,0 +1,128 @@
+"""Remote fan-out benchmark.
+
+Usage:
+    python benchmarks/bench_fan_out.py [--hosts 200] [--workers 16] [--timeout 0.5]
+
+Runs a command on --hosts hosts through remote_exec.fan_out with
+FakeTransport. Each host answers after a stable latency of 20-200 ms. A few
+hosts fail, never answer or can't be reached. Checks:
+
+  results      one result per host, with the status its behaviour calls for
+  ordering     with a worker per host, results arrive fastest first and the
+               first one doesn't wait for the slow or hung hosts
+  timeouts     hung hosts come back as timeouts after about --timeout
+               seconds, and the run ends long before they would answer
+  queueing     with fewer workers than hosts, the timeout clock starts when a
+               worker picks a host up, so queued hosts don't time out
+  pool reuse   a second run reuses every session the first one returned, and
+               only reconnects to hosts whose sessions were discarded
+
+Exits non-zero if a check fails.
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from remote_exec import FakeTransport, SessionPool, fan_out  # noqa: E402
+
+COMMAND = "Get-Service -Name WinRM"
+# Results count as in order if each host's latency is at most this far below the previous one's
+ORDER_TOLERANCE = 0.02
+
+
+def make_hosts(count):
+    hosts = [f"srv{i:04d}.corp.example.com" for i in range(count)]
+    # Every 20th host fails, and a few others hang or can't be reached
+    failing = hosts[::20]
+    hanging = hosts[7:count:max(1, count // 3)]
+    unreachable = hosts[11:count:max(1, count // 4)]
+    return hosts, set(failing), set(hanging), set(unreachable)
+
+
+def expected_status(host, failing, hanging, unreachable):
+    if host in unreachable:
+        return "error"
+    if host in hanging:
+        return "timeout"
+    if host in failing:
+        return "failed"
+    return "ok"
+
+
+def run(hosts, pool, workers, timeout):
+    started = time.perf_counter()
+    results = []
+    for result in fan_out(hosts, COMMAND, pool, max_workers=workers, timeout=timeout):
+        results.append((time.perf_counter() - started, result))
+    return results, time.perf_counter() - started
+
+
+def check(label, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {label:14} {detail}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check remote fan-out ordering, timeouts and session reuse.")
+    parser.add_argument("--hosts", type=int, default=200, help="hosts to fan out to")
+    parser.add_argument("--workers", type=int, default=16, help="workers for the queueing check")
+    parser.add_argument("--timeout", type=float, default=0.5, help="per-host timeout in seconds")
+    args = parser.parse_args(argv)
+
+    hosts, failing, hanging, unreachable = make_hosts(args.hosts)
+    # Hung hosts wait on this instead of sleeping, so they can be let go once the checks are done
+    release = threading.Event()
+    transport = FakeTransport(min_latency=0.02, max_latency=0.2, failing_hosts=failing, hanging_hosts=hanging,
+                              unreachable_hosts=unreachable, hang_seconds=60, sleep=release.wait)
+    pool = SessionPool(transport)
+
+    try:
+        results, elapsed = run(hosts, pool, len(hosts), args.timeout)
+        by_host = {result["host"]: result for _, result in results}
+        wrong = [host for host in hosts
+                 if by_host.get(host, {}).get("status") != expected_status(host, failing, hanging, unreachable)]
+        passed = check("results", len(results) == len(hosts) and not wrong,
+                       f"{len(results)} results for {len(hosts)} hosts, {len(wrong)} with the wrong status")
+
+        answered = [result["host"] for _, result in results if result["status"] in ("ok", "failed")]
+        latencies = [transport.latency(host) for host in answered]
+        out_of_order = sum(1 for a, b in zip(latencies, latencies[1:]) if b < a - ORDER_TOLERANCE)
+        first = results[0][0]
+        passed &= check("ordering", out_of_order == 0 and first < transport.max_latency,
+                        f"first result after {first * 1000:.0f} ms, {out_of_order} out of order")
+
+        timeouts = [result["elapsed"] for _, result in results if result["status"] == "timeout"]
+        passed &= check("timeouts", len(timeouts) == len(hanging) and elapsed < args.timeout + 1.0
+                        and all(args.timeout <= t < args.timeout + 0.5 for t in timeouts),
+                        f"{len(timeouts)} timed out after {max(timeouts, default=0):.2f}s, run took {elapsed:.2f}s")
+
+        # Enough hosts that each worker handles several, each taking more than half the timeout
+        queued_hosts = [f"queued{i:04d}" for i in range(args.workers * 4)]
+        queued_transport = FakeTransport(min_latency=args.timeout * 0.6, max_latency=args.timeout * 0.6)
+        queued, queued_elapsed = run(queued_hosts, SessionPool(queued_transport), args.workers, args.timeout)
+        statuses = [result["status"] for _, result in queued]
+        passed &= check("queueing", statuses.count("ok") == len(queued_hosts) and queued_elapsed > args.timeout,
+                        f"{statuses.count('ok')} of {len(queued_hosts)} ok through {args.workers} workers "
+                        f"in {queued_elapsed:.2f}s")
+
+        connects, before = transport.connects, pool.stats()
+        results, elapsed = run(hosts, pool, len(hosts), args.timeout)
+        after = pool.stats()
+        reused = after["reused"] - before["reused"]
+        returned = sum(1 for host in hosts if host not in hanging and host not in unreachable)
+        reconnects = transport.connects - connects
+        passed &= check("pool reuse", reused == returned and reconnects == len(hanging) + len(unreachable),
+                        f"{reused} sessions reused, {reconnects} new connections "
+                        f"({len(hanging)} discarded after a timeout, {len(unreachable)} unreachable), "
+                        f"second run took {elapsed:.2f}s")
+    finally:
+        release.set()
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Render-time benchmark for per-tab fragment isolation.
+
+Usage:
+    python benchmarks/bench_fragments.py [--history 200] [--favorites 50] [--reruns 10]
+
+Runs main.py through Streamlit's AppTest twice in fresh interpreters: once
+with tab fragments (the default) and once with DISABLE_TAB_FRAGMENTS=1.
+A temporary history database and shared favorites store are pre-filled so their tabs have something to render.
+
+Without isolation every widget interaction costs a full script run. With
+isolation an interaction inside a tab reruns only that tab's fragment, so its
+cost is the tab's own render time, which the app records per run in
+st.session_state["render_times"]. AppTest always performs full runs, so the
+isolated cost is read from those per-tab timings rather than from a
+fragment-only rerun.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Executed in a fresh interpreter inside the repository
+MEASURE_SCRIPT = """
+import json, os, statistics, time
+from streamlit.testing.v1 import AppTest
+
+from history_store import HistoryStore
+from shared_state import SQLiteKV
+
+store = HistoryStore(os.environ["COMMAND_HISTORY_DB"])
+for i in range({history}):
+    store.append(f"ping host{{i}}.example.com -n 4", "Sends four echo requests to the host. " * 5,
+                 timestamp="2024-01-01 00:00:00", user_id="anon:bench")
+
+commands = [f"tracert host{{i:04d}}.example.com" for i in range({favorites})]
+SQLiteKV(os.environ["SHARED_STATE_DB"]).write_many("favorites:anon:bench", {{
+    command: {{"command": command, "explanation": "Lists the hops to the host.", "added_on": "2024-01-01 00:00:00"}}
+    for command in commands
+}})
+
+at = AppTest.from_file("main.py", default_timeout=120)
+# History and favorites are per user, so the app session takes the pre-filled entries' id
+at.session_state["user_id"] = "anon:bench"
+at.run()
+
+full_runs = []
+tab_times = {{}}
+for _ in range({reruns}):
+    started = time.perf_counter()
+    at.run()
+    full_runs.append(time.perf_counter() - started)
+    for name, seconds in at.session_state["render_times"].items():
+        tab_times.setdefault(name, []).append(seconds)
+
+print(json.dumps({{
+    "full_run_median": statistics.median(full_runs),
+    "tabs": {{name: statistics.median(times) for name, times in tab_times.items() if name != "app"}},
+    "exceptions": [str(e.value) for e in at.exception],
+}}))
+"""
+
+
+def measure(isolated, history, favorites, reruns):
+    with tempfile.TemporaryDirectory() as tmp:
+        return _measure(isolated, history, favorites, reruns, tmp)
+
+
+def _measure(isolated, history, favorites, reruns, tmp):
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark-key")
+    # Keep caches in memory so runs don't read or pollute the real ones
+    env["ANSWER_CACHE_DB"] = ":memory:"
+    env["SEMANTIC_CACHE_INDEX"] = ""
+    env["PREFETCH_CALLS_PER_HOUR"] = "0"
+    env["COMMAND_HISTORY_DB"] = os.path.join(tmp, "history.db")
+    env["SHARED_STATE_DB"] = os.path.join(tmp, "shared_state.db")
+    if isolated:
+        env.pop("DISABLE_TAB_FRAGMENTS", None)
+    else:
+        env["DISABLE_TAB_FRAGMENTS"] = "1"
+    script = MEASURE_SCRIPT.format(history=history, favorites=favorites, reruns=reruns)
+    result = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-interaction render time with and without tab fragments.")
+    parser.add_argument("--history", type=int, default=200, help="command history entries to pre-fill")
+    parser.add_argument("--favorites", type=int, default=50, help="favorites to pre-fill")
+    parser.add_argument("--reruns", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    isolated = measure(True, args.history, args.favorites, args.reruns)
+    whole_app = measure(False, args.history, args.favorites, args.reruns)
+
+    print(f"full rerun, fragments on:  {isolated['full_run_median'] * 1000:8.1f}ms")
+    print(f"full rerun, fragments off: {whole_app['full_run_median'] * 1000:8.1f}ms")
+    print()
+    print(f"{'widget change inside':32} {'isolated':>10} {'whole app':>10} {'speedup':>8}")
+    full = whole_app["full_run_median"]
+    for name, seconds in sorted(isolated["tabs"].items(), key=lambda item: -item[1]):
+        print(f"{name:32} {seconds * 1000:8.1f}ms {full * 1000:8.1f}ms {full / max(seconds, 1e-6):7.1f}x")
+    for error in isolated["exceptions"] + whole_app["exceptions"]:
+        print(f"exception: {error}")
+    return 1 if isolated["exceptions"] or whole_app["exceptions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Help system benchmark.
+
+Usage:
+    python benchmarks/bench_help.py [--copies 50] [--lookups 1000]
+
+Builds a guide from --copies copies of docs/user_guide.md, with each copy's
+headings renamed so every section is distinct, and compares:
+
+  read per click   reading the whole file on each lookup, as the sidebar used to
+  indexed          HelpIndex lookups of one section, parsed once
+
+Also checks that an edit to the file is picked up on the next check, and
+that the guide's sections are found by the command search. Exits non-zero
+if a check fails.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from command_search import SearchIndex  # noqa: E402
+from help_docs import HelpIndex  # noqa: E402
+
+
+def build_guide(copies):
+    guide = (REPO_ROOT / "docs" / "user_guide.md").read_text(encoding="utf-8")
+    parts = []
+    for copy in range(copies):
+        parts.append(re.sub(r"^(#+ .*)$", rf"\1 part {copy}", guide, flags=re.MULTILINE))
+    return "\n\n".join(parts)
+
+
+def check(label, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {label:28} {detail}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the user guide section index.")
+    parser.add_argument("--copies", type=int, default=50, help="copies of the guide to concatenate")
+    parser.add_argument("--lookups", type=int, default=1000, help="section lookups to time")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "guide.md")
+        Path(path).write_text(build_guide(args.copies), encoding="utf-8")
+        size = os.path.getsize(path)
+
+        started = time.perf_counter()
+        for _ in range(args.lookups):
+            Path(path).read_text(encoding="utf-8")
+        per_click = (time.perf_counter() - started) / args.lookups
+
+        guide = HelpIndex(path, check_interval=0)
+        started = time.perf_counter()
+        sections = guide.sections()
+        parse = time.perf_counter() - started
+        topics = guide.topics()
+        topic = topics[len(topics) // 2]
+        started = time.perf_counter()
+        for _ in range(args.lookups):
+            text = guide.get(topic)["text"]
+        indexed = (time.perf_counter() - started) / args.lookups
+        print(f"guide: {size / 1024:.0f} KiB, {len(sections)} sections, parsed in {parse * 1000:.1f} ms")
+        print(f"read per click: {per_click * 1e6:8.1f} us, {size / 1024:.0f} KiB rendered")
+        print(f"indexed:        {indexed * 1e6:8.1f} us, {len(text) / 1024:.1f} KiB rendered")
+        passed = check("one parse for all lookups", guide.parses == 1, f"{guide.parses} parses")
+        passed &= check("indexed is faster", indexed < per_click, f"{per_click / indexed:.0f}x")
+
+        index = SearchIndex()
+        index.sync_help(guide)
+        results = [r for r in index.search("warm catalog part 7") if r["kind"] == "help"]
+        passed &= check("search finds sections", bool(results) and results[0]["command"] == "batch-mode-part-7",
+                        results[0]["command"] if results else "no results")
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n### Appendix\nRestart the collector service after editing the config.\n")
+        appendix = guide.get("appendix")
+        passed &= check("edit reparses", appendix is not None and guide.parses == 2, f"{guide.parses} parses")
+        index.sync_help(guide)
+        results = index.search("collector config")
+        passed &= check("search follows edits", bool(results) and results[0]["command"] == "appendix",
+                        results[0]["command"] if results else "no results")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
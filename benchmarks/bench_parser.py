@@ -0,0 +1,150 @@
+"""Parser benchmark and fuzz run.
+
+Usage:
+    python benchmarks/bench_parser.py [--fuzz 2000] [--seed 1]
+
+Times the text and streaming parsers on a corpus of well-formed and
+adversarial model outputs at growing sizes, with the previous single-regex
+parser timed alongside on the smaller sizes for comparison. Exits non-zero if the per-byte parse cost grows by more than
+LINEARITY_TOLERANCE between the smallest and largest size, or if any fuzzed
+input raises or runs over FUZZ_TIME_LIMIT.
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from command_assistant import parse_json_response, parse_response_text  # noqa: E402
+from response_parser import StreamingResponseParser  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+LEGACY_MAX_SIZE = 10_000
+LINEARITY_TOLERANCE = 5.0
+FUZZ_TIME_LIMIT = 0.25
+
+# The parser get_gemini_response used before the line-based one
+LEGACY_RESPONSE_REGEX = r"^((?:[A-Za-z0-9\-_]+\.exe\s)?[^\n`]+)(?:\n+)(.*?)(?:\n+Security Note:\s*(.*?))?(?:\n+Alternatives:\s*(.*))?$"
+
+WELL_FORMED = (
+    "ipconfig /flushdns\nFlushes the DNS resolver cache.\nSecurity Note: Requires admin.\nAlternatives: Restart the DNS Client service.",
+    "[Command]\n```powershell\nClear-DnsClientCache\n```\n[Explanation]\nClears the cache.\n[Security Note]\nNone.\n[Alternatives]\n- ipconfig /flushdns",
+    "**Command:** `Get-NetIPConfiguration`\n\n**Explanation:** Shows IP settings.\n\n**Security Note:** Read-only.\n**Alternatives:** ncpa.cpl",
+)
+
+
+def adversarial(size):
+    # Each builder produces roughly `size` characters of hostile formatting
+    return {
+        "blank_line_run": "ipconfig\n" + "\n" * size + "x",
+        "whitespace_line": "ipconfig\n" + " " * size + "x",
+        "single_long_line": "a" * size,
+        "repeated_notes": "ipconfig\n" + "\nSecurity Note: " * (size // 16),
+        "repeated_headers": "[Command]\n" * (size // 10),
+        "bracket_bomb": "[" * size + "\n" + "*" * size,
+        "unterminated_fence": "```\n" + "x\n" * (size // 2),
+        "label_prefixes": "\n".join("Command" + ":" * (i % 3) for i in range(size // 8)),
+    }
+
+
+def time_call(fn, text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def stream_parse(text, chunk_size=16):
+    # Feed cost only: a snapshot is a full copy of the reply by design
+    parser = StreamingResponseParser()
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i:i + chunk_size])
+    return parser.close()
+
+
+def legacy_parse(text):
+    return re.search(LEGACY_RESPONSE_REGEX, text.lstrip(), re.DOTALL)
+
+
+def run_benchmark():
+    parsers = {"text": parse_response_text, "stream": stream_parse, "json": parse_json_response}
+    failures = []
+    print(f"{'case':20} {'size':>9} " + " ".join(f"{name:>12}" for name in [*parsers, "legacy"]))
+    for name in adversarial(10):
+        per_byte = {}
+        for size in SIZES:
+            text = adversarial(size)[name]
+            row = {parser: time_call(fn, text) for parser, fn in parsers.items()}
+            legacy = time_call(legacy_parse, text, repeat=1) if size <= LEGACY_MAX_SIZE else None
+            for parser, seconds in row.items():
+                per_byte.setdefault(parser, []).append(seconds / max(len(text), 1))
+            cells = [f"{row[p] * 1000:10.2f}ms" for p in parsers]
+            cells.append(f"{legacy * 1000:10.2f}ms" if legacy is not None else f"{'-':>12}")
+            print(f"{name:20} {len(text):9d} " + " ".join(cells))
+        for parser, costs in per_byte.items():
+            # Compare the largest input against the mid-sized one; tiny inputs are dominated by call overhead
+            if costs[-1] > costs[1] * LINEARITY_TOLERANCE:
+                failures.append(f"{parser} parser is super-linear on {name}")
+
+    for text in WELL_FORMED:
+        for parser, fn in parsers.items():
+            if parser != "json" and not fn(text)["command"]:
+                failures.append(f"{parser} parser lost the command in {text[:30]!r}")
+    return failures
+
+
+def mutate(rng, text):
+    pieces = ["\n", " ", "`", "```", "[Command]", "Security Note:", "Alternatives:", "**", "#", "\t", "\r\n", "é", "{", "\"", "​"]
+    chars = list(text)
+    for _ in range(rng.randint(1, 20)):
+        op = rng.random()
+        position = rng.randint(0, len(chars))
+        if op < 0.5:
+            chars[position:position] = list(rng.choice(pieces) * rng.randint(1, 200))
+        elif op < 0.8 and chars:
+            del chars[position:position + rng.randint(1, 20)]
+        else:
+            chars[position:position] = [chr(rng.randint(0, 0x2FFF)) for _ in range(rng.randint(1, 50))]
+    return "".join(chars)
+
+
+def run_fuzz(count, seed):
+    rng = random.Random(seed)
+    failures = []
+    slowest = 0.0
+    for i in range(count):
+        text = mutate(rng, rng.choice(WELL_FORMED))
+        for fn in (parse_response_text, stream_parse, parse_json_response):
+            started = time.perf_counter()
+            try:
+                fn(text)
+            except Exception as e:
+                failures.append(f"fuzz case {i}: {fn.__name__} raised {e!r}")
+                continue
+            elapsed = time.perf_counter() - started
+            slowest = max(slowest, elapsed)
+            if elapsed > FUZZ_TIME_LIMIT:
+                failures.append(f"fuzz case {i}: {fn.__name__} took {elapsed:.3f}s")
+    print(f"\nfuzzed {count} inputs, slowest parse {slowest * 1000:.2f}ms")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fuzz", type=int, default=2000, help="number of mutated inputs to parse")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    failures = run_benchmark() + run_fuzz(args.fuzz, args.seed)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
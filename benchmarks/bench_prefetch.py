@@ -0,0 +1,148 @@
+"""Speculative prefetch benchmark.
+
+Usage:
+    python benchmarks/bench_prefetch.py [--latency 0.3] [--think 2.0]
+
+Uses the real Prefetcher, GeminiScheduler and AnswerCache with
+benchmarks/fake_gemini.py as the model. Four checks:
+
+  hit rate   a user opens a sidebar tool, reads for --think seconds, then asks
+             about each of its commands; with prefetch every question should
+             be a cache hit, without it every one waits for the model. Run
+             for both plain and structured answers
+  budget     with a budget of 3 calls an hour, 10 requests make 3 calls
+  priority   with one request slot and a backlog of prefetches, an
+             interactive question waits for at most the call in flight
+  rewarm     answers dropped from the cache are fetched again once the
+             recheck interval has passed
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from answer_cache import AnswerCache, make_cache_key  # noqa: E402
+from command_assistant import ask_model, estimate_tokens, prompt_settings  # noqa: E402
+from command_catalog import TROUBLESHOOTING_CATEGORIES, catalog_questions, sidebar_question  # noqa: E402
+from fake_gemini import FakeModel  # noqa: E402
+from prefetch import Prefetcher  # noqa: E402
+from scheduler import PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, GeminiScheduler  # noqa: E402
+
+TOOL = ("Network", "Connectivity")
+
+
+def make_app(latency, calls_per_hour=60, max_concurrent=4, recheck_interval=600):
+    model = FakeModel(latency=latency, jitter=0)
+    cache = AnswerCache(":memory:")
+    scheduler = GeminiScheduler(requests_per_minute=100000, max_concurrent=max_concurrent)
+
+    def fetch(question, structured):
+        result = scheduler.run(lambda: ask_model(model, question, structured=structured), session_id="prefetch",
+                               priority=PRIORITY_PREFETCH, tokens=estimate_tokens(question, structured))
+        if result["command"]:
+            cache.put(make_cache_key(question, *prompt_settings(structured)), question, result)
+        return result
+
+    def ask(question, structured=False):
+        # What get_gemini_response does for a sidebar question, minus the UI
+        key = make_cache_key(question, *prompt_settings(structured))
+        cached = cache.get(key)
+        if cached is not None:
+            return True
+        result = scheduler.run(lambda: ask_model(model, question, structured=structured), session_id="user",
+                               priority=PRIORITY_INTERACTIVE, tokens=estimate_tokens(question, structured))
+        cache.put(key, question, result)
+        return False
+
+    prefetcher = Prefetcher(fetch, lambda q, structured: cache.contains(make_cache_key(q, *prompt_settings(structured))),
+                            catalog=catalog_questions(), calls_per_hour=calls_per_hour,
+                            recheck_interval=recheck_interval)
+    return prefetcher, ask, model, cache
+
+
+def wait_idle(prefetcher, timeout=10):
+    deadline = time.monotonic() + timeout
+    while prefetcher.stats()["queued"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+
+
+def browse(latency, think, prefetch, structured=False):
+    prefetcher, ask, _, _ = make_app(latency, calls_per_hour=60 if prefetch else 0)
+    questions = [sidebar_question(command) for command in TROUBLESHOOTING_CATEGORIES[TOOL[0]][TOOL[1]]]
+    prefetcher.request(questions, structured)
+    time.sleep(think)
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        hit = ask(question, structured)
+        latencies.append(time.perf_counter() - started)
+        prefetcher.record(question, hit, structured)
+    return prefetcher.stats(), latencies
+
+
+def check(label, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {label:34} {detail}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the answer prefetcher.")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake Gemini seconds per reply")
+    parser.add_argument("--think", type=float, default=2.0, help="seconds between opening a tool and asking")
+    args = parser.parse_args(argv)
+
+    stats, latencies = browse(args.latency, args.think, prefetch=True)
+    passed = check("with prefetch", stats["hit_rate"] == 1.0,
+                   f"hit rate {stats['hit_rate']:.0%}, median {statistics.median(latencies) * 1000:.1f} ms, "
+                   f"{stats['calls_last_hour']} prefetch calls")
+    stats, latencies = browse(args.latency, args.think, prefetch=True, structured=True)
+    passed &= check("with prefetch, structured", stats["hit_rate"] == 1.0 and stats["prefetch_hits"] == stats["hits"],
+                    f"hit rate {stats['hit_rate']:.0%}, {stats['prefetch_hits']} from prefetching")
+    stats, latencies = browse(args.latency, args.think, prefetch=False)
+    passed &= check("without prefetch", stats["hit_rate"] == 0.0,
+                    f"hit rate {stats['hit_rate']:.0%}, median {statistics.median(latencies) * 1000:.1f} ms")
+
+    prefetcher, _, _, _ = make_app(0.01, calls_per_hour=3)
+    calls_before = FakeModel.calls
+    prefetcher.request(catalog_questions()[:10])
+    wait_idle(prefetcher)
+    stats = prefetcher.stats()
+    passed &= check("budget", FakeModel.calls - calls_before == 3 and stats["over_budget"] == 7,
+                    f"{FakeModel.calls - calls_before} calls, {stats['over_budget']} dropped over budget")
+
+    prefetcher, ask, _, _ = make_app(args.latency, max_concurrent=1)
+    prefetcher.request(catalog_questions()[:10])
+    time.sleep(args.latency / 2)
+    started = time.perf_counter()
+    ask("Explain how to use robocopy command")
+    waited = time.perf_counter() - started
+    passed &= check("interactive ahead of prefetch", waited < 2.5 * args.latency,
+                    f"{waited:.2f}s with {prefetcher.stats()['queued']} prefetches still queued")
+
+    prefetcher, _, _, cache = make_app(0.01, recheck_interval=0.5)
+    questions = catalog_questions()[:5]
+    prefetcher.request(questions)
+    wait_idle(prefetcher)
+    # Evicted or expired: the next request within the interval trusts the earlier check, a later one rechecks
+    cache.clear()
+    prefetcher.request(questions)
+    wait_idle(prefetcher)
+    early = prefetcher.stats()["fetched"]
+    time.sleep(0.5)
+    prefetcher.request(questions)
+    wait_idle(prefetcher)
+    stats = prefetcher.stats()
+    passed &= check("rewarm after eviction", early == 5 and stats["fetched"] == 10,
+                    f"{early} fetched, then {stats['fetched']} after the recheck interval")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Per-keystroke latency of the sidebar command search.
+
+Usage:
+    python benchmarks/bench_search.py [--history 50000] [--max-ms 10]
+
+Fills a SearchIndex with a small built-in catalog and a synthetic command
+history, then times every prefix of a set of queries, the way the index is
+hit while someone types. Exits non-zero when the slowest keystroke exceeds
+--max-ms.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from command_search import SearchIndex  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+
+CATALOG = {
+    "ipconfig /flushdns": "DNS",
+    "ipconfig /all": "Check network configuration",
+    "nslookup google.com": "Test DNS resolution",
+    "tracert 8.8.8.8": "Check network path",
+    "netstat -ano": "Network Status",
+    "Get-ADUser -Filter * | Select-Object Name,Enabled,LastLogonDate": "List Users",
+    "Search-ADAccount -LockedOut | Select-Object Name,LastLogonDate": "Locked Accounts",
+    "wmic logicaldisk get size,freespace,caption": "Disk Space",
+}
+QUERIES = ["flush dns", "pign host42", "get-aduser", "locked acounts", "tracert 8.8", "netstat -ano", "disk"]
+VERBS = ["ping", "tracert", "nslookup", "Test-NetConnection", "Resolve-DnsName", "Get-Service", "Restart-Service"]
+
+
+def build_index(history_size, seed=0):
+    index = SearchIndex()
+    for command, title in CATALOG.items():
+        index.add(command, title, "Catalog")
+    store = HistoryStore(":memory:")
+    rng = random.Random(seed)
+    for i in range(history_size):
+        store.append(f"{rng.choice(VERBS)} host{i}.corp.example.com -n {i % 10}", "Synthetic history entry")
+    started = time.perf_counter()
+    index.sync_history(store)
+    return index, store, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure command search latency per keystroke.")
+    parser.add_argument("--history", type=int, default=50000, help="synthetic history entries to index")
+    parser.add_argument("--max-ms", type=float, default=10.0, help="fail if any keystroke takes longer")
+    args = parser.parse_args(argv)
+
+    index, store, build_seconds = build_index(args.history)
+    print(f"indexed {len(index)} documents in {build_seconds:.2f}s")
+
+    timings = []
+    for query in QUERIES:
+        for end in range(1, len(query) + 1):
+            started = time.perf_counter()
+            results = index.search(query[:end])
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"{query!r:18} -> {results[0]['command'] if results else '(no results)'}")
+
+    # A new history entry is picked up incrementally on the next search
+    store.append("Get-NetFirewallRule -Enabled True", "Synthetic history entry")
+    started = time.perf_counter()
+    index.sync_history(store)
+    sync_ms = (time.perf_counter() - started) * 1000
+
+    timings.sort()
+    print(f"keystrokes {len(timings)}   median {statistics.median(timings):.2f}ms   "
+          f"p95 {timings[int(len(timings) * 0.95)]:.2f}ms   max {timings[-1]:.2f}ms   "
+          f"incremental sync {sync_ms:.2f}ms")
+    if timings[-1] > args.max_ms:
+        print(f"FAIL: slowest keystroke {timings[-1]:.2f}ms exceeds {args.max_ms:.2f}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Shared state store benchmark.
+
+Usage:
+    python benchmarks/bench_shared_state.py [--writers 4] [--keys 500]
+
+Checks, against a temporary SQLite file in WAL mode:
+  - a buffered put() costs far less than a synchronous committed write
+  - a value cached locally is read without touching the backend
+  - answers one process caches are served to another process
+  - a favorite added in one process shows up in another within
+    read TTL + flush interval, and so does its removal
+  - several processes writing at once lose nothing and never see
+    "database is locked"
+Exits non-zero if any check fails.
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from answer_cache import AnswerCache  # noqa: E402
+from shared_state import SharedState, SQLiteKV, connect_sqlite  # noqa: E402
+
+READ_TTL = 0.5
+FLUSH_INTERVAL = 0.2
+RESPONSE = {"command": "ipconfig /flushdns", "explanation": "Flushes the DNS resolver cache."}
+
+
+def timed(fn, count):
+    times = []
+    for i in range(count):
+        started = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), sorted(times)[int(count * 0.95)]
+
+
+def write_answers(db_path, first, count):
+    cache = AnswerCache(db_path)
+    for i in range(first, first + count):
+        cache.put(f"key{i}", f"question {i}", RESPONSE)
+    cache.flush()
+
+
+def read_answers(db_path, count, queue):
+    cache = AnswerCache(db_path)
+    queue.put(sum(cache.get(f"key{i}") is not None for i in range(count)))
+
+
+def toggle_favorite(db_path, queue):
+    # Waits for the parent's favorite, then removes it
+    favorites = SharedState(SQLiteKV(db_path), "favorites", read_ttl=READ_TTL, flush_interval=FLUSH_INTERVAL)
+    started = time.perf_counter()
+    while favorites.get("ping 8.8.8.8") is None:
+        time.sleep(0.01)
+    queue.put(time.perf_counter() - started)
+    favorites.delete("ping 8.8.8.8")
+    favorites.flush()
+
+
+def write_concurrently(db_path, writer, keys, queue):
+    try:
+        favorites = SharedState(SQLiteKV(db_path), "load", flush_interval=0.01, batch_size=25)
+        for i in range(keys):
+            favorites.put(f"w{writer}-{i}", {"writer": writer, "i": i})
+        favorites.flush()
+        queue.put(None)
+    except Exception as e:
+        queue.put(f"{type(e).__name__}: {e}")
+
+
+def check(label, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {label:40} {detail}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the shared state store across processes.")
+    parser.add_argument("--writers", type=int, default=4, help="processes writing at the same time")
+    parser.add_argument("--keys", type=int, default=500, help="keys per writer")
+    args = parser.parse_args(argv)
+    context = multiprocessing.get_context("spawn")
+    passed = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "shared_state.db")
+
+        state = SharedState(SQLiteKV(db_path), "latency", flush_interval=FLUSH_INTERVAL)
+        put_p50, put_p95 = timed(lambda i: state.put(f"k{i}", RESPONSE), 1000)
+        conn = connect_sqlite(os.path.join(tmp, "direct.db"))
+        conn.execute("CREATE TABLE kv (key TEXT PRIMARY KEY, value TEXT)")
+
+        def direct_write(i):
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?)", (f"k{i}", str(RESPONSE)))
+
+        direct_p50, _ = timed(direct_write, 200)
+        passed &= check("buffered put vs committed write", put_p50 < direct_p50,
+                        f"put p50 {put_p50 * 1e6:.0f}us p95 {put_p95 * 1e6:.0f}us, "
+                        f"committed write p50 {direct_p50 * 1e6:.0f}us")
+        state.flush()
+        reads = state.stats()["backend_reads"]
+        get_p50, _ = timed(lambda i: state.get(f"k{i % 1000}"), 1000)
+        passed &= check("cached reads skip the backend", state.stats()["backend_reads"] == reads,
+                        f"get p50 {get_p50 * 1e6:.1f}us, {state.stats()['backend_reads'] - reads} backend reads")
+
+        answers_db = os.path.join(tmp, "answers.db")
+        writer = context.Process(target=write_answers, args=(answers_db, 0, 200))
+        writer.start()
+        writer.join()
+        queue = context.Queue()
+        reader = context.Process(target=read_answers, args=(answers_db, 200, queue))
+        reader.start()
+        found = queue.get(timeout=60)
+        reader.join()
+        passed &= check("answers shared between processes", found == 200, f"{found} of 200 answers found")
+
+        favorites = SharedState(SQLiteKV(db_path), "favorites", read_ttl=READ_TTL, flush_interval=FLUSH_INTERVAL)
+        other = context.Process(target=toggle_favorite, args=(db_path, queue))
+        other.start()
+        favorites.put("ping 8.8.8.8", {"command": "ping 8.8.8.8", "explanation": "Tests connectivity."})
+        seen = queue.get(timeout=60)
+        # Read while the other process is removing it, so this process holds a stale list for a while
+        favorites.items()
+        other.join()
+        removed_at = time.perf_counter()
+        while any(key == "ping 8.8.8.8" for key, _ in favorites.items()) and time.perf_counter() - removed_at < 10:
+            time.sleep(0.01)
+        removed = time.perf_counter() - removed_at
+        limit = READ_TTL + FLUSH_INTERVAL + 0.5
+        passed &= check("favorite add seen by another process", seen < limit, f"{seen:.2f}s")
+        passed &= check("favorite removal seen back", removed < limit, f"{removed:.2f}s")
+
+        processes = [context.Process(target=write_concurrently, args=(db_path, n, args.keys, queue))
+                     for n in range(args.writers)]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        errors = [error for error in (queue.get(timeout=120) for _ in processes) if error]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        stored = SQLiteKV(db_path).count("load")
+        passed &= check("concurrent writers lose nothing", not errors and stored == args.writers * args.keys,
+                        f"{stored} of {args.writers * args.keys} keys in {elapsed:.2f}s"
+                        + (f", {errors[0]}" if errors else ""))
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Startup benchmark for the Streamlit app.
+
+Usage:
+    python benchmarks/bench_startup.py [--ref HEAD~1] [--reruns 20]
+                                       [--max-cold-start 3.0] [--max-rerun-ms 150]
+
+Runs main.py through Streamlit's AppTest in a fresh interpreter and reports
+the cold start (first script run, including the app's own imports) and the
+median time of later reruns. With --ref the same measurement is taken for
+that git revision first, giving a before/after comparison. The thresholds
+make the script exit non-zero so it can guard against regressions.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("google.generativeai", "networkx", "matplotlib.pyplot", "winrm")
+
+# Executed in a fresh interpreter inside the tree being measured
+MEASURE_SCRIPT = """
+import json, statistics, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+import_streamlit = time.perf_counter() - started
+
+at = AppTest.from_file("main.py", default_timeout=120)
+started = time.perf_counter()
+at.run()
+cold_start = time.perf_counter() - started
+loaded = [name for name in {heavy!r} if name in sys.modules]
+
+reruns = []
+for _ in range({reruns}):
+    started = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - started)
+
+print(json.dumps({{
+    "import_streamlit": import_streamlit,
+    "cold_start": cold_start,
+    "rerun_median": statistics.median(reruns),
+    "rerun_max": max(reruns),
+    "heavy_modules_loaded": loaded,
+    "exceptions": [str(e.value) for e in at.exception],
+}}))
+"""
+
+
+def export_revision(ref, destination):
+    archive = subprocess.run(["git", "archive", ref], cwd=REPO_ROOT, check=True, capture_output=True).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(destination)
+
+
+def measure(tree, reruns):
+    with tempfile.TemporaryDirectory() as tmp:
+        return _measure(tree, reruns, tmp)
+
+
+def _measure(tree, reruns, tmp):
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark-key")
+    # Keep caches in memory or in a temporary directory so runs don't read or pollute the real ones
+    env["ANSWER_CACHE_DB"] = ":memory:"
+    env["SEMANTIC_CACHE_INDEX"] = ""
+    env["COMMAND_HISTORY_DB"] = ":memory:"
+    env["SHARED_STATE_DB"] = os.path.join(tmp, "shared_state.db")
+    env["METRICS_PROM_FILE"] = ""
+    # There is no fake model here, so background prefetch would call the real API
+    env["PREFETCH_CALLS_PER_HOUR"] = "0"
+    script = MEASURE_SCRIPT.format(heavy=HEAVY_MODULES, reruns=reruns)
+    result = subprocess.run([sys.executable, "-c", script], cwd=tree, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark run failed in {tree}:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(label, metrics):
+    print(
+        f"{label:10} cold start {metrics['cold_start'] * 1000:8.1f}ms   "
+        f"rerun median {metrics['rerun_median'] * 1000:7.1f}ms   max {metrics['rerun_max'] * 1000:7.1f}ms   "
+        f"heavy modules loaded: {', '.join(metrics['heavy_modules_loaded']) or 'none'}"
+    )
+    for error in metrics["exceptions"]:
+        print(f"{'':10} exception: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start and per-rerun time of main.py.")
+    parser.add_argument("--ref", help="git revision to measure first for a before/after comparison")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--max-cold-start", type=float, help="fail if the cold start exceeds this many seconds")
+    parser.add_argument("--max-rerun-ms", type=float, help="fail if the median rerun exceeds this many milliseconds")
+    args = parser.parse_args(argv)
+
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tree:
+            export_revision(args.ref, tree)
+            report(args.ref, measure(tree, args.reruns))
+
+    metrics = measure(REPO_ROOT, args.reruns)
+    report("current", metrics)
+
+    failed = False
+    if args.max_cold_start is not None and metrics["cold_start"] > args.max_cold_start:
+        print(f"FAIL: cold start {metrics['cold_start']:.2f}s exceeds {args.max_cold_start:.2f}s")
+        failed = True
+    if args.max_rerun_ms is not None and metrics["rerun_median"] * 1000 > args.max_rerun_ms:
+        print(f"FAIL: median rerun {metrics['rerun_median'] * 1000:.1f}ms exceeds {args.max_rerun_ms:.1f}ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
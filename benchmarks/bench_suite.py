@@ -0,0 +1,403 @@
+"""End-to-end benchmark suite against a fake Gemini backend.
+
+Usage:
+    python benchmarks/bench_suite.py [--latency 0.2] [--reruns 5] [--questions 20]
+                                     [--sizes 10 1000 10000] [--json results.json]
+    python benchmarks/bench_suite.py --load 1 2 4 8 16 [--questions 5] [--max-p95 5.0]
+
+Every scenario runs main.py through Streamlit's AppTest in a fresh
+interpreter, with google.generativeai replaced by benchmarks/fake_gemini.py
+(configurable latency and replies) and every cache and history database
+kept in memory or in a temporary directory. Peak memory is the scenario
+process's maximum resident set size.
+
+The default suite reports:
+  tabs        median render time per tab over --reruns full reruns
+  throughput  get_gemini_response answers per second for unique questions
+              from one session, then for the same questions again (cached)
+  parser      parse cost per KB for the text and streaming parsers
+  sizes       History and Favorites tab render time at each of --sizes entries
+
+--load runs the multi-session mode instead: N simulated users, each with its
+own AppTest session in its own thread, ask --questions questions at the
+same time against one process's shared caches and Gemini scheduler. It
+reports per-question latency and total throughput for each N and stops at
+the first N whose p95 latency exceeds --max-p95 seconds, which is the
+scaling limit of one server process.
+
+Exits non-zero if any scenario raises or the app shows an exception.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BENCHMARKS = Path(__file__).resolve().parent
+
+WORDS = (
+    "adapter arp bandwidth bitlocker certificate cluster dhcp dism driver event firewall gateway gpo hyperv "
+    "iis kerberos latency lease mtu netbios ntp pagefile partition perfmon printer proxy quota raid registry "
+    "replication route sccm schannel share smb snmp spooler subnet sysvol tcp teaming tls trust uac update "
+    "vlan vpn wds wins wmi wsus"
+).split()
+TAB_NAMES = {
+    "create_command_assistant": "Command Assistant",
+    "create_diagnostic_report": "Diagnostic Report",
+    "show_command_history": "Command History",
+    "create_remote_management_tab": "Remote Management",
+    "create_ad_management": "AD Management",
+    "create_network_topology": "Network Topology",
+    "create_system_monitor": "System Monitor",
+    "create_favorites_tab": "Favorites",
+    "create_troubleshooting_workflow": "Troubleshooting Workflow",
+}
+
+
+def unique_questions(count, seed):
+    # "explain ..." skips the template fast path, and random words keep similar-question hits rare
+    rng = random.Random(seed)
+    return [f"explain {' '.join(rng.sample(WORDS, 4))} settings {i}" for i in range(count)]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Scenarios, each run inside its own interpreter by run_scenario()
+
+# History and favorites are per user, so the pre-filled entries and the app session share one id
+BENCH_USER = "anon:bench"
+
+def new_app(favorites=0):
+    from streamlit.testing.v1 import AppTest
+
+    from shared_state import SQLiteKV
+
+    if favorites:
+        commands = [f"tracert host{i:05d}.example.com" for i in range(favorites)]
+        SQLiteKV(os.environ["SHARED_STATE_DB"]).write_many(f"favorites:{BENCH_USER}", {
+            command: {"command": command, "explanation": "Lists the hops to the host.",
+                      "added_on": "2024-01-01 00:00:00"}
+            for command in commands
+        })
+    at = AppTest.from_file(str(REPO_ROOT / "main.py"), default_timeout=300)
+    # Only exact repeats may be served from the similar-question cache
+    at.session_state["similarity_threshold"] = 1.0
+    at.session_state["user_id"] = BENCH_USER
+    return at
+
+
+def fill_history(entries):
+    from history_store import HistoryStore
+
+    store = HistoryStore(os.environ["COMMAND_HISTORY_DB"])
+    for i in range(entries):
+        store.append(f"ping host{i}.example.com -n 4", "Sends four echo requests to the host. " * 5,
+                     timestamp="2024-01-01 00:00:00", user_id=BENCH_USER)
+
+
+def exceptions(at):
+    return [str(e.value) for e in at.exception]
+
+
+def tab_times(at, reruns):
+    full_runs, tabs = [], {}
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        full_runs.append(time.perf_counter() - started)
+        for name, seconds in at.session_state["render_times"].items():
+            tabs.setdefault(name, []).append(seconds)
+    return statistics.median(full_runs), {name: statistics.median(times) for name, times in tabs.items()}
+
+
+def scenario_tabs(reruns, history, favorites, **_):
+    fill_history(history)
+    at = new_app(favorites)
+    started = time.perf_counter()
+    at.run()
+    cold_start = time.perf_counter() - started
+    full_run, tabs = tab_times(at, reruns)
+    return {"cold_start": cold_start, "full_run": full_run, "tabs": tabs, "errors": exceptions(at)}
+
+
+def ask(at, question):
+    started = time.perf_counter()
+    at.text_input(key="question_input").input(question).run()
+    return time.perf_counter() - started
+
+
+def scenario_throughput(questions, seed, **_):
+    import fake_gemini
+
+    at = new_app()
+    at.run()
+    batch = unique_questions(questions, seed)
+    timings = {}
+    for label in ("uncached", "cached"):
+        calls = fake_gemini.FakeModel.calls
+        started = time.perf_counter()
+        latencies = [ask(at, question) for question in batch]
+        # Typing the same text twice is not a change, so clear the box between passes
+        at.text_input(key="question_input").input("").run()
+        timings[label] = {
+            "answers_per_second": len(batch) / (time.perf_counter() - started),
+            "p50": statistics.median(latencies),
+            "p95": sorted(latencies)[int(len(latencies) * 0.95)],
+            "model_calls": fake_gemini.FakeModel.calls - calls,
+        }
+    return dict(timings, errors=exceptions(at))
+
+
+def scenario_parser(**_):
+    from command_assistant import parse_response_text
+    from fake_gemini import DEFAULT_OUTPUTS
+    from response_parser import StreamingResponseParser
+
+    results = {}
+    for repeat in (1, 100, 1000):
+        text = "\n".join(DEFAULT_OUTPUTS * repeat)
+        kb = len(text) / 1024
+        started = time.perf_counter()
+        parse_response_text(text)
+        parse_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        parser = StreamingResponseParser()
+        for i in range(0, len(text), 64):
+            parser.feed(text[i:i + 64])
+        parser.close()
+        stream_ms = (time.perf_counter() - started) * 1000
+        results[f"{kb:.0f}KB"] = {"text_ms_per_kb": parse_ms / kb, "stream_ms_per_kb": stream_ms / kb}
+    return results
+
+
+def scenario_sizes(size, reruns, **_):
+    fill_history(size)
+    at = new_app(favorites=size)
+    at.run()
+    _, tabs = tab_times(at, reruns)
+    return {"history": tabs.get("show_command_history"), "favorites": tabs.get("create_favorites_tab"),
+            "errors": exceptions(at)}
+
+
+def share_apptest_runtime():
+    """Lets several AppTest sessions run at the same time in one process.
+
+    Each AppTest run installs its own mock Runtime as the process-wide
+    singleton and clears it when it finishes, which pulls the runtime out
+    from under any other session still running. Here Runtime.instance()
+    falls back to the last mock seen, and compiling main.py is serialized
+    because concurrent compile() calls trip a CPython AST bug.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import script_cache
+
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        if not last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last[0]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(last))
+
+    compile_lock = threading.Lock()
+    get_bytecode = script_cache.ScriptCache.get_bytecode
+
+    def locked_get_bytecode(self, script_path):
+        with compile_lock:
+            return get_bytecode(self, script_path)
+
+    script_cache.ScriptCache.get_bytecode = locked_get_bytecode
+
+
+def scenario_load(sessions, questions, seed, **_):
+    import fake_gemini
+
+    share_apptest_runtime()
+    results = [None] * sessions
+    # Every user has loaded the app before the clock starts
+    started = []
+    barrier = threading.Barrier(sessions, action=lambda: started.append(time.perf_counter()))
+
+    def user(n):
+        at = new_app()
+        at.run()
+        # Half of each user's questions are shared with the others, as popular questions would be
+        shared = unique_questions(questions // 2, seed)
+        own = unique_questions(questions - len(shared), seed + 1 + n)
+        latencies = []
+        barrier.wait()
+        for question in shared + own:
+            latencies.append(ask(at, question))
+        results[n] = {"latencies": latencies, "errors": exceptions(at)}
+
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started[0]
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    return {
+        "questions_per_second": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "max": latencies[-1],
+        "model_calls": fake_gemini.FakeModel.calls,
+        "errors": [error for result in results for error in result["errors"]],
+    }
+
+
+SCENARIOS = {
+    "tabs": scenario_tabs,
+    "throughput": scenario_throughput,
+    "parser": scenario_parser,
+    "sizes": scenario_sizes,
+    "load": scenario_load,
+}
+
+
+def run_in_this_process(name, params):
+    sys.path[:0] = [str(REPO_ROOT), str(BENCHMARKS)]
+    os.chdir(REPO_ROOT)
+    import fake_gemini
+
+    fake_gemini.install()
+    result = SCENARIOS[name](**params)
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_scenario(name, args, **params):
+    params = dict(dict(reruns=args.reruns, questions=args.questions, seed=args.seed, history=200, favorites=50),
+                  **params)
+    env = dict(os.environ)
+    env.update(
+        GEMINI_API_KEY="benchmark-key",
+        FAKE_GEMINI_LATENCY=str(args.latency),
+        # Keep caches in memory so runs don't read or pollute the real ones
+        ANSWER_CACHE_DB=":memory:",
+        SEMANTIC_CACHE_INDEX="",
+        METRICS_PROM_FILE="",
+        # The fake has no quota, so only the concurrency cap limits the scheduler
+        GEMINI_REQUESTS_PER_MINUTE="1000000",
+        # Background prefetch calls would show up in the model call counts
+        PREFETCH_CALLS_PER_HOUR="0",
+    )
+    if args.max_concurrent:
+        env["GEMINI_MAX_CONCURRENT"] = str(args.max_concurrent)
+    with tempfile.TemporaryDirectory() as tmp:
+        env["COMMAND_HISTORY_DB"] = os.path.join(tmp, "history.db")
+        env["SHARED_STATE_DB"] = os.path.join(tmp, "shared_state.db")
+        result = subprocess.run(
+            [sys.executable, __file__, "--scenario", name, "--params", json.dumps(params)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"scenario {name} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def ms(seconds):
+    return f"{seconds * 1000:8.1f}ms" if seconds is not None else f"{'-':>10}"
+
+
+def run_suite(args):
+    report = {}
+    errors = []
+
+    tabs = report["tabs"] = run_scenario("tabs", args)
+    errors += tabs["errors"]
+    print(f"cold start {ms(tabs['cold_start'])}   full rerun {ms(tabs['full_run'])}   "
+          f"peak {tabs['peak_rss_mb']:.0f} MB")
+    for name, seconds in sorted(tabs["tabs"].items(), key=lambda item: -item[1]):
+        if name != "app":
+            print(f"  {TAB_NAMES.get(name, name):28} {ms(seconds)}")
+
+    throughput = report["throughput"] = run_scenario("throughput", args)
+    errors += throughput["errors"]
+    print(f"\nget_gemini_response, {args.questions} questions, fake latency {args.latency:g}s")
+    for label in ("uncached", "cached"):
+        row = throughput[label]
+        print(f"  {label:9} {row['answers_per_second']:6.1f} answers/s   p50 {ms(row['p50'])}   "
+              f"p95 {ms(row['p95'])}   {row['model_calls']} model calls")
+
+    parser = report["parser"] = run_scenario("parser", args)
+    print("\nparser cost")
+    for size, row in parser.items():
+        if size != "peak_rss_mb":
+            print(f"  {size:>7}   text {row['text_ms_per_kb']:.3f} ms/KB   stream {row['stream_ms_per_kb']:.3f} ms/KB")
+
+    print(f"\n{'entries':>8} {'history':>10} {'favorites':>10} {'peak':>8}")
+    report["sizes"] = {}
+    for size in args.sizes:
+        row = report["sizes"][size] = run_scenario("sizes", args, size=size, reruns=min(args.reruns, 3))
+        errors += row["errors"]
+        print(f"{size:>8} {ms(row['history'])} {ms(row['favorites'])} {row['peak_rss_mb']:6.0f}MB")
+    return report, errors
+
+
+def run_load(args):
+    report = {"load": {}}
+    errors = []
+    print(f"{'users':>6} {'q/s':>7} {'p50':>10} {'p95':>10} {'max':>10} {'calls':>6} {'peak':>8}")
+    for sessions in args.load:
+        row = report["load"][sessions] = run_scenario("load", args, sessions=sessions)
+        errors += row["errors"]
+        print(f"{sessions:>6} {row['questions_per_second']:7.1f} {ms(row['p50'])} {ms(row['p95'])} "
+              f"{ms(row['max'])} {row['model_calls']:>6} {row['peak_rss_mb']:6.0f}MB")
+        if row["p95"] > args.max_p95:
+            print(f"p95 latency {row['p95']:.2f}s passed {args.max_p95:g}s at {sessions} users")
+            break
+    return report, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app end to end against a fake Gemini backend.")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Gemini seconds per reply")
+    parser.add_argument("--reruns", type=int, default=5, help="full reruns per tab measurement")
+    parser.add_argument("--questions", type=int, default=20, help="questions per session")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000],
+                        help="history and favorites sizes to render")
+    parser.add_argument("--load", type=int, nargs="+", help="run the multi-session mode with these user counts")
+    parser.add_argument("--max-p95", type=float, default=5.0, help="load mode: stop once p95 latency exceeds this")
+    parser.add_argument("--max-concurrent", type=int, help="override GEMINI_MAX_CONCURRENT")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--params", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scenario:
+        run_in_this_process(args.scenario, json.loads(args.params))
+        return 0
+
+    report, errors = run_load(args) if args.load else run_suite(args)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for error in dict.fromkeys(errors):
+        print(f"exception: {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
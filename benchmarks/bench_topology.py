@@ -0,0 +1,119 @@
+"""Network Topology benchmark.
+
+Usage:
+    python benchmarks/bench_topology.py [--hosts 100 1000 5000] [--max-ms 1500]
+
+Generates `arp -a`, Get-NetRoute and Get-NetIPConfiguration output for a
+network of growing size and times each stage of building the map: parsing,
+graph construction, the first layout, a cached layout, an incremental layout
+after one new host, and the SVG render. When matplotlib is installed, the
+old spring_layout + 10x8 figure path is timed alongside on the smaller sizes.
+Exits non-zero if regenerating the largest map after one new host (build,
+layout and render) takes longer than --max-ms.
+"""
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from topology import (  # noqa: E402
+    LayoutCache,
+    build_topology,
+    parse_arp,
+    parse_ip_configuration,
+    parse_routes,
+    render_svg,
+)
+
+HOSTS_PER_SUBNET = 200
+LEGACY_MAX_NODES = 1000
+
+
+def synthetic_outputs(hosts):
+    subnets = max(1, -(-hosts // HOSTS_PER_SUBNET))
+    arp = []
+    routes = ["DestinationPrefix  NextHop      RouteMetric", "-----------------  -------      -----------"]
+    for s in range(subnets):
+        arp.append(f"\nInterface: 10.{s}.0.10 --- 0x{s + 1:x}")
+        arp.append("  Internet Address      Physical Address      Type")
+        routes.append(f"10.{s}.0.0/16       0.0.0.0              256")
+        for h in range(min(HOSTS_PER_SUBNET, hosts - s * HOSTS_PER_SUBNET)):
+            ip = f"10.{s}.{h // 250}.{h % 250 + 2}"
+            arp.append(f"  {ip:<22}00-15-5d-{s % 256:02x}-{h // 256:02x}-{h % 256:02x}     dynamic")
+    routes.append("0.0.0.0/0          10.0.0.1               0")
+    ipconfig = "\nInterfaceAlias       : Ethernet\nIPv4Address          : 10.0.0.10\n" \
+               "IPv4DefaultGateway   : 10.0.0.1\nDNSServer            : 10.0.0.53\n                       8.8.8.8\n"
+    return "\n".join(arp), "\n".join(routes), ipconfig
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def legacy_render(G):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    plt.figure(figsize=(10, 8))
+    pos = nx.spring_layout(G)
+    nx.draw(G, pos, with_labels=True, node_color="lightblue", node_size=2000, font_size=10, font_weight="bold")
+    plt.savefig(io.BytesIO(), format="png")
+    plt.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Network Topology parsing, layout and rendering.")
+    parser.add_argument("--hosts", type=int, nargs="+", default=[100, 1000, 5000], help="network sizes to test")
+    parser.add_argument("--max-ms", type=float, default=1500.0, help="fail if an incremental regenerate is slower")
+    args = parser.parse_args(argv)
+
+    try:
+        import matplotlib  # noqa: F401
+        legacy = True
+    except ImportError:
+        legacy = False
+        print("matplotlib not installed; skipping the old render path")
+
+    print(f"{'hosts':>6} {'nodes':>6} {'parse':>8} {'build':>8} {'layout':>8} {'cached':>8} "
+          f"{'incr':>8} {'svg':>8} {'svg KB':>7} {'legacy':>8}")
+    regenerate_ms = 0.0
+    for hosts in args.hosts:
+        arp_text, route_text, ipconfig_text = synthetic_outputs(hosts)
+        (arp, routes, configs), parse_ms = timed(
+            lambda: (parse_arp(arp_text), parse_routes(route_text), parse_ip_configuration(ipconfig_text))
+        )
+        G, build_ms = timed(build_topology, arp, routes, configs)
+        cache = LayoutCache()
+        _, layout_ms = timed(cache.layout, G)
+        _, cached_ms = timed(cache.layout, G)
+
+        # One new host, as when the ARP table is pasted again a few minutes later
+        arp.append({"interface": "10.0.0.10", "ip": "10.0.3.251", "mac": "00-15-5d-ff-ff-ff", "type": "dynamic"})
+        started = time.perf_counter()
+        G = build_topology(arp, routes, configs)
+        pos = cache.layout(G)
+        incremental_ms = (time.perf_counter() - started) * 1000
+        svg, svg_ms = timed(render_svg, G, pos)
+        regenerate_ms = incremental_ms + svg_ms
+
+        legacy_ms = ""
+        if legacy and G.number_of_nodes() <= LEGACY_MAX_NODES:
+            legacy_ms = f"{timed(legacy_render, G)[1]:.1f}"
+        print(f"{hosts:>6} {G.number_of_nodes():>6} {parse_ms:>8.1f} {build_ms:>8.1f} {layout_ms:>8.1f} "
+              f"{cached_ms:>8.2f} {incremental_ms:>8.1f} {svg_ms:>8.1f} {len(svg) / 1024:>7.0f} {legacy_ms:>8}")
+
+    if regenerate_ms > args.max_ms:
+        print(f"FAIL: regenerating the largest map took {regenerate_ms:.1f}ms, over {args.max_ms:.1f}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
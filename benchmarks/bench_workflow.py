@@ -0,0 +1,112 @@
+"""Troubleshooting workflow runner benchmark.
+
+Usage:
+    python benchmarks/bench_workflow.py [--duration 0.4]
+
+Runs the Network Connectivity workflow against replayed outputs and a stub
+model, in three scenarios: ping succeeds (tracert is skipped), ping fails
+(tracert runs), and ipconfig fails (the workflow stops after it). Checks
+that independent steps overlap, that every step records its duration, and
+that the whole run costs one model call. Exits non-zero if any check fails.
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from diagnostics import ReplayExecutor  # noqa: E402
+from workflow import run_workflow, summarize_workflow  # noqa: E402
+
+# Same shape as the "Network Connectivity" workflow in main.py
+STEPS = [
+    {"id": "config", "command": "ipconfig /all", "description": "Check network configuration",
+     "stop_if": ("failed", "error")},
+    {"id": "ping", "command": "ping 8.8.8.8", "description": "Test internet connectivity", "after": ["config"]},
+    {"id": "dns", "command": "nslookup google.com", "description": "Test DNS resolution", "after": ["config"]},
+    {"id": "tracert", "command": "tracert 8.8.8.8", "description": "Check network path",
+     "when": {"ping": ("failed", "timeout")}},
+]
+OVERHEAD_TOLERANCE = 0.3
+
+
+class StubModel:
+    """Counts calls and echoes how many steps the prompt contained."""
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def start_chat(self):
+        return self
+
+    def send_message(self, prompt, **kwargs):
+        with self._lock:
+            self.prompts.append(prompt)
+        return type("Response", (), {"text": f"{prompt.count('## ')} steps summarized"})()
+
+
+def recordings(duration, config_exit=0, ping_exit=0):
+    return {
+        "ipconfig /all": {"output": "Ethernet adapter Ethernet:\n   IPv4 Address: 192.168.1.10\n",
+                          "exit_code": config_exit, "duration": duration / 2},
+        "ping 8.8.8.8": {"output": "Reply from 8.8.8.8: bytes=32 time=12ms TTL=117\n" * 4 if ping_exit == 0
+                         else "Request timed out.\n" * 4, "exit_code": ping_exit, "duration": duration},
+        "nslookup google.com": {"output": "Name: google.com\nAddress: 142.250.80.46\n", "exit_code": 0,
+                                "duration": duration},
+        "tracert 8.8.8.8": {"output": "  1  <1 ms  192.168.1.1\n  2  *  *  *  Request timed out.\n",
+                            "exit_code": 0, "duration": duration},
+    }
+
+
+def run(duration, **outcomes):
+    executor = ReplayExecutor(recordings(duration, **outcomes))
+    results = {}
+    started = time.perf_counter()
+    for kind, step_id, payload in run_workflow(STEPS, executor, host="replay"):
+        if kind == "done":
+            results[step_id] = payload
+    elapsed = time.perf_counter() - started
+    model = StubModel()
+    summary = summarize_workflow(model, "Network Connectivity", STEPS, results)
+    return results, elapsed, model, summary
+
+
+def check(label, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {label:36} {detail}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the troubleshooting workflow runner.")
+    parser.add_argument("--duration", type=float, default=0.4, help="seconds each replayed step takes")
+    args = parser.parse_args(argv)
+    d = args.duration
+    statuses = lambda results: {step_id: result["status"] for step_id, result in results.items()}
+
+    results, elapsed, model, summary = run(d)
+    passed = check("ping ok: tracert skipped", statuses(results) == {
+        "config": "ok", "ping": "ok", "dns": "ok", "tracert": "skipped"}, statuses(results))
+    # config, then ping and dns side by side: 1.5 durations rather than 2.5
+    passed &= check("ping ok: ping and dns overlap", elapsed < 1.5 * d + OVERHEAD_TOLERANCE, f"{elapsed:.2f}s wall")
+    passed &= check("ping ok: durations recorded", all(
+        results[s]["elapsed"] > 0 for s in ("config", "ping", "dns")),
+        ", ".join(f"{s} {r['elapsed']:.2f}s" for s, r in results.items()))
+    passed &= check("ping ok: one model call", len(model.prompts) == 1 and summary == "3 steps summarized", summary)
+
+    results, elapsed, model, summary = run(d, ping_exit=1)
+    passed &= check("ping failed: tracert runs", statuses(results)["tracert"] == "ok", statuses(results))
+    passed &= check("ping failed: one model call", len(model.prompts) == 1 and summary == "4 steps summarized",
+                    f"{summary}, {elapsed:.2f}s wall")
+
+    results, elapsed, model, summary = run(d, config_exit=1)
+    passed &= check("ipconfig failed: workflow stops", statuses(results) == {
+        "config": "failed", "ping": "skipped", "dns": "skipped", "tracert": "skipped"}, statuses(results))
+    passed &= check("ipconfig failed: stops early", elapsed < d / 2 + OVERHEAD_TOLERANCE, f"{elapsed:.2f}s wall")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
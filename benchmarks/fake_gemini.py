@@ -0,0 +1,121 @@
+"""Deterministic stand-in for google.generativeai, for benchmarks.
+
+install() replaces genai.GenerativeModel and genai.configure, so the app's
+own get_model() builds a FakeModel and no request leaves the machine. When
+the SDK is not installed, a module with just those two names is registered
+in its place.
+
+Settings come from the arguments or from the environment, so a benchmark
+can configure the fake inside a fresh interpreter:
+
+    FAKE_GEMINI_LATENCY   seconds per reply (default 0.2)
+    FAKE_GEMINI_JITTER    +/- fraction of the latency, fixed per prompt (default 0.25)
+    FAKE_GEMINI_OUTPUTS   JSON file with a list of reply texts (default: built in)
+    FAKE_GEMINI_CHUNKS    chunks per streamed reply (default 8)
+"""
+import json
+import os
+import sys
+import threading
+import time
+import types
+import zlib
+
+DEFAULT_OUTPUTS = [
+    "ipconfig /flushdns\nFlushes the DNS resolver cache.\nSecurity Note: Requires an elevated prompt.\n"
+    "Alternatives: Restart the DNS Client service.",
+    "[Command]\n```powershell\nGet-NetTCPConnection -State Listen\n```\n[Explanation]\nLists listening ports "
+    "and the processes that own them.\n[Security Note]\nRead-only.\n[Alternatives]\n- Resource Monitor",
+    "**Command:** `Test-NetConnection -ComputerName server01 -Port 443`\n\n**Explanation:** Checks that a TCP "
+    "port is reachable.\n\n**Security Note:** None.\n**Alternatives:** telnet, PortQry",
+]
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeChat:
+    def __init__(self, model):
+        self.model = model
+
+    def send_message(self, prompt, stream=False, **kwargs):
+        return self.model.reply(prompt, stream)
+
+
+class FakeModel:
+    """Answers every prompt with one of `outputs`, chosen by a hash of the prompt."""
+
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model_name=None, generation_config=None, latency=None, jitter=None, outputs=None,
+                 chunks=None, sleep=time.sleep, **kwargs):
+        self.latency = float(os.environ.get("FAKE_GEMINI_LATENCY", "0.2")) if latency is None else latency
+        self.jitter = float(os.environ.get("FAKE_GEMINI_JITTER", "0.25")) if jitter is None else jitter
+        self.outputs = outputs or _load_outputs()
+        self.chunks = int(os.environ.get("FAKE_GEMINI_CHUNKS", "8")) if chunks is None else chunks
+        self.sleep = sleep
+
+    def start_chat(self, **kwargs):
+        return FakeChat(self)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        return self.reply(prompt, stream)
+
+    def reply(self, prompt, stream=False):
+        with FakeModel._lock:
+            FakeModel.calls += 1
+        digest = zlib.crc32(prompt.encode("utf-8"))
+        text = self.outputs[digest % len(self.outputs)]
+        latency = self.latency * (1 + self.jitter * ((digest % 2001) / 1000 - 1))
+        usage = FakeUsage(len(prompt) // 4, len(text) // 4)
+        if not stream:
+            self.sleep(latency)
+            return FakeResponse(text, usage)
+        return self._stream(text, latency, usage)
+
+    def _stream(self, text, latency, usage):
+        step = max(1, -(-len(text) // self.chunks))
+        pieces = [text[i:i + step] for i in range(0, len(text), step)]
+        for i, piece in enumerate(pieces):
+            self.sleep(latency / len(pieces))
+            yield FakeResponse(piece, usage if i == len(pieces) - 1 else None)
+
+
+def _load_outputs():
+    path = os.environ.get("FAKE_GEMINI_OUTPUTS")
+    if not path:
+        return DEFAULT_OUTPUTS
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def install(**settings):
+    """Points google.generativeai at FakeModel; settings override the environment."""
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        google = sys.modules.get("google") or types.ModuleType("google")
+        if not hasattr(google, "__path__"):
+            google.__path__ = []
+        genai = types.ModuleType("google.generativeai")
+        google.generativeai = genai
+        sys.modules.setdefault("google", google)
+        sys.modules["google.generativeai"] = genai
+
+    class ConfiguredFakeModel(FakeModel):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **dict(kwargs, **settings))
+
+    genai.GenerativeModel = ConfiguredFakeModel if settings else FakeModel
+    genai.configure = lambda **kwargs: None
+    return genai
@@ -0,0 +1,74 @@
+import html
+import json
+
+DEFAULT_FEEDBACK_MS = 2000
+
+# Runs in the browser, inside the component's iframe. flash() shows a toast
+# and hides it again on a browser timer, so feedback never holds up a
+# script run; copy() uses the Clipboard API with the older execCommand
+# fallback for pages served over plain HTTP.
+_SCRIPT = """
+const toast = document.getElementById("toast");
+let hideTimer = null;
+function flash(message, ok, durationMs) {
+  toast.textContent = message;
+  toast.className = "toast show " + (ok ? "ok" : "error");
+  clearTimeout(hideTimer);
+  hideTimer = setTimeout(() => { toast.className = "toast"; }, durationMs);
+}
+function fallbackCopy(text) {
+  const area = document.createElement("textarea");
+  area.value = text;
+  area.style.position = "fixed";
+  area.style.opacity = "0";
+  document.body.appendChild(area);
+  area.select();
+  const copied = document.execCommand("copy");
+  document.body.removeChild(area);
+  return copied;
+}
+async function copy(text, okMessage, errorMessage, durationMs) {
+  let copied = false;
+  try {
+    await navigator.clipboard.writeText(text);
+    copied = true;
+  } catch (e) {
+    copied = fallbackCopy(text);
+  }
+  flash(copied ? okMessage : errorMessage, copied, durationMs);
+}
+"""
+
+_STYLE = """
+body { margin: 0; font-family: "Source Sans Pro", sans-serif; background: transparent; }
+button {
+  padding: 0.35rem 0.75rem; border-radius: 0.5rem; cursor: pointer; font-size: 0.95rem;
+  border: 1px solid rgba(250, 250, 250, 0.2); background: #262730; color: #FAFAFA;
+}
+button:hover { border-color: #FF4B4B; color: #FF4B4B; }
+.toast {
+  display: inline-block; margin-left: 10px; padding: 5px 8px; border-radius: 4px; color: white;
+  opacity: 0; transition: opacity 0.3s;
+}
+.toast.show { opacity: 1; }
+.toast.ok { background: #2E7D32; }
+.toast.error { background: #C62828; }
+"""
+
+
+def _js(value):
+    # json.dumps gives a valid JS string literal; "</" is escaped so the text can't close the script tag
+    return json.dumps(value).replace("</", "<\\/")
+
+
+def copy_button_html(text, label="📋 Copy command", message="Copied!", error_message="Copy failed",
+                     duration_ms=DEFAULT_FEEDBACK_MS):
+    """A button that copies `text` to the clipboard in the browser and briefly confirms it."""
+    return (
+        f"<style>{_STYLE}</style>"
+        f'<button id="copy">{html.escape(label)}</button><span id="toast" class="toast"></span>'
+        f"<script>{_SCRIPT}"
+        f'document.getElementById("copy").addEventListener("click", () => '
+        f"copy({_js(text)}, {_js(message)}, {_js(error_message)}, {int(duration_ms)}));"
+        f"</script>"
+    )
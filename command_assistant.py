@@ -0,0 +1,142 @@
+import json
+import re
+
+from instrumentation import record_usage, stage_timer
+from response_parser import StreamingResponseParser, parse_streamed_response
+
+# Shared by the Streamlit app and the headless batch runner
+
+MODEL_NAME = "gemini-1.5-flash"
+
+# Model configuration
+generation_config = {
+    "temperature": 0.7,
+    "max_output_tokens": 512,
+    "response_mime_type": "text/plain",
+}
+
+# Enhanced prompt with network command context
+PROMPT_TEMPLATE = """For Windows network/IP commands: {question}
+        - Prioritize PowerShell over CMD
+        - Include security warnings for dangerous commands
+        - Suggest alternative GUI tools where applicable
+        Format: [Command]\n[Explanation]\n[Security Note]\n[Alternatives]"""
+
+# Structured mode asks Gemini for JSON matching this schema instead of free text
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "command": {"type": "string"},
+        "explanation": {"type": "string"},
+        "security_note": {"type": "string"},
+        "alternatives": {"type": "string"},
+    },
+    "required": ["command", "explanation"],
+}
+
+structured_generation_config = dict(
+    generation_config,
+    response_mime_type="application/json",
+    response_schema=RESPONSE_SCHEMA,
+)
+
+STRUCTURED_PROMPT_TEMPLATE = """For Windows network/IP commands: {question}
+        - Prioritize PowerShell over CMD
+        - Include security warnings for dangerous commands
+        - Suggest alternative GUI tools where applicable
+        Respond with the command, an explanation, a security note and GUI alternatives."""
+
+SAFE_INPUT_REGEX = r"^[a-zA-Z0-9\-\.\:\/\s]{1,100}$"
+
+INVALID_INPUT_RESPONSE = {
+    "command": None,
+    "explanation": "Invalid input detected. Only alphanumeric characters and common network symbols allowed.",
+}
+
+UNPARSED_RESPONSE = {"command": None, "explanation": "Could not extract command from response."}
+
+
+SAFE_INPUT_PATTERN = re.compile(SAFE_INPUT_REGEX)
+JSON_FENCE_REGEX = re.compile(r"^```(?:json)?|```$")
+
+
+def is_valid_question(question):
+    # Validate input for network commands
+    return bool(SAFE_INPUT_PATTERN.match(question))
+
+
+def build_prompt(question, structured=False):
+    template = STRUCTURED_PROMPT_TEMPLATE if structured else PROMPT_TEMPLATE
+    return template.format(question=question)
+
+
+def prompt_settings(structured=False):
+    # What an answer depends on, for cache keys
+    if structured:
+        return STRUCTURED_PROMPT_TEMPLATE, structured_generation_config
+    return PROMPT_TEMPLATE, generation_config
+
+
+def estimate_tokens(question, structured=False):
+    # Rough budget for rate limiting: ~4 characters per prompt token plus the longest reply
+    return len(build_prompt(question, structured)) // 4 + generation_config["max_output_tokens"]
+
+
+def parse_response_text(text):
+    # Line-based, so parse time stays linear however the model formats its reply
+    sections = parse_streamed_response([text])
+    if not sections["command"]:
+        return dict(UNPARSED_RESPONSE)
+    return sections
+
+
+def parse_json_response(text):
+    try:
+        data = json.loads(JSON_FENCE_REGEX.sub("", text.strip()))
+    except (ValueError, RecursionError):
+        # Models occasionally ignore the mime type; the text parser still has a go
+        return parse_response_text(text)
+    if not isinstance(data, dict) or not isinstance(data.get("command"), str) or not data["command"].strip():
+        return dict(UNPARSED_RESPONSE)
+    response = {"command": data["command"].replace("`", "").strip()}
+    for field in ("explanation", "security_note", "alternatives"):
+        value = data.get(field)
+        if isinstance(value, list):
+            value = "\n".join(str(item) for item in value)
+        response[field] = value.strip() if isinstance(value, str) else ""
+    return response
+
+
+def ask_model(model, question, on_update=None, structured=False, metrics=None):
+    # Errors propagate so callers can decide between retrying and reporting
+    with stage_timer(metrics, "start_chat"):
+        chat_session = model.start_chat()
+    prompt = build_prompt(question, structured)
+
+    if structured:
+        with stage_timer(metrics, "send_message"):
+            response = chat_session.send_message(prompt, generation_config=structured_generation_config)
+        record_usage(metrics, response)
+        with stage_timer(metrics, "parse"):
+            return parse_json_response(response.text)
+
+    if on_update is None:
+        with stage_timer(metrics, "send_message"):
+            response = chat_session.send_message(prompt)
+        record_usage(metrics, response)
+        with stage_timer(metrics, "parse"):
+            return parse_response_text(response.text)
+
+    parser = StreamingResponseParser()
+    chunk = None
+    with stage_timer(metrics, "send_message"):
+        for chunk in chat_session.send_message(prompt, stream=True):
+            parser.feed(chunk.text)
+            on_update(parser.snapshot())
+    # The last chunk of a stream carries the usage totals
+    record_usage(metrics, chunk)
+    with stage_timer(metrics, "parse"):
+        sections = parser.close()
+    if not sections["command"]:
+        return dict(UNPARSED_RESPONSE)
+    return sections
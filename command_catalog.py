@@ -0,0 +1,43 @@
+# The sidebar's troubleshooting catalog. It lives outside main.py so batch.py
+# can warm the answer cache for it without starting Streamlit.
+TROUBLESHOOTING_CATEGORIES = {
+    "Network": {
+        "Connectivity": ["ping", "tracert", "nslookup", "ipconfig", "netstat"],
+        "WiFi": ["netsh wlan show", "netsh wlan connect", "netsh wlan disconnect"],
+        "DNS": ["ipconfig /flushdns", "nslookup", "dig"],
+        "Firewall": ["netsh advfirewall", "Get-NetFirewallRule"],
+    },
+    "System": {
+        "Performance": ["tasklist", "perfmon", "systeminfo"],
+        "Services": ["services.msc", "net start", "net stop"],
+        "Updates": ["wuauclt", "UsoClient"],
+        "Logs": ["eventvwr.msc", "Get-EventLog", "Get-WinEvent"],
+    },
+    "Storage": {
+        "Disk": ["chkdsk", "diskpart", "defrag"],
+        "File System": ["sfc /scannow", "DISM.exe"],
+        "Permissions": ["icacls", "takeown"],
+    },
+    "Security": {
+        "Malware": ["MRT.exe", "Windows Defender commands"],
+        "Accounts": ["net user", "net localgroup"],
+        "Auditing": ["auditpol", "secpol.msc"],
+    }
+}
+
+# What the sidebar asks when a command is picked; prefetched answers are cached under the same text
+SIDEBAR_QUESTION = "Explain how to use {command} command"
+
+
+def sidebar_question(command):
+    return SIDEBAR_QUESTION.format(command=command)
+
+
+def catalog_questions(categories=TROUBLESHOOTING_CATEGORIES):
+    # Every question the sidebar can ask, once each; some commands appear under several tools
+    questions = {}
+    for subcategories in categories.values():
+        for commands in subcategories.values():
+            for command in commands:
+                questions.setdefault(sidebar_question(command), None)
+    return list(questions)
@@ -0,0 +1,210 @@
+import bisect
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from help_docs import help_topics
+
+# Letters and digits are separate tokens, so "host4012" is findable as "host" and "4012"
+TOKEN_REGEX = re.compile(r"[a-z]+|[0-9]+")
+MIN_FUZZY_SIMILARITY = 0.45
+MAX_PREFIX_EXPANSIONS = 50
+MAX_FUZZY_EXPANSIONS = 10
+
+# Weight of a query term that hits a token exactly, by prefix, or by trigram similarity
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+
+# Built-in commands rank above favorites and history when scores tie
+KIND_PRIORITY = {"catalog": 3, "help": 3, "favorite": 2, "history": 1}
+
+
+def tokenize(text):
+    return TOKEN_REGEX.findall(text.lower())
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b):
+    # Levenshtein distance that counts an adjacent transposition as one edit
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Inverted index over commands with prefix and trigram fuzzy matching.
+
+    Each document has a command, a title and a source label. Postings map
+    tokens to document ids, and a second index from trigrams to word tokens
+    finds misspelled terms. Adding a document only appends to the postings of
+    its own tokens, so the index grows with history without being rebuilt.
+    Scoring runs on numpy arrays, so a query costs about the same whether a
+    term hits ten documents or tens of thousands.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = []
+        self._keys = {}
+        self._postings = defaultdict(list)
+        self._posting_arrays = {}
+        self._vocabulary = []
+        self._token_trigrams = defaultdict(set)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._rank = np.zeros(1024, dtype=np.int64)
+        self._sync_lock = threading.Lock()
+        self._history_id = 0
+        self._help_version = None
+
+    def __len__(self):
+        return int(self._alive[:len(self._docs)].sum())
+
+    def _static_rank(self, kind, order):
+        # Tie-breaker after match quality: kind first, then most recently added or used
+        return KIND_PRIORITY.get(kind, 0) << 40 | order
+
+    def add(self, command, title="", source="", kind="catalog", key=None, text=""):
+        """Indexes a document; adding an existing key again marks it as recently used.
+
+        `text` is searched but not kept with the document.
+        """
+        key = key or (kind, command)
+        with self._lock:
+            doc_id = self._keys.get(key)
+            if doc_id is not None:
+                self._docs[doc_id]["hits"] += 1
+                self._rank[doc_id] = self._static_rank(kind, len(self._docs) + self._docs[doc_id]["hits"])
+                return doc_id
+
+            doc_id = len(self._docs)
+            if doc_id == len(self._alive):
+                self._alive = np.concatenate((self._alive, np.zeros(doc_id, dtype=bool)))
+                self._rank = np.concatenate((self._rank, np.zeros(doc_id, dtype=np.int64)))
+            self._keys[key] = doc_id
+            self._docs.append({"command": command, "title": title, "source": source, "kind": kind, "hits": 1})
+            self._alive[doc_id] = True
+            self._rank[doc_id] = self._static_rank(kind, doc_id)
+            for token in set(tokenize(f"{title} {command} {source} {text}")):
+                postings = self._postings[token]
+                if not postings:
+                    bisect.insort(self._vocabulary, token)
+                    if not token.isdigit():
+                        for gram in trigrams(token):
+                            self._token_trigrams[gram].add(token)
+                postings.append(doc_id)
+            return doc_id
+
+    def remove(self, key):
+        with self._lock:
+            doc_id = self._keys.pop(key, None)
+            if doc_id is not None:
+                self._alive[doc_id] = False
+
+    def sync_history(self, store, user_id=None):
+        # Picks up the user's commands saved since the last call, by this or any other session
+        with self._sync_lock:
+            for entry in store.iter_entries(after_id=self._history_id, user_id=user_id):
+                self.add(entry["command"], entry["explanation"][:80], "Command History", kind="history")
+                self._history_id = entry["id"]
+
+    def sync_help(self, guide):
+        # Help documents carry their section id as the command; reindexed when the guide changes
+        with self._sync_lock:
+            # One snapshot, so the topics and their sections come from the same parse
+            version, sections = guide.snapshot()
+            if version == self._help_version:
+                return
+            self.remove_kind("help")
+            for section_id in help_topics(sections):
+                section = sections[section_id]
+                self.add(section_id, section["title"], "Help", kind="help", text=section["body"])
+            self._help_version = version
+
+    def remove_kind(self, kind):
+        # Postings keep the ids; dead documents are masked out at query time
+        with self._lock:
+            for key, doc_id in list(self._keys.items()):
+                if self._docs[doc_id]["kind"] == kind:
+                    del self._keys[key]
+                    self._alive[doc_id] = False
+
+    def _posting_array(self, token):
+        postings = self._postings[token]
+        array = self._posting_arrays.get(token)
+        if array is None or len(array) != len(postings):
+            array = np.fromiter(postings, dtype=np.int64, count=len(postings))
+            self._posting_arrays[token] = array
+        return array
+
+    def _expand(self, term):
+        # Query term -> {vocabulary token: weight}
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT_WEIGHT
+        start = bisect.bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            matches.setdefault(token, PREFIX_WEIGHT * len(term) / len(token))
+        if len(term) >= 3 and not term.isdigit() and len(matches) < MAX_FUZZY_EXPANSIONS:
+            grams = trigrams(term)
+            shared = defaultdict(int)
+            for gram in grams:
+                for token in self._token_trigrams.get(gram, ()):
+                    shared[token] += 1
+            scored = []
+            for token, count in shared.items():
+                if token in matches:
+                    continue
+                similarity = count / (len(grams) + len(token) + 1 - count)
+                # Trigrams are too coarse for a single typo in a short word ("pign" vs "ping")
+                if (similarity < MIN_FUZZY_SIMILARITY and len(term) <= 8 and abs(len(token) - len(term)) <= 1
+                        and edit_distance(term, token) == 1):
+                    similarity = 1.0 - 1.0 / max(len(term), len(token))
+                if similarity >= MIN_FUZZY_SIMILARITY:
+                    scored.append((similarity, token))
+            for similarity, token in heapq.nlargest(MAX_FUZZY_EXPANSIONS, scored):
+                matches[token] = FUZZY_WEIGHT * similarity
+        return matches
+
+    def search(self, query, limit=10):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            size = len(self._docs)
+            matched = np.zeros(size, dtype=np.int32)
+            totals = np.zeros(size, dtype=np.float32)
+            for term in terms:
+                best = np.zeros(size, dtype=np.float32)
+                for token, weight in self._expand(term).items():
+                    postings = self._posting_array(token)
+                    best[postings] = np.maximum(best[postings], weight)
+                matched += best > 0
+                totals += best
+
+            alive = self._alive[:size]
+            # Documents matching every term outrank those matching only some
+            candidates = np.flatnonzero(alive & (matched == matched[alive].max(initial=0)) & (matched > 0))
+            if not len(candidates):
+                return []
+            order = np.lexsort((-self._rank[candidates], -np.round(totals[candidates], 3)))[:limit]
+            return [
+                dict(self._docs[doc_id], score=float(totals[doc_id]) / len(terms))
+                for doc_id in candidates[order].tolist()
+            ]
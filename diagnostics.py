@@ -0,0 +1,318 @@
+import codecs
+import json
+import locale
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = int(os.environ.get("DIAGNOSTIC_MAX_WORKERS", "4"))
+DEFAULT_TIMEOUT = float(os.environ.get("DIAGNOSTIC_TIMEOUT", "60"))
+DEFAULT_MAX_OUTPUT_BYTES = int(os.environ.get("DIAGNOSTIC_MAX_OUTPUT_BYTES", str(256 * 1024)))
+DEFAULT_CACHE_TTL = float(os.environ.get("DIAGNOSTIC_CACHE_TTL", "300"))
+READ_CHUNK_SIZE = 4096
+# Executors that can't be interrupted get this long past their timeout before being abandoned
+TIMEOUT_GRACE = 2.0
+
+
+class LocalExecutor:
+    """Runs commands through the local shell, streaming output as it is read.
+
+    stderr is merged into stdout, so output arrives in the order the command
+    wrote it. A command is killed, together with anything it started, when it
+    passes its timeout or writes more than max_output_bytes.
+    """
+
+    def __init__(self, encoding=None):
+        # Console tools write in the OEM code page on Windows
+        self.encoding = encoding or ("oem" if os.name == "nt" else locale.getpreferredencoding(False))
+
+    def run(self, command, emit, timeout=DEFAULT_TIMEOUT, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+        if os.name == "nt":
+            kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            kwargs = {"start_new_session": True}
+        process = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, **kwargs)
+        state = {"timed_out": False, "truncated": False}
+
+        def kill(reason):
+            state[reason] = True
+            _kill_tree(process)
+
+        timer = threading.Timer(timeout, kill, args=("timed_out",))
+        timer.daemon = True
+        timer.start()
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        chunks = []
+        size = 0
+        try:
+            while True:
+                data = os.read(process.stdout.fileno(), READ_CHUNK_SIZE)
+                if not data:
+                    break
+                if size + len(data) > max_output_bytes:
+                    data = data[:max_output_bytes - size]
+                    kill("truncated")
+                size += len(data)
+                text = decoder.decode(data)
+                if text:
+                    chunks.append(text)
+                    emit(text)
+                if state["truncated"]:
+                    break
+            exit_code = process.wait()
+        finally:
+            timer.cancel()
+            process.stdout.close()
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            chunks.append(tail)
+            emit(tail)
+        return {"exit_code": exit_code, "output": "".join(chunks), **state}
+
+
+def _kill_tree(process):
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        process.kill()
+
+
+class RemoteExecutor:
+    """Runs commands on one host through a remote_exec.SessionPool.
+
+    WinRM returns a command's output only once it has finished, so the
+    output is emitted in one piece. A call can't be interrupted, so past the
+    timeout it is left to finish in the background and its session is
+    discarded instead of being returned to the pool.
+    """
+
+    def __init__(self, pool, host):
+        self.pool = pool
+        self.host = host
+
+    def run(self, command, emit, timeout=DEFAULT_TIMEOUT, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+        state = {"abandoned": False}
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def call():
+            try:
+                session = self.pool.acquire(self.host)
+            except Exception as e:
+                state["error"] = e
+                done.set()
+                return
+            try:
+                state["result"] = self.pool.transport.run(session, command)
+            except Exception as e:
+                self.pool.discard(self.host, session)
+                state["error"] = e
+            else:
+                with lock:
+                    abandoned = state["abandoned"]
+                if abandoned:
+                    self.pool.discard(self.host, session)
+                else:
+                    self.pool.release(self.host, session)
+            done.set()
+
+        threading.Thread(target=call, name=f"remote-{self.host}", daemon=True).start()
+        if not done.wait(timeout):
+            with lock:
+                state["abandoned"] = True
+            return {"exit_code": None, "output": "", "timed_out": True, "truncated": False}
+        if "error" in state:
+            raise state["error"]
+        result = state["result"]
+        output = result["stdout"] + (f"\n{result['stderr']}" if result["stderr"] else "")
+        truncated = len(output.encode("utf-8")) > max_output_bytes
+        if truncated:
+            output = output.encode("utf-8")[:max_output_bytes].decode("utf-8", errors="ignore")
+        emit(output)
+        return {"exit_code": result["exit_code"], "output": output, "timed_out": False, "truncated": truncated}
+
+
+class ReplayExecutor:
+    """Plays back recorded command output, so the engine runs anywhere.
+
+    recordings maps a command to {"output", "exit_code", "duration"}; the
+    output is emitted in chunks spread over the duration. Commands without a
+    recording get a short generated output with a stable pseudo-random
+    duration of up to max_duration seconds.
+    """
+
+    def __init__(self, recordings=None, max_duration=1.5, chunks=5, sleep=time.sleep):
+        self.recordings = recordings or {}
+        self.max_duration = max_duration
+        self.chunks = chunks
+        self.sleep = sleep
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def recording(self, command):
+        if command in self.recordings:
+            return self.recordings[command]
+        fraction = (zlib.crc32(command.encode("utf-8")) % 1000) / 1000
+        lines = "".join(f"{command.split()[0]}: sample line {i + 1}\n" for i in range(self.chunks * 2))
+        return {"output": lines, "exit_code": 0, "duration": fraction * self.max_duration}
+
+    def run(self, command, emit, timeout=DEFAULT_TIMEOUT, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+        recording = self.recording(command)
+        output = recording.get("output", "").encode("utf-8")
+        delay = recording.get("duration", 0.0) / self.chunks
+        step = max(1, -(-len(output) // self.chunks))
+        sent = b""
+        elapsed = 0.0
+        for start in range(0, len(output), step):
+            if elapsed + delay > timeout:
+                self.sleep(timeout - elapsed)
+                return {"exit_code": None, "output": sent.decode("utf-8", errors="ignore"),
+                        "timed_out": True, "truncated": False}
+            self.sleep(delay)
+            elapsed += delay
+            chunk = output[start:start + step][:max_output_bytes - len(sent)]
+            sent += chunk
+            emit(chunk.decode("utf-8", errors="ignore"))
+            if len(sent) >= max_output_bytes and start + step < len(output):
+                return {"exit_code": None, "output": sent.decode("utf-8", errors="ignore"),
+                        "timed_out": False, "truncated": True}
+        return {"exit_code": recording.get("exit_code", 0), "output": sent.decode("utf-8", errors="ignore"),
+                "timed_out": False, "truncated": False}
+
+
+class ResultCache:
+    """Finished diagnostic results keyed by (scope, host, command), each kept for ttl seconds.
+
+    The scope separates results fetched with different credentials, so one
+    session's remote results are never served to another's.
+    """
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, host, command, scope=None):
+        key = (scope, host, command)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            return dict(entry[1], cached=True, age=round(self.clock() - entry[0], 1))
+
+    def put(self, host, command, result, scope=None):
+        with self._lock:
+            self._entries[(scope, host, command)] = (self.clock(), result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _result(name, host, command, status, elapsed, exit_code=None, output="", truncated=False, error=None):
+    return {
+        "name": name,
+        "host": host,
+        "command": command,
+        "status": status,
+        "exit_code": exit_code,
+        "elapsed": round(elapsed, 3),
+        "output": output,
+        "truncated": truncated,
+        "error": error,
+        "cached": False,
+    }
+
+
+def run_command(executor, name, command, emit, host="localhost", timeout=DEFAULT_TIMEOUT,
+                max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES, clock=time.monotonic):
+    # Runs one command to completion and turns the executor's outcome into a result
+    started = clock()
+    try:
+        outcome = executor.run(command, emit, timeout=timeout, max_output_bytes=max_output_bytes)
+    except Exception as e:
+        return _result(name, host, command, "error", clock() - started, error=str(e))
+    if outcome["timed_out"]:
+        status = "timeout"
+    else:
+        status = "ok" if outcome["exit_code"] == 0 or outcome["truncated"] else "failed"
+    return _result(name, host, command, status, clock() - started, outcome["exit_code"], outcome["output"],
+                   outcome["truncated"], f"No result within {timeout:g}s" if status == "timeout" else None)
+
+
+def run_diagnostics(commands, executor, host="localhost", cache=None, max_workers=DEFAULT_MAX_WORKERS,
+                    timeout=DEFAULT_TIMEOUT, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES, clock=time.monotonic,
+                    cache_scope=None):
+    """Runs {name: command} concurrently, yielding events as output arrives.
+
+    Events are ("output", name, text) for each chunk of output and
+    ("done", name, result) once per command. Status is "ok", "failed"
+    (non-zero exit), "error" (the command could not be run) or "timeout",
+    the same as remote_exec.fan_out. Cached results are yielded first without
+    running anything; "ok" and "failed" results are cached for next time,
+    under cache_scope.
+    """
+    events = queue.Queue()
+    pending = {}
+
+    def run_one(name, command):
+        result = run_command(executor, name, command, lambda text: events.put(("output", name, text)),
+                             host=host, timeout=timeout, max_output_bytes=max_output_bytes, clock=clock)
+        events.put(("done", name, result))
+
+    for name, command in commands.items():
+        cached = cache.get(host, command, cache_scope) if cache is not None else None
+        if cached is not None:
+            yield ("done", name, dict(cached, name=name))
+        else:
+            pending[name] = command
+    if not pending:
+        return
+
+    executor_pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending))),
+                                       thread_name_prefix="diagnostic")
+    try:
+        started = clock()
+        for name, command in pending.items():
+            executor_pool.submit(run_one, name, command)
+        # Queued commands haven't started yet, so the backstop allows for every batch of workers
+        batches = -(-len(pending) // max(1, min(max_workers, len(pending))))
+        deadline = started + batches * (timeout + TIMEOUT_GRACE)
+        while pending:
+            try:
+                event = events.get(timeout=max(0.0, min(0.5, deadline - clock())))
+            except queue.Empty:
+                if clock() < deadline:
+                    continue
+                for name, command in list(pending.items()):
+                    yield ("done", name, _result(name, host, command, "timeout", clock() - started,
+                                                 error=f"No result within {timeout:g}s"))
+                pending.clear()
+                break
+            kind, name, payload = event
+            if name not in pending:
+                continue
+            if kind == "done":
+                del pending[name]
+                if cache is not None and payload["status"] in ("ok", "failed"):
+                    cache.put(host, payload["command"], payload, cache_scope)
+            yield event
+    finally:
+        # Don't wait for commands that overran; queued ones are cancelled if the caller stops early
+        executor_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,124 @@
+import os
+import re
+import threading
+import time
+
+DEFAULT_GUIDE_PATH = "docs/user_guide.md"
+DEFAULT_CHECK_INTERVAL = 2.0
+
+HEADING_REGEX = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE_REGEX = re.compile(r"^\s*(```|~~~)")
+# "10. Running Several App Processes" and "1.2 Setup" are titled without their numbers
+NUMBERING_REGEX = re.compile(r"^\d+(\.\d+)*\.?\s+")
+
+
+def slugify(heading):
+    """Anchor id of a heading, ignoring its numbering and emoji: "#### 1. Command Assistant" -> "command-assistant"."""
+    title = NUMBERING_REGEX.sub("", heading.strip())
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+
+
+def parse_sections(text):
+    """Splits a markdown document into sections, one per heading, in document order.
+
+    A section's text runs from its heading to the next heading of the same
+    or a higher level, so it includes its subsections. Headings inside
+    fenced code blocks are ignored. Repeated ids get "-2", "-3" suffixes.
+    """
+    headings = []
+    lines = text.splitlines()
+    in_fence = False
+    for number, line in enumerate(lines):
+        if FENCE_REGEX.match(line):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else HEADING_REGEX.match(line)
+        if match:
+            headings.append((number, len(match.group(1)), match.group(2)))
+
+    sections = {}
+    parents = []
+    for position, (start, level, heading) in enumerate(headings):
+        end = next((line for line, other, _ in headings[position + 1:] if other <= level), len(lines))
+        own_end = headings[position + 1][0] if position + 1 < len(headings) else len(lines)
+        base = slugify(heading) or "section"
+        section_id, suffix = base, 1
+        while section_id in sections:
+            suffix += 1
+            section_id = f"{base}-{suffix}"
+        while parents and parents[-1][1] >= level:
+            parents.pop()
+        sections[section_id] = {
+            "id": section_id,
+            "title": NUMBERING_REGEX.sub("", heading),
+            "level": level,
+            "parent": parents[-1][0] if parents else None,
+            "text": "\n".join(lines[start:end]).strip(),
+            # Only the lines up to the first subheading, for search
+            "body": "\n".join(lines[start + 1:own_end]).strip(),
+        }
+        parents.append((section_id, level))
+    return sections
+
+
+def help_topics(sections, min_level=3, max_level=4):
+    """Section ids worth listing as help topics, in document order.
+
+    The guide's title and top-level headings are left out, as they hold
+    nearly the whole guide.
+    """
+    return [section_id for section_id, section in sections.items() if min_level <= section["level"] <= max_level]
+
+
+class HelpIndex:
+    """Sections of the user guide, parsed once and reparsed when the file changes.
+
+    The file's mtime and size are checked at most every `check_interval`
+    seconds, so looking up a section on every rerun costs a dict lookup.
+    `version` changes whenever the sections do. A reparse builds a new dict,
+    so the sections returned by one call never change under the caller.
+    """
+
+    def __init__(self, path=DEFAULT_GUIDE_PATH, check_interval=DEFAULT_CHECK_INTERVAL, clock=time.monotonic):
+        self.path = path
+        self.check_interval = check_interval
+        self.clock = clock
+        self.version = None
+        self.parses = 0
+        self._sections = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        # Caller holds the lock
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._sections, self.version = {}, None
+            return
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self.version:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            self._sections = parse_sections(f.read())
+        self.version = version
+        self.parses += 1
+
+    def snapshot(self):
+        # The version and the sections it belongs to, read together
+        with self._lock:
+            self._refresh()
+            return self.version, self._sections
+
+    def sections(self):
+        return self.snapshot()[1]
+
+    def get(self, section_id):
+        return self.sections().get(section_id)
+
+    def topics(self, min_level=3, max_level=4):
+        return help_topics(self.sections(), min_level, max_level)
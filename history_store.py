@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+import os
+import threading
+from datetime import datetime
+from itertools import islice
+
+from shared_state import connect_sqlite
+
+DEFAULT_HISTORY_PATH = os.environ.get("COMMAND_HISTORY_DB", ".cache/command_history.db")
+DEFAULT_PAGE_SIZE = 20
+EXPORT_BATCH_SIZE = 500
+# Entries per export file; Streamlit holds a download in memory, so large histories are exported in parts
+EXPORT_PART_SIZE = int(os.environ.get("HISTORY_EXPORT_PART_SIZE", "20000"))
+
+EXPORT_FORMATS = {
+    "txt": "text/plain",
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+class HistoryStore:
+    """Append-only command history in SQLite, read a page at a time.
+
+    Every entry belongs to a `user_id`, and reads and clears are limited to
+    one user's entries; passing no user_id reads everyone's, for tooling.
+    Entries saved before user ids were recorded belong to no one.
+    """
+
+    def __init__(self, db_path=DEFAULT_HISTORY_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # WAL, so several app processes can append to one history file
+        self._conn = connect_sqlite(db_path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                command TEXT NOT NULL,
+                explanation TEXT NOT NULL,
+                session_id TEXT,
+                user_id TEXT
+            )"""
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(history)")]
+        if "user_id" not in columns:
+            self._conn.execute("ALTER TABLE history ADD COLUMN user_id TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS history_user ON history (user_id, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS history_command ON history (command)")
+        self._conn.commit()
+
+    def append(self, command, explanation, session_id=None, timestamp=None, user_id=None):
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO history (timestamp, command, explanation, session_id, user_id) VALUES (?, ?, ?, ?, ?)",
+                (timestamp, command, explanation or "", session_id, user_id),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def _where(self, search, user_id):
+        clauses, params = [], ()
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params += (user_id,)
+        if search:
+            clauses.append("command LIKE ? ESCAPE '\\'")
+            params += (f"%{_escape_like(search)}%",)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, search=None, user_id=None):
+        where, params = self._where(search, user_id)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM history{where}", params).fetchone()[0]
+
+    def page(self, page=0, page_size=DEFAULT_PAGE_SIZE, search=None, user_id=None):
+        # Newest first; only one page of rows is ever loaded
+        where, params = self._where(search, user_id)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, timestamp, command, explanation FROM history{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + (page_size, page * page_size),
+            ).fetchall()
+        return [_entry(row) for row in rows]
+
+    def iter_entries(self, batch_size=EXPORT_BATCH_SIZE, search=None, after_id=0, user_id=None):
+        # Oldest first, in keyset batches, so the lock is never held across a yield
+        where, params = self._where(search, user_id)
+        where = f"{where} AND id > ?" if where else " WHERE id > ?"
+        last_id = after_id
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, timestamp, command, explanation FROM history{where} ORDER BY id LIMIT ?",
+                    params + (last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _entry(row)
+            last_id = rows[-1][0]
+
+    def id_before(self, offset, search=None, user_id=None):
+        """The id to read after to skip the `offset` oldest entries."""
+        if offset <= 0:
+            return 0
+        where, params = self._where(search, user_id)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT id FROM history{where} ORDER BY id LIMIT 1 OFFSET ?", params + (offset - 1,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def clear(self, user_id=None):
+        where, params = self._where(None, user_id)
+        with self._lock:
+            self._conn.execute(f"DELETE FROM history{where}", params)
+            self._conn.commit()
+
+    def clear_prefix(self, prefix):
+        """Deletes the entries of every user whose id starts with `prefix`."""
+        with self._lock:
+            self._conn.execute("DELETE FROM history WHERE user_id LIKE ? ESCAPE '\\'", (f"{_escape_like(prefix)}%",))
+            self._conn.commit()
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _entry(row):
+    return {"id": row[0], "timestamp": row[1], "command": row[2], "explanation": row[3]}
+
+
+def export_history(entries, fmt="txt"):
+    """Yields the export one entry at a time as text chunks."""
+    if fmt == "jsonl":
+        for entry in entries:
+            yield json.dumps({key: entry[key] for key in ("timestamp", "command", "explanation")}) + "\n"
+    elif fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["timestamp", "command", "explanation"])
+        for entry in entries:
+            writer.writerow([entry["timestamp"], entry["command"], entry["explanation"]])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == "txt":
+        for i, entry in enumerate(entries):
+            yield (
+                ("\n\n" if i else "")
+                + f"Time: {entry['timestamp']}\nCommand: {entry['command']}\nExplanation: {entry['explanation']}"
+            )
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def write_export(store, f, fmt="txt", search=None, user_id=None, part=0, part_size=None):
+    # Streams straight into f; memory use is one batch of rows regardless of history size
+    entries = ()
+    if part_size is None:
+        entries = store.iter_entries(search=search, user_id=user_id)
+    else:
+        after_id = store.id_before(part * part_size, search, user_id)
+        if after_id is not None:
+            entries = islice(store.iter_entries(search=search, user_id=user_id, after_id=after_id), part_size)
+    for chunk in export_history(entries, fmt):
+        f.write(chunk.encode("utf-8"))
+
+
+def export_file(store, fmt="txt", search=None, user_id=None, part=0, part_size=EXPORT_PART_SIZE):
+    """One part of the export as a file object, for st.download_button.
+
+    Streamlit keeps a download in memory, so rather than spooling the whole
+    history and reading it back, each part holds at most `part_size`
+    entries however long the history grows.
+    """
+    f = io.BytesIO()
+    write_export(store, f, fmt, search, user_id, part, part_size)
+    return f
@@ -0,0 +1,186 @@
+import contextlib
+import os
+import socket
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+DEFAULT_WINDOW = 1024
+# Each process exports its own metrics, so replicas sharing a directory mustn't share a file name.
+# "{replica}" in METRICS_PROM_FILE becomes REPLICA_ID, or the host name and process id.
+REPLICA_ID = os.environ.get("REPLICA_ID") or f"{socket.gethostname()}-{os.getpid()}"
+DEFAULT_EXPORT_PATH = os.environ.get("METRICS_PROM_FILE", ".cache/metrics-{replica}.prom").replace("{replica}", REPLICA_ID)
+DEFAULT_EXPORT_INTERVAL = float(os.environ.get("METRICS_EXPORT_INTERVAL", "15"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRIC_HELP = {
+    "gemini_stage_seconds": "Time spent in each stage of answering a question",
+    "gemini_responses_total": "Answers by where they came from",
+    "gemini_tokens_total": "Prompt and response tokens reported by the API",
+    "tab_render_seconds": "Time to render each tab",
+    "app_run_seconds": "Time for a full script run",
+    "errors_total": "Errors by stage and exception type",
+    "session_state_bytes": "Estimated size of a session's state after each run",
+    "prefetch_calls_total": "Model calls made to prefetch answers",
+    "prefetch_tokens_total": "Estimated tokens spent on prefetch calls",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, **extra):
+    pairs = list(key) + sorted(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class RollingHistogram:
+    """Count and sum since start, plus the last `window` observations for percentiles."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def summary(self):
+        values = sorted(self.recent)
+        return dict(count=self.count, sum=self.total,
+                    **{f"p{int(q * 100)}": percentile(values, q) for q in QUANTILES})
+
+
+class Metrics:
+    """In-process counters and rolling latency histograms, keyed by name and labels.
+
+    Everything is kept in memory behind one lock; recording a sample is a
+    dict lookup and a deque append. start_exporter() writes the lot to a
+    Prometheus text-format file on a background thread.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, clock=time.perf_counter):
+        self.window = window
+        self.clock = clock
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = RollingHistogram(self.window)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        # Records the duration even when the block raises
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.observe(name, self.clock() - started, **labels)
+
+    def histograms(self):
+        with self._lock:
+            items = [(name, dict(key), histogram.summary()) for (name, key), histogram in self._histograms.items()]
+        return sorted(items, key=lambda item: (item[0], sorted(item[1].items())))
+
+    def counters(self):
+        with self._lock:
+            items = [(name, dict(key), value) for (name, key), value in self._counters.items()]
+        return sorted(items, key=lambda item: (item[0], sorted(item[1].items())))
+
+    def to_prometheus(self):
+        """Renders every metric in the Prometheus text exposition format.
+
+        Histograms are exported as summaries: quantiles over the rolling
+        window, with _sum and _count since the process started.
+        """
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        seen = set()
+        for (name, key), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} summary")
+            values = sorted(histogram.recent)
+            for q in QUANTILES:
+                if values:
+                    lines.append(f"{name}{_format_labels(key, quantile=q)} {percentile(values, q):.6g}")
+            lines.append(f"{name}_sum{_format_labels(key)} {histogram.total:.6g}")
+            lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        for (name, key), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=DEFAULT_EXPORT_PATH):
+        # Written to a temporary file and renamed, so a scraper never reads a partial file
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + ".tmp")
+        temporary.write_text(self.to_prometheus(), encoding="utf-8")
+        os.replace(temporary, path)
+
+    def start_exporter(self, path=DEFAULT_EXPORT_PATH, interval=DEFAULT_EXPORT_INTERVAL):
+        if self._exporter is not None or not path:
+            return
+
+        def export_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_prometheus(path)
+                except OSError:
+                    # A full or read-only disk shouldn't take the app down; try again next interval
+                    pass
+
+        self._exporter = threading.Thread(target=export_loop, name="metrics-exporter", daemon=True)
+        self._exporter.start()
+
+
+def stage_timer(metrics, stage):
+    # Lets code that is also used without instrumentation (batch.py, benchmarks) skip timing
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.timer("gemini_stage_seconds", stage=stage)
+
+
+def record_usage(metrics, response):
+    """Adds the token counts from a Gemini response's usage_metadata, if it has any."""
+    usage = getattr(response, "usage_metadata", None)
+    if metrics is None or usage is None:
+        return
+    for kind, field in (("prompt", "prompt_token_count"), ("response", "candidates_token_count")):
+        count = getattr(usage, field, None)
+        if count:
+            metrics.inc("gemini_tokens_total", count, kind=kind)
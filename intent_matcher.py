@@ -0,0 +1,243 @@
+import re
+import threading
+
+from answer_cache import normalize_question
+from command_assistant import SAFE_INPUT_REGEX
+
+# Questions that ask for understanding rather than a command still go to the model
+EXPLANATORY_REGEX = re.compile(r"^(explain|why|what does|what is the difference|difference|compare|when should)\b")
+
+IPV4_REGEX = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+HOSTNAME_REGEX = re.compile(r"\b(?=[a-z0-9-]*[a-z])[a-z0-9-]+(?:\.[a-z0-9-]+)+\b")
+PORT_REGEX = re.compile(r"\bport\s+(\d{1,5})\b|:(\d{1,5})\b|\b(\d{1,5})\s+port\b")
+# The target is looked ahead of, not consumed, so "for host dc01" can try "host" and then "dc01"
+BARE_TARGET_REGEX = re.compile(r"\b(?:to|on|for|of|from|host|server)\s+(?=([a-z0-9][a-z0-9-]{1,62})\b)")
+# Words that follow "to", "host" and so on without naming a machine
+TARGET_STOPWORDS = frozenset(
+    "a an the my this that it its me your our their some any another each every to on for of from in at with "
+    "port ports host hosts server servers machine computer pc dns ip address addresses network adapter local "
+    "remote here there which what whether".split()
+)
+LOCAL_TARGETS = frozenset(("localhost", "127.0.0.1", "::1"))
+
+# Questions about changing something never get a read-only diagnostic command.
+# "open" is only an action before what is being opened ("open port 3389"), not in "is port 443 open".
+ACTION_REGEX = re.compile(
+    r"\b(?:set|sets|setting|change|changing|modify|configure|assign|release|renew|reset|block|unblock|allow|"
+    r"deny|disable|enable|close|forward|add|remove|delete|kill|stop|restart|update|fix|flush|register)\b"
+    r"|\bopen(?:ing)?\s+(?:up\s+)?(?:a\s+|the\s+)?(?:port|\d|tcp|udp|firewall|inbound|outbound)"
+    r"|\bfirewall\b|\bstatic\b|\bdhcp\b"
+)
+
+# Words that carry no meaning for matching; the rest of a question should be explained by the rule
+STOPWORDS = frozenset(
+    "a an the my me i is are am be can could do does how to of on in at for from with this that it its "
+    "whether if what what's whats which please you your we our there any all and or current currently "
+    "machine machine's computer pc local".split()
+)
+WORD_REGEX = re.compile(r"[a-z0-9][a-z0-9.:\-]*")
+MIN_CONFIDENCE = 0.6
+
+# A rule matches when its topic is mentioned with a read or diagnostic verb (or the
+# command is named outright) and no action verb is present.
+INTENT_RULES = {
+    "ip_config": {
+        "topic": re.compile(
+            r"\bip ?config\b(?!\s*/)|\bip (?:address(?:es)?|settings|configuration|config)\b|\bmy ip\b(?! (?:address|settings|config))"
+            r"|\bnetwork (?:adapter )?config(?:uration)?\b|\bsubnet mask\b|\bdefault gateway\b"
+        ),
+        "verbs": re.compile(
+            r"\b(?:show|see|display|view|check|find|get|list|print|tell|know|what|what's|whats|which|where|"
+            r"look at|details?)\b|\bipconfig\b"
+        ),
+        "params": (),
+        "explanation": "Shows the full IP configuration for every adapter: IPv4/IPv6 addresses, subnet masks, "
+                       "default gateways, DNS servers, DHCP lease details and MAC addresses.",
+        "alternatives": "Get-NetIPConfiguration -Detailed, or Settings > Network & Internet > Properties",
+    },
+    "port_scan": {
+        "topic": re.compile(r"\bports?\b|\btest-netconnection\b"),
+        "verbs": re.compile(
+            r"\b(?:test|check|scan|probe|verify|reachable|listening|accessible|responding|connect|"
+            r"connectivity|reach)\w*\b|\bis\b.*\bopen\b|\bopen\?*$|\btest-netconnection\b"
+        ),
+        "params": ("target", "port"),
+        "explanation": "Attempts a TCP connection to the port on the target host. TcpTestSucceeded : True "
+                       "means the port is open and reachable from this machine.",
+        "security_note": "Only test hosts you are authorised to probe; repeated probing can trip intrusion detection.",
+        "alternatives": "telnet {target} {port}, or Resource Monitor > Network > Listening Ports for local ports",
+    },
+    "dns_check": {
+        "topic": re.compile(
+            r"\bresolve[sd]?\b|\bdns\b|\bnslookup\b|\bresolve-dnsname\b|\bip (?:address )?(?:of|for)\b"
+        ),
+        "verbs": re.compile(
+            r"\b(?:resolve[sd]?|look ?up|lookup|query|check|find|get|show|what|what's|whats|which|nslookup|"
+            r"records?|resolution|resolve-dnsname)\b|\bip (?:address )?(?:of|for)\b"
+        ),
+        "params": ("hostname",),
+        "explanation": "Queries DNS for the hostname and lists the records returned (A, AAAA, CNAME) along "
+                       "with the answering server's TTLs.",
+        "alternatives": "nslookup {hostname}",
+    },
+    "traceroute": {
+        "topic": re.compile(r"\btrace ?route\b|\btracert\b|\broute to\b|\bhops?\b|\bnetwork path\b|\bpath to\b"),
+        "verbs": re.compile(r"\b(?:trace|traceroute|tracert|show|see|check|find|list|get|what|which|how many)\b"),
+        "params": ("target",),
+        "explanation": "Lists every router hop between this machine and the target with round-trip times, "
+                       "which shows where latency or packet loss starts.",
+        "alternatives": "pathping {target} for per-hop loss statistics, or Test-NetConnection {target} -TraceRoute",
+    },
+}
+
+# Common phrasings that map straight onto a TROUBLESHOOTING_CATEGORIES command
+COMMAND_ALIASES = {
+    "flush dns": ("ipconfig /flushdns", "Clears the local DNS resolver cache so names are looked up again."),
+    "clear dns cache": ("ipconfig /flushdns", "Clears the local DNS resolver cache so names are looked up again."),
+    "flush dns cache": ("ipconfig /flushdns", "Clears the local DNS resolver cache so names are looked up again."),
+    "scan system files": ("sfc /scannow", "Checks protected system files and replaces corrupted ones from the component store. Run from an elevated prompt."),
+    "repair system files": ("sfc /scannow", "Checks protected system files and replaces corrupted ones from the component store. Run from an elevated prompt."),
+    "list processes": ("tasklist", "Lists running processes with their PID, session and memory usage."),
+    "list running processes": ("tasklist", "Lists running processes with their PID, session and memory usage."),
+    "system info": ("systeminfo", "Prints OS version, install date, uptime, hotfixes, memory and network adapter details."),
+    "list services": ("net start", "Lists the services that are currently running."),
+    "list running services": ("net start", "Lists the services that are currently running."),
+    "list local users": ("net user", "Lists the local user accounts on this machine."),
+    "list firewall rules": ("Get-NetFirewallRule", "Lists Windows Defender Firewall rules with their direction, action and enabled state."),
+}
+
+ACTION_PREFIX_REGEX = re.compile(r"^(?:run|execute|launch|open|start|how do i|how to|how can i|command to)\s+")
+
+
+def match_score(question, spans, params):
+    """Share of the question's meaningful words explained by the matched spans and parameters."""
+    covered = set(params.values())
+    for start, end in spans:
+        covered.update(WORD_REGEX.findall(question[start:end]))
+    words = [word for word in WORD_REGEX.findall(question) if word not in STOPWORDS]
+    if not words:
+        return 0.0
+    return sum(word in covered or word.rstrip("?") in covered for word in words) / len(words)
+
+
+def is_safe_param(value):
+    return bool(re.match(SAFE_INPUT_REGEX, value))
+
+
+def bare_target(question):
+    # A port number or a filler word after "to"/"on" is not a machine name
+    for match in BARE_TARGET_REGEX.finditer(question):
+        word = match.group(1)
+        if word not in TARGET_STOPWORDS and not word.isdigit():
+            return word
+    return None
+
+
+def extract_params(question):
+    params = {}
+    ip = IPV4_REGEX.search(question)
+    hostname = HOSTNAME_REGEX.search(IPV4_REGEX.sub(" ", question))
+    bare = bare_target(question)
+    if hostname:
+        params["hostname"] = hostname.group(0)
+    if ip or hostname or bare:
+        params["target"] = ip.group(0) if ip else hostname.group(0) if hostname else bare
+    if "hostname" not in params and bare:
+        params["hostname"] = bare
+
+    port = PORT_REGEX.search(question)
+    if port:
+        value = next(group for group in port.groups() if group)
+        if 0 < int(value) < 65536:
+            params["port"] = value
+
+    return {name: value for name, value in params.items() if is_safe_param(value)}
+
+
+class IntentMatcher:
+    """Answers well-known requests from the command templates without calling the model."""
+
+    def __init__(self, templates, categories):
+        self.templates = templates
+        self.known_commands = {
+            command.lower(): (category, subcategory, command)
+            for category, subcategories in categories.items()
+            for subcategory, commands in subcategories.items()
+            for command in commands
+        }
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "by_intent": {}}
+
+    def match(self, question, count=True):
+        # count=False checks without touching the stats, for lookups no one asked for
+        result = self._match(normalize_question(question))
+        if not count:
+            return result
+        with self._lock:
+            self._stats["lookups"] += 1
+            if result is not None:
+                self._stats["hits"] += 1
+                by_intent = self._stats["by_intent"]
+                by_intent[result["intent"]] = by_intent.get(result["intent"], 0) + 1
+        return result
+
+    def _match(self, question):
+        if EXPLANATORY_REGEX.match(question):
+            return None
+
+        phrase = ACTION_PREFIX_REGEX.sub("", question)
+        if phrase in COMMAND_ALIASES:
+            command, explanation = COMMAND_ALIASES[phrase]
+            return {"command": command, "explanation": explanation, "intent": "alias", "confidence": 1.0}
+        if phrase in self.known_commands:
+            category, subcategory, command = self.known_commands[phrase]
+            return {
+                "command": command,
+                "explanation": f"Standard {subcategory} tool from the {category} troubleshooting toolkit.",
+                "intent": "catalog",
+                "confidence": 0.9,
+            }
+
+        if ACTION_REGEX.search(question):
+            return None
+
+        params = extract_params(question)
+        scored = []
+        for name, rule in INTENT_RULES.items():
+            if name not in self.templates:
+                continue
+            topic = list(rule["topic"].finditer(question))
+            verbs = list(rule["verbs"].finditer(question))
+            if not topic or not verbs or not all(p in params for p in rule["params"]):
+                continue
+            # A local-only command can't answer a question about another machine
+            if not rule["params"] and params.get("target", "localhost") not in LOCAL_TARGETS:
+                continue
+            spans = [match.span() for match in topic + verbs]
+            rule_params = {p: params[p] for p in rule["params"]}
+            scored.append((match_score(question, spans, rule_params), name, rule_params))
+        if not scored:
+            return None
+        scored.sort(reverse=True)
+        confidence, name, params = scored[0]
+        # Two rules explaining the question equally well means the model should decide
+        if confidence < MIN_CONFIDENCE or (len(scored) > 1 and scored[1][0] >= confidence):
+            return None
+
+        rule = INTENT_RULES[name]
+        response = {
+            "command": self.templates[name].format(**params),
+            "explanation": rule["explanation"],
+            "intent": name,
+            "confidence": round(confidence, 2),
+        }
+        for field in ("security_note", "alternatives"):
+            if field in rule:
+                response[field] = rule[field].format(**params)
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, by_intent=dict(self._stats["by_intent"]))
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
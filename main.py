@@ -8,31 +8,96 @@ st.set_page_config(
     initial_sidebar_state="auto"  # Auto-collapse on small screens
 )
 
-import google.generativeai as genai
 import re
+import codecs
 from dotenv import load_dotenv
 from datetime import datetime
-import networkx as nx
-import matplotlib.pyplot as plt
-import random
+import functools
+import hashlib
+import hmac
+import importlib.util
 import time
-import webbrowser
+import uuid
 from pathlib import Path
+from answer_cache import AnswerCache, SingleFlight, make_cache_key
+from command_assistant import (
+    MODEL_NAME,
+    SAFE_INPUT_REGEX,
+    INVALID_INPUT_RESPONSE,
+    generation_config,
+    ask_model,
+    estimate_tokens,
+    is_valid_question,
+    prompt_settings,
+)
+from scheduler import GeminiScheduler, PRIORITY_INTERACTIVE, PRIORITY_PREFETCH
+from shared_state import SharedState, open_kv
+from semantic_cache import SemanticCache, DEFAULT_THRESHOLD
+from session_budget import ANSWERS_BUDGET_FRACTION, DEFAULT_SESSION_BUDGET_BYTES, BoundedDict, enforce_budget
+from client_feedback import copy_button_html
+from command_catalog import TROUBLESHOOTING_CATEGORIES, catalog_questions, sidebar_question
+from ad_query import AD_OBJECT_TYPES, DEFAULT_RESULT_PAGE_SIZE, OUTPUT_FORMATS, SEARCH_SCOPES, build_ad_query, condition_input
+from command_search import SearchIndex
+from help_docs import DEFAULT_GUIDE_PATH, HelpIndex, help_topics
+from diagnostics import (
+    DEFAULT_CACHE_TTL,
+    DEFAULT_TIMEOUT as DEFAULT_DIAGNOSTIC_TIMEOUT,
+    LocalExecutor,
+    RemoteExecutor,
+    ReplayExecutor,
+    ResultCache,
+    run_diagnostics,
+)
+from history_store import EXPORT_FORMATS, EXPORT_PART_SIZE, HistoryStore, export_file
+from instrumentation import DEFAULT_EXPORT_PATH as DEFAULT_METRICS_PATH, QUANTILES, Metrics, stage_timer
+from intent_matcher import IntentMatcher
+from prefetch import Prefetcher
+from record_stream import iter_records, page_records
+from metrics_collector import (
+    COUNTER_PATHS,
+    METRIC_UNITS,
+    CollectorRegistry,
+    LocalSource,
+    RemoteCounterSource,
+    SimulatedSource,
+)
+from remote_exec import (
+    DEFAULT_HOST_TIMEOUT,
+    DEFAULT_MAX_WORKERS,
+    FakeTransport,
+    SessionPool,
+    WinRMTransport,
+    fan_out,
+    parse_hosts,
+)
+from topology import (
+    LayoutCache,
+    build_topology,
+    detect_output_kind,
+    parse_arp,
+    parse_ip_configuration,
+    parse_routes,
+    render_svg,
+    topology_summary,
+)
+from workflow import build_summary_prompt, estimate_summary_tokens, run_workflow, summarize_workflow
 
-# Try to import winrm, but don't fail if it's not available
-WINRM_AVAILABLE = False
-try:
-    import winrm
-    WINRM_AVAILABLE = True
-except ImportError:
-    pass
+# google.generativeai, networkx and winrm are imported where they are
+# used, so sessions that never need them don't pay for loading them.
+
+# Check for winrm without importing it; the Remote Management tab imports it on use
+WINRM_AVAILABLE = importlib.util.find_spec("winrm") is not None
 
-# Load environment variables from .env file if it exists
-load_dotenv()
+def load_api_key():
+    # Once .env has been loaded the key is in the environment, so this is a dict lookup. Not
+    # cached: while no key is found .env is read again on each run, so adding one needs no restart.
+    if not os.environ.get("GEMINI_API_KEY"):
+        load_dotenv()
+    return os.environ.get("GEMINI_API_KEY")
 
 # Get API key from environment variable or Streamlit secrets
 try:
-    api_key = os.environ.get("GEMINI_API_KEY")
+    api_key = load_api_key()
     if not api_key:
         api_key = st.secrets.get("GEMINI_API_KEY")
     if not api_key:
@@ -42,17 +107,211 @@ except Exception as e:
     st.error(f"Error accessing API key: {str(e)}")
     st.stop()
 
-# Configure Gemini API key
-genai.configure(api_key=api_key)
+def create_model(api_key):
+    import google.generativeai as genai
 
-# Model configuration
-generation_config = {
-    "temperature": 0.7,
-    "max_output_tokens": 512,
-    "response_mime_type": "text/plain",
-}
+    # Configure Gemini API key
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name=MODEL_NAME, generation_config=generation_config)
+
+@st.cache_resource
+def get_model(api_key):
+    return create_model(api_key)
+
+# Each tab runs as a fragment, so a widget inside one tab reruns only that tab.
+# Set DISABLE_TAB_FRAGMENTS=1 to compare against whole-app reruns.
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+def tab_fragment(func):
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Last render time per tab, shown in the sidebar and read by benchmarks/bench_fragments.py
+            elapsed = time.perf_counter() - started
+            st.session_state.setdefault("render_times", {})[func.__name__] = elapsed
+            get_metrics().observe("tab_render_seconds", elapsed, tab=func.__name__)
+
+    if _fragment is None or os.environ.get("DISABLE_TAB_FRAGMENTS"):
+        return timed
+    return _fragment(timed)
+
+def show_html_widget(markup, height):
+    # HTML with its own scripts, in an iframe; st.iframe replaces components.html on newer Streamlit
+    if hasattr(st, "iframe"):
+        st.iframe(markup, height=height)
+    else:
+        import streamlit.components.v1 as components
+
+        components.html(markup, height=height)
+
+def fragments_enabled():
+    return _fragment is not None and not os.environ.get("DISABLE_TAB_FRAGMENTS")
+
+@st.cache_resource
+def get_metrics():
+    # One registry for the process; it is also written to METRICS_PROM_FILE for Prometheus
+    metrics = Metrics()
+    metrics.start_exporter()
+    return metrics
+
+@st.cache_resource
+def get_answer_cache():
+    # Shared by every session and persisted to disk so answers survive restarts
+    return AnswerCache()
+
+@st.cache_resource
+def get_semantic_cache():
+    # Catches paraphrases that miss the exact-match cache
+    return SemanticCache()
+
+@st.cache_resource
+def get_intent_matcher():
+    return IntentMatcher(NETWORK_COMMAND_TEMPLATES, TROUBLESHOOTING_CATEGORIES)
+
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
+
+@st.cache_resource(max_entries=1000)
+def get_favorites_state(user_id):
+    # One namespace per user, in the shared store rather than session state, so favorites survive
+    # reloads and are the same on every app process behind a load balancer. Writes go straight
+    # to the store, so dropping a user from this cache loses nothing.
+    return SharedState(open_kv(), f"favorites:{user_id}", flush_interval=None)
+
+@st.cache_resource
+def get_help_index():
+    # Parsed once per process and reparsed only when the guide file changes
+    return HelpIndex(str(Path(__file__).resolve().parent / DEFAULT_GUIDE_PATH))
+
+@st.cache_resource
+def get_search_index():
+    # Every built-in command list, indexed once per process; history is per user, see get_history_index
+    index = SearchIndex()
+    for category, subcategories in TROUBLESHOOTING_CATEGORIES.items():
+        for subcategory, commands in subcategories.items():
+            for command in commands:
+                index.add(command, subcategory, f"Troubleshooting › {category}")
+    for name, command in generate_diagnostic_commands().items():
+        index.add(command, name, "Diagnostic Report")
+    for name, command in REMOTE_COMMANDS.items():
+        index.add(command, name, "Remote Management")
+    for category, operations in AD_OPERATIONS.items():
+        for name, command in operations.items():
+            index.add(command, name, f"AD Management › {category}")
+    for name, command in DISCOVERY_COMMANDS.items():
+        index.add(command, name, "Network Topology")
+    for workflow, steps in TROUBLESHOOTING_WORKFLOWS.items():
+        for step in steps:
+            index.add(step["command"], step["description"], f"Workflow › {workflow}")
+    return index
+
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight()
 
-model = genai.GenerativeModel(model_name="gemini-1.5-flash", generation_config=generation_config)
+@st.cache_resource
+def get_gemini_scheduler():
+    # All sessions share one API key, so they share one rate limit
+    return GeminiScheduler()
+
+@st.cache_resource
+def get_prefetcher():
+    # Warms the answer cache for the sidebar's commands while the user is still choosing one.
+    # The caches are looked up here because the prefetch thread has no script context. For the
+    # same reason it can't use get_model, so it builds its own model, on the first fetch so
+    # sessions that never prefetch don't import the SDK.
+    # The mode is the requesting session's structured-output setting, so answers land under
+    # the same keys that session's lookups use.
+    cache = get_answer_cache()
+    semantic_cache = get_semantic_cache()
+    intent_matcher = get_intent_matcher()
+    scheduler = get_gemini_scheduler()
+    metrics = get_metrics()
+    model = functools.lru_cache(maxsize=1)(create_model)
+
+    def fetch(question, structured):
+        # Lowest priority: runs only when no interactive or batch call is waiting for a slot
+        result = scheduler.run(lambda: ask_model(model(api_key), question, structured=structured),
+                               session_id="prefetch", priority=PRIORITY_PREFETCH,
+                               tokens=estimate_tokens(question, structured), timeout=600)
+        metrics.inc("prefetch_calls_total", status="ok" if result["command"] else "unparsed")
+        metrics.inc("prefetch_tokens_total", estimate_tokens(question, structured))
+        if result["command"]:
+            cache.put(make_cache_key(question, *prompt_settings(structured)), question, result)
+            semantic_cache.add(question, result, scope=answer_scope(structured))
+        return result
+
+    def is_cached(question, structured):
+        # The lookups get_gemini_response makes before calling the model, without their stats
+        return (intent_matcher.match(question, count=False) is not None
+                or cache.contains(make_cache_key(question, *prompt_settings(structured)))
+                or semantic_cache.lookup(question, scope=answer_scope(structured), count=False) is not None)
+
+    return Prefetcher(fetch, is_cached, catalog=catalog_questions())
+
+def get_session_answers():
+    # Bounded by count and size; an evicted answer is served from the answer cache if asked again
+    if not isinstance(st.session_state.get("answers"), BoundedDict):
+        st.session_state.answers = BoundedDict(max_bytes=int(DEFAULT_SESSION_BUDGET_BYTES * ANSWERS_BUDGET_FRACTION))
+    return st.session_state.answers
+
+def get_session_id():
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+# Anonymous users carry their id in this query parameter
+ANONYMOUS_ID_PARAM = "uid"
+ANONYMOUS_ID_REGEX = re.compile(r"^[0-9a-f]{32}$")
+ANONYMOUS_RETENTION_DAYS = float(os.environ.get("ANONYMOUS_RETENTION_DAYS", "30"))
+
+def get_user_id():
+    # Whose history and favorites to show: the signed-in user when Streamlit auth is set up,
+    # else the user named by a trusted proxy's header, else an anonymous id kept in the URL
+    user = st.user
+    if user.get("is_logged_in") and (user.get("email") or user.get("sub")):
+        return f"user:{user.get('email') or user.get('sub')}"
+    header = os.environ.get("USER_ID_HEADER")
+    if header and st.context.headers.get(header):
+        return f"header:{st.context.headers.get(header)}"
+    if "user_id" not in st.session_state:
+        anonymous_id = st.query_params.get(ANONYMOUS_ID_PARAM, "")
+        if not ANONYMOUS_ID_REGEX.match(anonymous_id):
+            anonymous_id = uuid.uuid4().hex
+        st.session_state.user_id = f"anon:{anonymous_id}"
+        # Once per session is enough to keep the user's data from being pruned
+        get_anonymous_users().put(st.session_state.user_id, time.time())
+    user_id = st.session_state.user_id
+    # Back in the URL if it was dropped, so a reload or a bookmark finds the same history and favorites
+    if user_id.startswith("anon:") and st.query_params.get(ANONYMOUS_ID_PARAM) != user_id[5:]:
+        st.query_params[ANONYMOUS_ID_PARAM] = user_id[5:]
+    return user_id
+
+@st.cache_resource
+def get_anonymous_users():
+    # When each anonymous id was last used, in the shared store so every app process sees it
+    return SharedState(open_kv(), "anonymous_users", flush_interval=None)
+
+@st.cache_resource(ttl=3600)
+def prune_anonymous_users():
+    # At most hourly per process: drops the history and favorites of anonymous ids unused for
+    # ANONYMOUS_RETENTION_DAYS, and those of the per-session ids used before ids were kept in
+    # the URL, which no one can get back to
+    users = get_anonymous_users()
+    history = get_history_store()
+    cutoff = time.time() - ANONYMOUS_RETENTION_DAYS * 86400
+    for user_id, last_seen in users.items():
+        if last_seen < cutoff:
+            history.clear(user_id)
+            users.kv.clear(f"favorites:{user_id}")
+            users.delete(user_id)
+    history.clear_prefix("session:")
+    users.kv.clear_prefix("favorites:session:")
+    return True
 
 # Network command templates and security patterns
 NETWORK_COMMAND_TEMPLATES = {
@@ -62,36 +321,64 @@ NETWORK_COMMAND_TEMPLATES = {
     "traceroute": "tracert {target}"
 }
 
-SAFE_INPUT_REGEX = r"^[a-zA-Z0-9\-\.\:\/\s]{1,100}$"
+REMOTE_COMMANDS = {
+    "System Health": "Get-ComputerInfo | Select-Object WindowsVersion,OsHardwareAbstractionLayer,OsArchitecture",
+    "Disk Space": "Get-WmiObject Win32_LogicalDisk | Select-Object DeviceID,Size,FreeSpace",
+    "Running Services": "Get-Service | Where-Object {$_.Status -eq 'Running'}",
+    "Active Users": "Get-WmiObject -Class Win32_ComputerSystem | Select-Object UserName",
+    "Network Connections": "Get-NetTCPConnection | Where-Object State -eq 'Established'"
+}
 
-# Add at the top with other constants
-TROUBLESHOOTING_CATEGORIES = {
-    "Network": {
-        "Connectivity": ["ping", "tracert", "nslookup", "ipconfig", "netstat"],
-        "WiFi": ["netsh wlan show", "netsh wlan connect", "netsh wlan disconnect"],
-        "DNS": ["ipconfig /flushdns", "nslookup", "dig"],
-        "Firewall": ["netsh advfirewall", "Get-NetFirewallRule"],
-    },
-    "System": {
-        "Performance": ["tasklist", "perfmon", "systeminfo"],
-        "Services": ["services.msc", "net start", "net stop"],
-        "Updates": ["wuauclt", "UsoClient"],
-        "Logs": ["eventvwr.msc", "Get-EventLog", "Get-WinEvent"],
+AD_OPERATIONS = {
+    "User Management": {
+        "List Users": "Get-ADUser -Filter * -Properties LastLogonDate | Select-Object Name,Enabled,LastLogonDate",
+        "Locked Accounts": "Search-ADAccount -LockedOut | Select-Object Name,LastLogonDate",
+        "Disabled Accounts": "Search-ADAccount -AccountDisabled | Select-Object Name"
     },
-    "Storage": {
-        "Disk": ["chkdsk", "diskpart", "defrag"],
-        "File System": ["sfc /scannow", "DISM.exe"],
-        "Permissions": ["icacls", "takeown"],
+    "Group Management": {
+        "List Groups": "Get-ADGroup -Filter * | Select-Object Name,GroupCategory",
+        "Group Members": "Get-ADGroupMember -Identity '{group}' | Select-Object Name"
     },
-    "Security": {
-        "Malware": ["MRT.exe", "Windows Defender commands"],
-        "Accounts": ["net user", "net localgroup"],
-        "Auditing": ["auditpol", "secpol.msc"],
+    "Computer Management": {
+        "List Computers": "Get-ADComputer -Filter * | Select-Object Name,Enabled",
+        "Stale Computers": "Get-ADComputer -Filter {LastLogonDate -lt (Get-Date).AddDays(-90)}"
     }
 }
 
-# Add this near the top of your main.py file
-st.markdown("""
+DISCOVERY_COMMANDS = {
+    "ARP Table": "arp -a",
+    "Network Interfaces": "Get-NetAdapter | Select-Object Name,Status,LinkSpeed",
+    "IP Configuration": "Get-NetIPConfiguration | Format-List InterfaceAlias,IPv4Address,IPv4DefaultGateway,DNSServer",
+    "Routing Table": "Get-NetRoute -AddressFamily IPv4 | Select-Object DestinationPrefix,NextHop,RouteMetric"
+}
+
+# Steps run as a dependency graph: "after" orders steps, "when" makes a step
+# conditional on earlier results and "stop_if" ends the workflow early
+TROUBLESHOOTING_WORKFLOWS = {
+    "Network Connectivity": [
+        {"id": "config", "command": "ipconfig /all", "description": "Check network configuration",
+         "stop_if": ("failed", "error")},
+        {"id": "ping", "command": "ping 8.8.8.8", "description": "Test internet connectivity", "after": ["config"]},
+        {"id": "dns", "command": "nslookup google.com", "description": "Test DNS resolution", "after": ["config"]},
+        {"id": "tracert", "command": "tracert 8.8.8.8", "description": "Check network path",
+         "when": {"ping": ("failed", "timeout")}}
+    ],
+    "System Performance": [
+        {"id": "processes", "command": "tasklist", "description": "List running processes"},
+        {"id": "cpu", "command": "wmic cpu get loadpercentage", "description": "Check CPU usage"},
+        {"id": "memory", "command": "wmic memorychip get capacity", "description": "Check memory"},
+        {"id": "disk", "command": "wmic diskdrive get status", "description": "Check disk health"}
+    ],
+    "Service Issues": [
+        {"id": "services", "command": "net start", "description": "List running services"},
+        {"id": "status", "command": "sc query", "description": "Check service status"},
+        {"id": "events", "command": "wevtutil qe System /c:20 /rd:true /f:text", "description": "Check event logs"},
+        {"id": "health", "command": "dism /online /cleanup-image /scanhealth", "description": "Check system health",
+         "after": ["services", "status", "events"]}
+    ]
+}
+
+APP_CSS = """
 <style>
     .diagnostic-tool {
         background-color: #1E1E1E;
@@ -108,13 +395,6 @@ st.markdown("""
         font-weight: bold;
         color: #00FF00;
     }
-    .copy-tooltip {
-        display: inline-block;
-        margin-left: 10px;
-        padding: 5px;
-        background: #2E7D32;
-        border-radius: 4px;
-    }
     .custom-container {
         background-color: #1E1E1E;
         padding: 20px;
@@ -131,43 +411,202 @@ st.markdown("""
         font-weight: bold;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Injected on every run: Streamlit drops elements that a rerun does not emit
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+def answer_scope(structured=False):
+    # Similar questions only share answers made with the same prompt and mode
+    prompt_template, config = prompt_settings(structured)
+    return make_cache_key("", prompt_template, config)[:16]
 
-def get_gemini_response(question):
+def get_gemini_response(question, on_update=None, similarity_threshold=None, structured=False):
+    metrics = get_metrics()
+    stage = "validate"
     try:
-        # Validate input for network commands
-        if not re.match(SAFE_INPUT_REGEX, question):
-            return {"command": None, "explanation": "Invalid input detected. Only alphanumeric characters and common network symbols allowed."}
-            
-        chat_session = model.start_chat()
-        
-        # Enhanced prompt with network command context
-        modified_question = f"""For Windows network/IP commands: {question}
-        - Prioritize PowerShell over CMD
-        - Include security warnings for dangerous commands
-        - Suggest alternative GUI tools where applicable
-        Format: [Command]\n[Explanation]\n[Security Note]\n[Alternatives]"""
-        
-        response = chat_session.send_message(modified_question)
-        text = response.text
-        
-        # Enhanced parsing for network commands
-        match = re.search(
-            r"^((?:[A-Za-z0-9\-_]+\.exe\s)?[^\n`]+)(?:\n+)(.*?)(?:\n+Security Note:\s*(.*?))?(?:\n+Alternatives:\s*(.*))?$",
-            text.lstrip(),
-            re.DOTALL
-        )
-        if match:
-            command = match.group(1).strip()
-            explanation = match.group(2).strip()
-            # Clean any remaining backticks from the command
-            command = command.replace('`', '').strip()
-            return {"command": command, "explanation": explanation}
-        else:
-            return {"command": None, "explanation": "Could not extract command from response."}
+        with metrics.timer("gemini_stage_seconds", stage="total"):
+            # Validate input for network commands
+            with stage_timer(metrics, "validate"):
+                valid = is_valid_question(question)
+            if not valid:
+                metrics.inc("gemini_responses_total", source="invalid")
+                return dict(INVALID_INPUT_RESPONSE)
+
+            # Well-known requests are answered from the command templates without a model call
+            stage = "intent_match"
+            with stage_timer(metrics, stage):
+                fast_answer = get_intent_matcher().match(question)
+            if fast_answer is not None:
+                metrics.inc("gemini_responses_total", source="template")
+                return fast_answer
+
+            stage = "cache_lookup"
+            with stage_timer(metrics, stage):
+                cache = get_answer_cache()
+                prompt_template, config = prompt_settings(structured)
+                cache_key = make_cache_key(question, prompt_template, config)
+                cached = cache.get(cache_key)
+            if cached is not None:
+                cached["cached"] = True
+                metrics.inc("gemini_responses_total", source="cache")
+                return cached
+
+            stage = "semantic_lookup"
+            with stage_timer(metrics, stage):
+                similar = get_semantic_cache().lookup(question, threshold=similarity_threshold,
+                                                     scope=answer_scope(structured))
+            if similar is not None:
+                response = similar["response"]
+                response.update(cached=True, matched_question=similar["question"], similarity=similar["score"])
+                metrics.inc("gemini_responses_total", source="similar")
+                return response
+
+            # Sessions asking the same question at the same time share one upstream call
+            stage = "model"
+            session_id = get_session_id()
+            result = get_single_flight().do(
+                cache_key, lambda: query_gemini(question, cache, cache_key, session_id, on_update, structured)
+            )
+            metrics.inc("gemini_responses_total", source="model" if result["command"] else "unparsed")
+            return dict(result)
     except Exception as e:
+        metrics.inc("errors_total", stage=stage, error=type(e).__name__)
         return {"command": None, "explanation": f"Error: {e}"}
 
+def query_gemini(question, cache, cache_key, session_id, on_update=None, structured=False):
+    metrics = get_metrics()
+    queued = time.perf_counter()
+
+    def call():
+        metrics.observe("gemini_stage_seconds", time.perf_counter() - queued, stage="queue_wait")
+        return ask_model(get_model(api_key), question, on_update, structured, metrics=metrics)
+
+    result = get_gemini_scheduler().run(
+        call,
+        session_id=session_id,
+        priority=PRIORITY_INTERACTIVE,
+        tokens=estimate_tokens(question, structured),
+        timeout=120
+    )
+    # Only successful answers are worth keeping
+    if result["command"]:
+        cache.put(cache_key, question, result)
+        get_semantic_cache().add(question, result, scope=answer_scope(structured))
+    return result
+
+def show_cache_stats():
+    stats = get_answer_cache().stats()
+    with st.sidebar.expander("⚡ Answer Cache"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Hits", stats["hits"])
+        col2.metric("Misses", stats["misses"])
+        col3.metric("Evictions", stats["evictions"])
+        st.caption(f"Hit rate {stats['hit_rate']:.0%} · {stats['memory_entries']} in memory · {stats['disk_entries']} on disk")
+
+        intent_stats = get_intent_matcher().stats()
+        st.caption(
+            f"Template fast path answered {intent_stats['hits']} of {intent_stats['lookups']} "
+            f"questions ({intent_stats['hit_rate']:.0%})"
+        )
+
+        semantic_stats = get_semantic_cache().stats()
+        st.slider(
+            "Similar-question threshold",
+            0.7, 1.0, DEFAULT_THRESHOLD, 0.01,
+            key="similarity_threshold",
+            help="Serve a stored answer when a new question is at least this similar to an answered one"
+        )
+        st.caption(
+            f"Similar-question hits {semantic_stats['hits']} of {semantic_stats['lookups']} lookups · "
+            f"{semantic_stats['entries']} questions indexed"
+        )
+
+        prefetch_stats = get_prefetcher().stats()
+        st.caption(
+            f"Sidebar questions answered instantly {prefetch_stats['hits']} of {prefetch_stats['lookups']} "
+            f"({prefetch_stats['hit_rate']:.0%}), {prefetch_stats['prefetch_hits']} thanks to prefetching · "
+            f"{prefetch_stats['fetched']} answers prefetched, {prefetch_stats['queued']} queued · "
+            f"{prefetch_stats['calls_last_hour']} of {prefetch_stats['calls_per_hour']} prefetch calls this hour"
+        )
+
+def show_render_times():
+    render_times = st.session_state.get("render_times", {})
+    with st.sidebar.expander("⏱️ Render Times"):
+        if "app" in render_times:
+            st.metric("Last full run", f"{render_times['app'] * 1000:.0f} ms")
+        for name, seconds in sorted(render_times.items(), key=lambda item: -item[1]):
+            if name != "app":
+                st.caption(f"{name}: {seconds * 1000:.1f} ms")
+        if fragments_enabled():
+            st.caption("Tabs are isolated: a widget inside a tab reruns only that tab.")
+        else:
+            st.caption("Tab isolation is off: every widget reruns the whole app.")
+
+def is_metrics_admin(token):
+    # Asked once per session; hmac's comparison doesn't leak how much of the token matched
+    if st.session_state.get("metrics_admin"):
+        return True
+    entered = st.text_input("Admin token", type="password", key="metrics_admin_token")
+    if entered and hmac.compare_digest(entered.encode("utf-8"), token.encode("utf-8")):
+        st.session_state.metrics_admin = True
+        return True
+    if entered:
+        st.error("Wrong admin token.")
+    return False
+
+def show_metrics_panel(session_bytes):
+    # Process-wide metrics and a button that writes files on the server, so only for sessions
+    # that enter METRICS_ADMIN_TOKEN; with no token set the panel is hidden from everyone
+    token = os.environ.get("METRICS_ADMIN_TOKEN")
+    if not token:
+        return
+    metrics = get_metrics()
+    with st.sidebar.expander("📈 Metrics"):
+        if not is_metrics_admin(token):
+            return
+        rows = [
+            {
+                "Metric": name.removesuffix("_seconds"),
+                "Labels": ", ".join(f"{key}={value}" for key, value in labels.items()),
+                "Count": summary["count"],
+                **{f"p{int(q * 100)} ms": round(summary[f"p{int(q * 100)}"] * 1000, 1) for q in QUANTILES},
+            }
+            for name, labels, summary in metrics.histograms()
+            if name.endswith("_seconds")
+        ]
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        for name, labels, value in metrics.counters():
+            label_text = ", ".join(f"{key}={label_value}" for key, label_value in labels.items())
+            st.caption(f"{name} {{{label_text}}}: {value}")
+        answers = st.session_state.get("answers")
+        st.caption(
+            f"This session holds about {session_bytes / 1024:.0f} KB of state "
+            f"(budget {DEFAULT_SESSION_BUDGET_BYTES / 1024:.0f} KB)"
+            + (f" · {answers.evictions} old answers dropped" if isinstance(answers, BoundedDict) else "")
+        )
+        if st.button("Write Prometheus file", key="write_metrics"):
+            try:
+                metrics.write_prometheus()
+                st.caption(f"Wrote {DEFAULT_METRICS_PATH}")
+            except OSError as e:
+                st.error(f"Could not write {DEFAULT_METRICS_PATH}: {e}")
+
+def show_scheduler_stats():
+    metrics = get_gemini_scheduler().metrics()
+    with st.sidebar.expander("🚦 Gemini Queue"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Queued", metrics["queue_depth"])
+        col2.metric("In flight", metrics["in_flight"])
+        col3.metric("Wait p95", f"{metrics['wait_p95']:.1f}s")
+        st.caption(
+            f"Avg wait {metrics['wait_avg']:.2f}s · max {metrics['wait_max']:.1f}s · "
+            f"{metrics['quota_errors']} quota errors"
+        )
+        if metrics["backoff_remaining"]:
+            st.warning(f"Backing off for {metrics['backoff_remaining']:.0f}s after a quota error")
+
 def create_sidebar_menu():
     with st.sidebar:
         st.header("🔧 Troubleshooting Tools")
@@ -185,58 +624,105 @@ def create_sidebar_menu():
             
             if selected_subcategory:
                 commands = TROUBLESHOOTING_CATEGORIES[selected_category][selected_subcategory]
-                selected_command = st.selectbox(
+                # The user is likely to pick one of these next. Not on a session's first run,
+                # so opening the app never waits on the SDK import behind the first fetch.
+                if st.session_state.get("sidebar_rendered"):
+                    get_prefetcher().request([sidebar_question(command) for command in commands],
+                                             st.session_state.get("structured_output", False))
+                st.session_state.sidebar_rendered = True
+                command_key = f"sidebar_command_{selected_category}_{selected_subcategory}"
+                st.selectbox(
                     "Common Commands",
-                    commands
+                    commands,
+                    key=command_key,
+                    on_change=ask_about_command,
+                    args=(command_key,)
                 )
-                
-                if selected_command:
-                    st.session_state.question_input = f"Explain how to use {selected_command} command"
+
+def ask_about_command(command_key):
+    # Runs only when the user actually picks a command, not on every rerun
+    selected_command = st.session_state[command_key]
+    st.session_state.question_input = sidebar_question(selected_command)
+    submit_question()
+
+def submit_question():
+    question = st.session_state.get("question_input", "").strip()
+    st.session_state.submitted_question = question
+    answers = get_session_answers()
+    # An explicit resubmit should retry a question that failed last time
+    if question in answers and not answers[question]["command"]:
+        del answers[question]
 
 def save_command_history(command, explanation):
-    if 'command_history' not in st.session_state:
-        st.session_state.command_history = []
-    
-    st.session_state.command_history.append({
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        'command': command,
-        'explanation': explanation
-    })
+    get_history_store().append(command, explanation, session_id=get_session_id(), user_id=get_user_id())
+
+HISTORY_PAGE_SIZES = [10, 20, 50, 100]
+
+def set_history_page(page):
+    st.session_state.history_page = page
 
 # Add this function to show command history
+@tab_fragment
 def show_command_history():
-    if 'command_history' not in st.session_state:
-        st.session_state.command_history = []
+    store = get_history_store()
+    user_id = get_user_id()
     
     st.subheader("📜 Command History")
     
     col1, col2 = st.columns([4, 1])
     
     with col1:
-        if st.session_state.command_history:
-            for entry in reversed(st.session_state.command_history):
+        search = st.text_input("Filter history", key="history_search", placeholder="Filter by command...",
+                               on_change=set_history_page, args=(0,))
+        total = store.count(search, user_id)
+        if total:
+            page_size = st.session_state.get("history_page_size", 20)
+            pages = (total + page_size - 1) // page_size
+            page = min(st.session_state.get("history_page", 0), pages - 1)
+            # Only the visible page is read from the store and rendered
+            for entry in store.page(page, page_size, search, user_id):
                 with st.expander(f"{entry['timestamp']} - {entry['command'][:40]}..."):
                     st.code(entry['command'], language="batch")
                     st.write(entry['explanation'])
+            
+            prev_col, info_col, next_col = st.columns([1, 3, 1])
+            with prev_col:
+                st.button("◀ Newer", key="history_newer", disabled=page == 0,
+                          on_click=set_history_page, args=(page - 1,))
+            with info_col:
+                st.caption(f"Page {page + 1} of {pages} · {total} commands")
+            with next_col:
+                st.button("Older ▶", key="history_older", disabled=page >= pages - 1,
+                          on_click=set_history_page, args=(page + 1,))
+        elif search:
+            st.info("No commands match this filter.")
         else:
             st.info("No commands in history yet. Try running some commands!")
     
     with col2:
-        if st.session_state.command_history:
-            if st.button("Export History"):
-                history_text = "\n\n".join([
-                    f"Time: {entry['timestamp']}\nCommand: {entry['command']}\nExplanation: {entry['explanation']}"
-                    for entry in st.session_state.command_history
-                ])
-                st.download_button(
-                    "Download History",
-                    history_text,
-                    "command_history.txt",
-                    "text/plain"
-                )
+        if total or search:
+            st.selectbox("Per page", HISTORY_PAGE_SIZES, index=1, key="history_page_size",
+                         on_change=set_history_page, args=(0,))
+            export_format = st.selectbox("Export format", list(EXPORT_FORMATS), key="history_export_format")
+            # Built only when clicked, streamed from the store in batches, one part of at most
+            # EXPORT_PART_SIZE entries per file
+            parts = max(1, (total + EXPORT_PART_SIZE - 1) // EXPORT_PART_SIZE)
+            part = 0
+            if parts > 1:
+                part = st.selectbox("Export part", range(parts), key="history_export_part",
+                                    format_func=lambda p: f"{p + 1} of {parts}")
+            st.download_button(
+                "Export History",
+                functools.partial(export_file, store, export_format, search or None, user_id, part),
+                f"command_history{f'_part{part + 1}' if parts > 1 else ''}.{export_format}",
+                EXPORT_FORMATS[export_format]
+            )
             if st.button("Clear History"):
-                st.session_state.command_history = []
-                st.experimental_rerun()
+                # Only this user's history
+                store.clear(user_id)
+                st.session_state.pop("history_search_index", None)
+                st.session_state.history_page = 0
+                st.rerun()
 
 def generate_diagnostic_commands():
     return {
@@ -250,6 +736,41 @@ def generate_diagnostic_commands():
         "CPU Info": "wmic cpu get name,numberofcores,maxclockspeed",
     }
 
+@st.cache_resource
+def get_diagnostic_cache():
+    return ResultCache()
+
+DIAGNOSTIC_TARGETS = ["This machine", "Recorded outputs (replay)"]
+
+def credential_identity(username, password):
+    # Stable across processes, unlike hash(), and never the password itself
+    return hashlib.sha256(f"{username}\0{password}".encode("utf-8")).hexdigest()[:16]
+
+def get_diagnostic_executor(target, remote_host):
+    # Returns the executor, the host label and the cache scope for its results
+    if target == "Remote host (WinRM)":
+        username = st.session_state.get("remote_username", "")
+        password = st.session_state.get("remote_password", "")
+        pool = get_remote_pool(username, password,
+                               st.session_state.get("remote_timeout", int(DEFAULT_HOST_TIMEOUT)))
+        # Remote results are only reused for the same credentials
+        return RemoteExecutor(pool, remote_host), remote_host, credential_identity(username, password)
+    if target == "Recorded outputs (replay)":
+        recordings = os.environ.get("DIAGNOSTIC_RECORDINGS")
+        return (ReplayExecutor.from_file(recordings) if recordings else ReplayExecutor()), "replay", None
+    return LocalExecutor(), "localhost", None
+
+def show_diagnostic_result(result, status, output):
+    icon = REMOTE_STATUS_ICONS[result["status"]]
+    notes = [f"exit code {result['exit_code']}" if result["exit_code"] is not None else None,
+             f"{result['elapsed']:.1f}s",
+             "output truncated" if result["truncated"] else None,
+             f"cached {result['age']:.0f}s ago" if result["cached"] else None,
+             result["error"]]
+    status.caption(f"{icon} {result['status']} · " + " · ".join(note for note in notes if note))
+    output.code(result["output"] or "(no output)", language="text")
+
+@tab_fragment
 def create_diagnostic_report():
     st.subheader("🔍 System Diagnostic Report")
     
@@ -259,18 +780,98 @@ def create_diagnostic_report():
         list(diagnostic_commands.keys())
     )
     
+    col1, col2, col3 = st.columns(3)
+    targets = list(DIAGNOSTIC_TARGETS)
+    if WINRM_AVAILABLE or os.environ.get("REMOTE_TRANSPORT") == "fake":
+        targets.append("Remote host (WinRM)")
+    target = col1.selectbox("Run on", targets, key="diagnostic_target")
+    remote_host = ""
+    if target == "Remote host (WinRM)":
+        remote_host = col1.text_input("Host", key="diagnostic_host",
+                                      help="Uses the credentials from the Remote Management tab")
+    timeout = col2.number_input("Timeout per command (s)", min_value=1, max_value=600,
+                                value=int(DEFAULT_DIAGNOSTIC_TIMEOUT), key="diagnostic_timeout")
+    use_cache = col3.checkbox("Reuse recent results", value=True, key="diagnostic_use_cache",
+                              help=f"Results are kept for {DEFAULT_CACHE_TTL:.0f} seconds per host and command; "
+                                   "remote results only for the same credentials")
+    if target == "This machine" and os.name != "nt":
+        st.caption("These are Windows commands; on this server most of them will fail.")
+    
     if st.button("Generate Diagnostic Report"):
-        with st.spinner("Generating diagnostic commands..."):
-            st.markdown("### 📊 Diagnostic Commands")
-            for diagnostic in selected_diagnostics:
-                with st.expander(diagnostic):
-                    st.code(diagnostic_commands[diagnostic], language="batch")
-                    st.markdown("Copy and run these commands in PowerShell/CMD to generate the diagnostic information.")
+        if target == "Remote host (WinRM)" and not remote_host:
+            st.warning("Enter a host to run the diagnostics on.")
+            return
+        executor, host, cache_scope = get_diagnostic_executor(target, remote_host)
+        st.markdown("### 📊 Diagnostic Results")
+        panels = {}
+        for diagnostic in selected_diagnostics:
+            with st.expander(diagnostic, expanded=True):
+                st.code(diagnostic_commands[diagnostic], language="batch")
+                panels[diagnostic] = (st.empty(), st.empty())
+                panels[diagnostic][0].caption("⏳ running")
+        outputs = {diagnostic: [] for diagnostic in selected_diagnostics}
+        last_draw = {}
+        results = {}
+        events = run_diagnostics(
+            {diagnostic: diagnostic_commands[diagnostic] for diagnostic in selected_diagnostics},
+            executor,
+            host=host,
+            cache=get_diagnostic_cache() if use_cache else None,
+            timeout=timeout,
+            cache_scope=cache_scope,
+        )
+        for kind, diagnostic, payload in events:
+            status, output = panels[diagnostic]
+            if kind == "output":
+                outputs[diagnostic].append(payload)
+                # Redraw each command's output at most four times a second
+                if time.monotonic() - last_draw.get(diagnostic, 0) > 0.25:
+                    output.code("".join(outputs[diagnostic]), language="text")
+                    last_draw[diagnostic] = time.monotonic()
+            else:
+                results[diagnostic] = payload
+                show_diagnostic_result(payload, status, output)
+        st.session_state.diagnostic_results = [results[d] for d in selected_diagnostics if d in results]
+        return
+    
+    if st.session_state.get("diagnostic_results"):
+        st.markdown("### 📊 Diagnostic Results")
+        for result in st.session_state.diagnostic_results:
+            with st.expander(result["name"]):
+                st.code(result["command"], language="batch")
+                show_diagnostic_result(result, st.empty(), st.empty())
+
+def get_remote_pool(username, password, timeout):
+    # One pool per browser session; new credentials or timeout start a fresh pool
+    credentials = (credential_identity(username, password), timeout)
+    if st.session_state.get("remote_pool_credentials") != credentials:
+        if os.environ.get("REMOTE_TRANSPORT") == "fake":
+            transport = FakeTransport()
+        else:
+            transport = WinRMTransport(username, password, timeout=timeout)
+        st.session_state.remote_pool = SessionPool(transport)
+        st.session_state.remote_pool_credentials = credentials
+    return st.session_state.remote_pool
+
+REMOTE_STATUS_ICONS = {"ok": "✅", "failed": "⚠️", "error": "❌", "timeout": "⏱️"}
+
+def remote_result_rows(results):
+    return [
+        {
+            "Host": result["host"],
+            "Status": f"{REMOTE_STATUS_ICONS[result['status']]} {result['status']}",
+            "Exit code": result["exit_code"],
+            "Time (s)": result["elapsed"],
+            "Output": (result["stdout"] or result["stderr"] or result["error"] or "").strip().split("\n", 1)[0][:120],
+        }
+        for result in results
+    ]
 
+@tab_fragment
 def create_remote_management_tab():
     st.subheader("🌐 Remote Management")
     
-    if not WINRM_AVAILABLE:
+    if not WINRM_AVAILABLE and os.environ.get("REMOTE_TRANSPORT") != "fake":
         st.warning("""
         Remote Management features require the pywinrm package. 
         To enable this feature, install it using:
@@ -283,11 +884,12 @@ def create_remote_management_tab():
     col1, col2 = st.columns([1, 2])
     
     with col1:
-        remote_host = st.text_input(
-            label="Remote Host",
-            key="remote_host",
-            help="Enter the hostname or IP address"
+        remote_hosts = st.text_area(
+            label="Remote Hosts",
+            key="remote_hosts",
+            help="Hostnames or IP addresses, one per line or comma-separated"
         )
+        host_file = st.file_uploader("Or upload a host list", type=["txt", "csv"], key="remote_host_file")
         username = st.text_input(
             label="Username",
             key="remote_username",
@@ -299,72 +901,194 @@ def create_remote_management_tab():
             key="remote_password",
             help="Enter the remote system password"
         )
+        max_workers = st.number_input("Parallel hosts", min_value=1, max_value=128, value=DEFAULT_MAX_WORKERS,
+                                      key="remote_max_workers")
+        host_timeout = st.number_input("Timeout per host (s)", min_value=1, max_value=600,
+                                       value=int(DEFAULT_HOST_TIMEOUT), key="remote_timeout")
         
     with col2:
-        remote_commands = {
-            "System Health": "Get-ComputerInfo | Select-Object WindowsVersion,OsHardwareAbstractionLayer,OsArchitecture",
-            "Disk Space": "Get-WmiObject Win32_LogicalDisk | Select-Object DeviceID,Size,FreeSpace",
-            "Running Services": "Get-Service | Where-Object {$_.Status -eq 'Running'}",
-            "Active Users": "Get-WmiObject -Class Win32_ComputerSystem | Select-Object UserName",
-            "Network Connections": "Get-NetTCPConnection | Where-Object State -eq 'Established'"
-        }
+        selected_command = st.selectbox("Select Remote Command", list(REMOTE_COMMANDS.keys()))
         
-        selected_command = st.selectbox("Select Remote Command", list(remote_commands.keys()))
+        host_text = remote_hosts
+        if host_file is not None:
+            host_text += "\n" + host_file.getvalue().decode("utf-8", errors="replace")
+        hosts, invalid_hosts = parse_hosts(host_text)
+        if invalid_hosts:
+            st.warning(f"Skipping invalid host names: {', '.join(invalid_hosts[:10])}")
         
-        if st.button("Execute Remote Command"):
-            try:
-                session = winrm.Session(remote_host, auth=(username, password))
-                result = session.run_ps(remote_commands[selected_command])
-                st.code(result.std_out.decode())
-            except Exception as e:
-                st.error(f"Remote execution failed: {str(e)}")
+        if st.button("Execute Remote Command", disabled=not hosts):
+            pool = get_remote_pool(username, password, host_timeout)
+            progress = st.progress(0.0, text=f"0 of {len(hosts)} hosts")
+            table = st.empty()
+            results = []
+            last_draw = 0.0
+            # Rows are added as each host finishes; redraws are throttled for large host lists
+            for result in fan_out(hosts, REMOTE_COMMANDS[selected_command], pool,
+                                  max_workers=max_workers, timeout=host_timeout):
+                results.append(result)
+                if time.monotonic() - last_draw > 0.25 or len(results) == len(hosts):
+                    progress.progress(len(results) / len(hosts), text=f"{len(results)} of {len(hosts)} hosts")
+                    table.dataframe(remote_result_rows(results), hide_index=True)
+                    last_draw = time.monotonic()
+            progress.empty()
+            st.session_state.remote_results = {"command": selected_command, "results": results}
+            table.empty()
+        
+        remote_results = st.session_state.get("remote_results")
+        if remote_results:
+            results = remote_results["results"]
+            counts = {status: sum(r["status"] == status for r in results) for status in REMOTE_STATUS_ICONS}
+            st.caption(
+                f"{remote_results['command']} on {len(results)} hosts: "
+                + " · ".join(f"{REMOTE_STATUS_ICONS[status]} {count} {status}" for status, count in counts.items() if count)
+            )
+            st.dataframe(remote_result_rows(results), hide_index=True)
+            selected_host = st.selectbox("Show full output for", [r["host"] for r in results], key="remote_output_host")
+            for result in results:
+                if result["host"] == selected_host:
+                    stdout = result["stdout"]
+                    if looks_like_records(stdout) and st.toggle("Show as table", key="remote_output_table"):
+                        show_record_pages("remote_records", (selected_host, hash(stdout)), lambda: stdout)
+                    else:
+                        st.code(stdout or result["stderr"] or result["error"] or "(no output)")
+
+RECORD_PAGE_SIZES = (25, 50, 100, 250)
+
+def set_records_page(key, page):
+    st.session_state[f"{key}_page"] = page
+
+def show_record_pages(key, source, open_stream):
+    # CSV or JSON command output as a paged, filterable table. Each view is one streaming
+    # pass that keeps only the visible page; `source` identifies the output so an
+    # unchanged view isn't scanned again on reruns.
+    try:
+        first = next(iter_records(open_stream()), None)
+    except ValueError as e:
+        st.error(f"Could not read the output: {e}")
+        return
+    if first is None:
+        st.info("No records found in the output.")
+        return
+    
+    col1, col2 = st.columns([3, 1])
+    filter_columns = col1.multiselect("Filter columns", list(first), key=f"{key}_filter_columns",
+                                      on_change=set_records_page, args=(key, 0))
+    page_size = col2.selectbox("Rows per page", RECORD_PAGE_SIZES, index=1, key=f"{key}_page_size",
+                               on_change=set_records_page, args=(key, 0))
+    filters = {}
+    if filter_columns:
+        for column, col in zip(filter_columns, st.columns(len(filter_columns))):
+            filters[column] = col.text_input(f"{column} contains", key=f"{key}_filter_{column}",
+                                             on_change=set_records_page, args=(key, 0))
+    
+    page = st.session_state.get(f"{key}_page", 0)
+    view_key = (source, tuple(sorted(filters.items())), page, page_size)
+    cached = st.session_state.get(f"{key}_view")
+    if cached is None or cached["key"] != view_key:
+        started = time.perf_counter()
+        try:
+            view = page_records(iter_records(open_stream()), filters, page, page_size)
+        except ValueError as e:
+            st.error(f"Could not read the output: {e}")
+            return
+        cached = {"key": view_key, "view": view, "elapsed": time.perf_counter() - started}
+        st.session_state[f"{key}_view"] = cached
+    view = cached["view"]
+    
+    st.dataframe(view["rows"], column_order=view["columns"], hide_index=True)
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    with prev_col:
+        st.button("◀ Previous", key=f"{key}_prev", disabled=view["page"] == 0,
+                  on_click=set_records_page, args=(key, view["page"] - 1))
+    with info_col:
+        st.caption(f"Page {view['page'] + 1} of {view['pages']} · {view['matched']:,} of {view['total']:,} records match"
+                   f" · read in {cached['elapsed'] * 1000:.0f} ms")
+    with next_col:
+        st.button("Next ▶", key=f"{key}_next", disabled=view["page"] >= view["pages"] - 1,
+                  on_click=set_records_page, args=(key, view["page"] + 1))
 
+def looks_like_records(output):
+    # ConvertTo-Csv and ConvertTo-Json output, as opposed to formatted tables and lists
+    return output.lstrip().startswith(("[", "{", '"', "#TYPE"))
+
+def create_ad_query_builder():
+    st.markdown("### Query Builder")
+    st.caption("Builds commands that filter and page on the domain controller instead of fetching every object.")
+    
+    object_type = st.selectbox("Object Type", list(AD_OBJECT_TYPES.keys()), key="ad_query_type")
+    spec = AD_OBJECT_TYPES[object_type]
+    chosen = st.multiselect("Conditions", list(spec["conditions"].keys()), key=f"ad_query_conditions_{object_type}")
+    conditions = {}
+    for label in chosen:
+        needs = condition_input(spec["conditions"][label])
+        if needs == "days":
+            conditions[label] = st.number_input(label, min_value=1, value=90, key=f"ad_query_{object_type}_{label}")
+        elif needs == "value":
+            conditions[label] = st.text_input(label, key=f"ad_query_{object_type}_{label}")
+        else:
+            conditions[label] = None
+    
+    col1, col2 = st.columns([3, 1])
+    search_base = col1.text_input("Search Base", key="ad_query_base", placeholder="OU=Staff,DC=corp,DC=example,DC=com",
+                                  help="Distinguished name of the OU or container to search; empty searches the whole domain")
+    scope = col2.selectbox("Scope", SEARCH_SCOPES, key="ad_query_scope")
+    properties = st.multiselect("Properties", list(spec["properties"]), default=list(spec["selected"]),
+                                key=f"ad_query_properties_{object_type}")
+    col1, col2, col3 = st.columns(3)
+    page_size = col1.number_input("Result page size", min_value=1, max_value=100000,
+                                  value=DEFAULT_RESULT_PAGE_SIZE, key="ad_query_page_size",
+                                  help="Objects the domain controller returns per page (-ResultPageSize)")
+    result_size = col2.number_input("Max results (0 = all)", min_value=0, value=0, step=100,
+                                    key="ad_query_result_size")
+    output = col3.radio("Output", OUTPUT_FORMATS, format_func=str.upper, horizontal=True, key="ad_query_output")
+    
+    try:
+        command = build_ad_query(object_type, conditions, search_base, scope, properties,
+                                 page_size=page_size, result_size=result_size, output=output)
+    except ValueError as e:
+        st.warning(str(e))
+    else:
+        st.code(command, language="powershell")
+    
+    st.markdown("### Query Results")
+    uploaded = st.file_uploader("Command output (CSV or JSON)", type=["csv", "json", "txt"], key="ad_results_file")
+    pasted = st.text_area("Or paste the output", key="ad_results_text", height=120)
+    if uploaded is not None:
+        def open_stream():
+            # Decoded as it's read, so the rows are never all in memory at once
+            uploaded.seek(0)
+            return codecs.getreader("utf-8-sig")(uploaded, errors="replace")
+        show_record_pages("ad_results", ("file", uploaded.file_id), open_stream)
+    elif pasted.strip():
+        show_record_pages("ad_results", ("text", hash(pasted)), lambda: pasted)
+
+@tab_fragment
 def create_ad_management():
     st.subheader("👥 Active Directory Management")
     
-    ad_operations = {
-        "User Management": {
-            "List Users": "Get-ADUser -Filter * | Select-Object Name,Enabled,LastLogonDate",
-            "Locked Accounts": "Search-ADAccount -LockedOut | Select-Object Name,LastLogonDate",
-            "Disabled Accounts": "Search-ADAccount -AccountDisabled | Select-Object Name"
-        },
-        "Group Management": {
-            "List Groups": "Get-ADGroup -Filter * | Select-Object Name,GroupCategory",
-            "Group Members": "Get-ADGroupMember -Identity '{group}' | Select-Object Name"
-        },
-        "Computer Management": {
-            "List Computers": "Get-ADComputer -Filter * | Select-Object Name,Enabled",
-            "Stale Computers": "Get-ADComputer -Filter {LastLogonDate -lt (Get-Date).AddDays(-90)}"
-        }
-    }
-    
-    category = st.selectbox("Select AD Category", list(ad_operations.keys()))
-    operation = st.selectbox("Select Operation", list(ad_operations[category].keys()))
+    category = st.selectbox("Select AD Category", list(AD_OPERATIONS.keys()))
+    operation = st.selectbox("Select Operation", list(AD_OPERATIONS[category].keys()))
     
-    if category == "Group Management" and "group" in ad_operations[category][operation]:
+    if category == "Group Management" and "group" in AD_OPERATIONS[category][operation]:
         group_name = st.text_input("Enter Group Name")
-        command = ad_operations[category][operation].format(group=group_name)
+        command = AD_OPERATIONS[category][operation].format(group=group_name)
     else:
-        command = ad_operations[category][operation]
+        command = AD_OPERATIONS[category][operation]
     
     if st.button("Execute AD Command"):
         st.code(command, language="powershell")
+    
+    create_ad_query_builder()
 
+@tab_fragment
 def create_network_topology():
     st.subheader("🌐 Network Topology Visualizer")
     
-    discovery_commands = {
-        "ARP Table": "arp -a",
-        "Network Interfaces": "Get-NetAdapter | Select-Object Name,Status,LinkSpeed",
-        "IP Configuration": "Get-NetIPConfiguration | Select-Object InterfaceAlias,IPv4Address",
-        "Routing Table": "Get-NetRoute | Select-Object DestinationPrefix,NextHop,RouteMetric"
-    }
-    
     col1, col2 = st.columns([2, 3])
     
     with col1:
         st.markdown("### Network Discovery Commands")
-        for name, command in discovery_commands.items():
+        for name, command in DISCOVERY_COMMANDS.items():
             with st.expander(name):
                 st.code(command, language="powershell")
                 if st.button(f"Copy {name} Command", key=f"copy_{name}"):
@@ -372,133 +1096,272 @@ def create_network_topology():
     
     with col2:
         st.markdown("### Network Visualization")
+        outputs = {
+            "arp": st.text_area("ARP table (arp -a)", key="topology_arp", height=120),
+            "routes": st.text_area("Routing table (Get-NetRoute)", key="topology_routes", height=120),
+            "ip_configuration": st.text_area(
+                "IP configuration (Get-NetIPConfiguration)", key="topology_ipconfig", height=120
+            ),
+        }
+        uploads = st.file_uploader(
+            "Or upload saved command output",
+            type=["txt", "log"],
+            accept_multiple_files=True,
+            key="topology_files",
+            help="The kind of output in each file is detected from its headers"
+        )
         if st.button("Generate Network Map"):
             try:
-                G = nx.Graph()
-                
-                # Add example network structure
-                G.add_node("Local PC", type="computer")
-                G.add_node("Gateway", type="router")
-                G.add_node("Internet", type="cloud")
-                G.add_edge("Local PC", "Gateway")
-                G.add_edge("Gateway", "Internet")
-                
-                plt.figure(figsize=(10, 8))
-                pos = nx.spring_layout(G)
-                nx.draw(G, pos, with_labels=True, 
-                       node_color='lightblue',
-                       node_size=2000, 
-                       font_size=10, 
-                       font_weight='bold')
-                
-                st.pyplot(plt)
-                plt.close()
+                texts = {kind: [text] for kind, text in outputs.items() if text.strip()}
+                for upload in uploads or []:
+                    text = upload.getvalue().decode("utf-8", errors="replace")
+                    kind = detect_output_kind(text)
+                    if kind:
+                        texts.setdefault(kind, []).append(text)
+                    else:
+                        st.warning(f"Could not tell what kind of output {upload.name} contains")
+                if not texts:
+                    st.warning("Paste or upload the output of at least one discovery command")
+                else:
+                    started = time.perf_counter()
+                    G = build_topology(
+                        [entry for text in texts.get("arp", []) for entry in parse_arp(text)],
+                        [route for text in texts.get("routes", []) for route in parse_routes(text)],
+                        [config for text in texts.get("ip_configuration", []) for config in parse_ip_configuration(text)],
+                    )
+                    st.session_state.topology_map = {
+                        "svg": render_topology(G),
+                        "summary": topology_summary(G),
+                        "edges": G.number_of_edges(),
+                        "elapsed": time.perf_counter() - started,
+                    }
             except Exception as e:
                 st.error(f"Error generating network map: {str(e)}")
 
+        topology_map = st.session_state.get("topology_map")
+        if topology_map:
+            summary = topology_map["summary"]
+            st.caption(
+                " · ".join(f"{count} {kind}" for kind, count in sorted(summary.items()))
+                + f" · {topology_map['edges']} links · built in {topology_map['elapsed'] * 1000:.0f} ms"
+            )
+            st.image(topology_map["svg"], width="stretch")
+
+@st.cache_resource
+def get_layout_cache():
+    return LayoutCache()
+
+def render_topology(G):
+    # Layouts are shared across sessions and keyed by the graph's contents, so
+    # regenerating an unchanged map skips the layout entirely
+    return render_svg(G, get_layout_cache().layout(G))
+
+@st.cache_resource
+def get_metric_collectors():
+    return CollectorRegistry()
+
+MONITOR_WINDOWS = {"Last 5 minutes": 300, "Last 15 minutes": 900, "Last hour": 3600, "Everything kept": None}
+
+def format_metric(metric, value):
+    if value is None:
+        return "–"
+    return f"{value:,.1f} {METRIC_UNITS[metric]}"
+
+def show_metric_charts(collector, selected_metrics, window_seconds):
+    # Reads snapshots only; sampling happens on the collector's own thread
+    cols = st.columns(len(selected_metrics))
+    for i, metric in enumerate(selected_metrics):
+        snapshot = collector.snapshot(metric, window_seconds, subscriber=get_session_id())
+        with cols[i]:
+            st.metric(metric, format_metric(metric, snapshot["latest"]),
+                      chart_data=snapshot["avg"][-30:].tolist(), chart_type="line")
+    for metric in selected_metrics:
+        snapshot = collector.snapshot(metric, window_seconds)
+        if len(snapshot["times"]) > 1:
+            st.caption(f"{metric} ({METRIC_UNITS[metric]}): min / avg / max per interval")
+            st.line_chart(
+                {
+                    "time": (snapshot["times"] * 1000).astype("int64").astype("datetime64[ms]"),
+                    "min": snapshot["min"],
+                    "avg": snapshot["avg"],
+                    "max": snapshot["max"],
+                },
+                x="time",
+                y=["min", "avg", "max"],
+                height=200,
+            )
+    if collector.last_error:
+        st.warning(f"Last sample failed: {collector.last_error}")
+    st.caption(f"{collector.samples} samples collected from {collector.source.label}")
+
+@tab_fragment
 def create_system_monitor():
     st.subheader("📊 System Health Monitor")
     
-    monitor_commands = {
-        "CPU Usage": "Get-Counter '\\Processor(_Total)\\% Processor Time'",
-        "Memory Usage": "Get-Counter '\\Memory\\Available MBytes'",
-        "Disk IO": "Get-Counter '\\PhysicalDisk(_Total)\\Disk Reads/sec'",
-        "Network": "Get-Counter '\\Network Interface(*)\\Bytes Total/sec'"
-    }
+    monitor_commands = {metric: f"Get-Counter '{path}'" for metric, path in COUNTER_PATHS.items()}
     
     col1, col2 = st.columns(2)
     
     with col1:
         refresh_rate = st.slider("Refresh Rate (seconds)", 1, 60, 5)
         selected_metrics = st.multiselect("Select Metrics", list(monitor_commands.keys()))
+        window = st.selectbox("History", list(MONITOR_WINDOWS), key="monitor_window")
     
     with col2:
+        sources = ["This server", "Simulated"]
+        if WINRM_AVAILABLE or os.environ.get("REMOTE_TRANSPORT") == "fake":
+            sources.append("Remote host (WinRM)")
+        source_name = st.selectbox("Source", sources, key="monitor_source")
+        remote_host = ""
+        if source_name == "Remote host (WinRM)":
+            remote_host = st.text_input("Host", key="monitor_host",
+                                        help="Uses the credentials from the Remote Management tab")
+        
         if 'monitoring' not in st.session_state:
             st.session_state.monitoring = False
             
         if st.button("Start Monitoring" if not st.session_state.monitoring else "Stop Monitoring"):
             st.session_state.monitoring = not st.session_state.monitoring
     
-    placeholder = st.empty()
-    
     if st.session_state.monitoring and selected_metrics:
-        try:
-            metrics_data = {}
-            for metric in selected_metrics:
-                # Simulate metric collection
-                metrics_data[metric] = random.random() * 100
-            
-            with placeholder.container():
-                cols = st.columns(len(metrics_data))
-                for i, (metric, value) in enumerate(metrics_data.items()):
-                    with cols[i]:
-                        st.metric(metric, f"{value:.2f}%")
-                        st.code(monitor_commands[metric], language="powershell")
-            
-            time.sleep(refresh_rate)
-        except Exception as e:
-            st.error(f"Monitoring error: {str(e)}")
-            st.session_state.monitoring = False
+        if source_name == "Remote host (WinRM)":
+            if not remote_host:
+                st.info("Enter a host to monitor.")
+                return
+            username = st.session_state.get("remote_username", "")
+            password = st.session_state.get("remote_password", "")
+            pool = get_remote_pool(username, password,
+                                   st.session_state.get("remote_timeout", int(DEFAULT_HOST_TIMEOUT)))
+            create_source = lambda: RemoteCounterSource(pool.run, remote_host)
+            # A collector reads with the credentials it was built with, so only sessions using
+            # the same ones share it; a collector left behind stops once nobody reads it
+            identity = credential_identity(username, password)
+        elif source_name == "Simulated":
+            create_source = SimulatedSource
+            identity = None
+        else:
+            create_source = LocalSource
+            identity = None
+        # Sessions sharing a collector each keep their own refresh rate
+        collector = get_metric_collectors().get((source_name, remote_host, identity), create_source,
+                                                interval=refresh_rate, subscriber=get_session_id())
+        
+        for metric in selected_metrics:
+            st.code(monitor_commands[metric], language="powershell")
+        # Redraws on a timer without rerunning the rest of the tab or blocking other widgets
+        if _fragment is not None:
+            _fragment(show_metric_charts, run_every=refresh_rate)(collector, selected_metrics, MONITOR_WINDOWS[window])
+        else:
+            show_metric_charts(collector, selected_metrics, MONITOR_WINDOWS[window])
+
+def open_help_section(section_id):
+    st.session_state.help_section = section_id
+    st.session_state.help_open = True
 
 def create_help_system():
     st.sidebar.markdown("---")
     st.sidebar.header("📚 Documentation")
     
-    help_sections = {
-        "Getting Started": "getting-started",
-        "Command Assistant": "command-assistant",
-        "Diagnostic Tools": "diagnostic-report",
-        "Remote Management": "remote-management",
-        "AD Management": "active-directory-management",
-        "Network Tools": "network-topology",
-        "System Monitor": "system-monitor",
-        "Security Best Practices": "security-notes",
-        "Troubleshooting": "troubleshooting"
-    }
+    # One snapshot, so a reparse can't remove a topic between listing and showing it
+    sections = get_help_index().sections()
+    topics = help_topics(sections)
+    if not topics:
+        st.sidebar.error("Documentation file not found!")
+        return
+    if st.session_state.get("help_section") not in topics:
+        # The guide changed and the selected section is gone
+        st.session_state.pop("help_section", None)
     
-    selected_section = st.sidebar.selectbox(
+    section_id = st.sidebar.selectbox(
         "Help Topics",
-        list(help_sections.keys())
+        topics,
+        key="help_section",
+        format_func=lambda topic: sections[topic]["title"]
     )
     
-    if selected_section:
-        section_id = help_sections[selected_section]
-        docs_path = Path("docs/user_guide.md")
-        
-        if st.sidebar.button("Open Documentation"):
-            if docs_path.exists():
-                with docs_path.open() as f:
-                    content = f.read()
-                    st.sidebar.markdown(content)
-            else:
-                st.sidebar.error("Documentation file not found!")
+    if st.sidebar.toggle("Open Documentation", key="help_open"):
+        # Only the selected section, from the parsed guide
+        st.sidebar.markdown(sections[section_id]["text"])
+
+FAVORITES_PAGE_SIZE = 20
+
+def favorite_key(command):
+    # Widget keys come from the whole command, so commands with a common prefix don't collide
+    return hashlib.sha1(command.encode("utf-8")).hexdigest()[:16]
+
+def set_favorites_page(page):
+    st.session_state.favorites_page = page
 
 def add_command_favorites():
-    if 'favorites' not in st.session_state:
-        st.session_state.favorites = []
+    favorites = get_favorites_state(get_user_id())
     
     def add_to_favorites(command, explanation):
-        if command not in [f['command'] for f in st.session_state.favorites]:
-            st.session_state.favorites.append({
+        # Favorites are keyed by command, so this is a single lookup however many there are
+        if favorites.get(command) is None:
+            favorites.put(command, {
                 'command': command,
                 'explanation': explanation,
                 'added_on': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             })
     
     def show_favorites():
-        if st.session_state.favorites:
-            for fav in st.session_state.favorites:
+        entries = favorites.items()
+        if entries:
+            pages = (len(entries) + FAVORITES_PAGE_SIZE - 1) // FAVORITES_PAGE_SIZE
+            page = min(st.session_state.get("favorites_page", 0), pages - 1)
+            # Only the visible page is rendered
+            for _, fav in entries[page * FAVORITES_PAGE_SIZE:(page + 1) * FAVORITES_PAGE_SIZE]:
                 with st.expander(f"⭐ {fav['command'][:40]}..."):
                     st.code(fav['command'], language="batch")
                     st.write(fav['explanation'])
-                    if st.button("Remove", key=f"remove_{fav['command'][:20]}"):
-                        st.session_state.favorites.remove(fav)
-                        st.experimental_rerun()
+                    if st.button("Remove", key=f"remove_{favorite_key(fav['command'])}"):
+                        favorites.delete(fav['command'])
+                        st.rerun()
+            if pages > 1:
+                prev_col, info_col, next_col = st.columns([1, 3, 1])
+                with prev_col:
+                    st.button("◀ Previous", key="favorites_prev", disabled=page == 0,
+                              on_click=set_favorites_page, args=(page - 1,))
+                with info_col:
+                    st.caption(f"Page {page + 1} of {pages} · {len(entries)} favorites")
+                with next_col:
+                    st.button("Next ▶", key="favorites_next", disabled=page >= pages - 1,
+                              on_click=set_favorites_page, args=(page + 1,))
         else:
             st.info("No favorite commands yet!")
     
     return add_to_favorites, show_favorites
 
+def get_favorites_index():
+    # The user's favorites, kept per session and rebuilt only when they change
+    favorites = get_favorites_state(get_user_id())
+    entries = favorites.items()
+    search = st.session_state.get("favorites_search_index")
+    if search is None or search["state"] is not favorites or search["version"] != favorites.version:
+        index = SearchIndex()
+        for _, fav in entries:
+            index.add(fav["command"], fav["explanation"][:80], "Favorites", kind="favorite")
+        search = st.session_state.favorites_search_index = {"state": favorites, "version": favorites.version,
+                                                              "index": index}
+    return search["index"]
+
+def get_history_index():
+    # The user's own history, kept per session and synced with commands saved since the last search
+    user_id = get_user_id()
+    search = st.session_state.get("history_search_index")
+    if search is None or search["user_id"] != user_id:
+        search = st.session_state.history_search_index = {"user_id": user_id, "index": SearchIndex()}
+    search["index"].sync_history(get_history_store(), user_id)
+    return search["index"]
+
+def search_commands(query, limit=8):
+    index = get_search_index()
+    index.sync_help(get_help_index())
+    results = (index.search(query, limit) + get_history_index().search(query, limit)
+               + get_favorites_index().search(query, limit))
+    results.sort(key=lambda result: -result["score"])
+    return results[:limit]
+
 def create_command_search():
     st.sidebar.markdown("---")
     st.sidebar.header("🔍 Command Search")
@@ -509,47 +1372,232 @@ def create_command_search():
         placeholder="Search commands...",
         help="Enter keywords to search commands"
     )
+    
+    if search_term.strip():
+        started = time.perf_counter()
+        results = search_commands(search_term)
+        elapsed = (time.perf_counter() - started) * 1000
+        if results:
+            for result in results:
+                if result["kind"] == "help":
+                    st.sidebar.button(f"📚 {result['title']}", key=f"help_result_{result['command']}",
+                                      on_click=open_help_section, args=(result["command"],))
+                    continue
+                st.sidebar.code(result["command"], language="powershell")
+                st.sidebar.caption(f"{result['title']} · {result['source']}" if result["title"] else result["source"])
+        else:
+            st.sidebar.info("No matching commands.")
+        st.sidebar.caption(f"{len(results)} results in {elapsed:.1f} ms")
+
+WORKFLOW_STATUS_ICONS = dict(REMOTE_STATUS_ICONS, skipped="⏭️")
+
+def summarize_workflow_results(workflow, steps, results):
+    # One model call for the whole run, however many steps produced output
+    prompt = build_summary_prompt(workflow, steps, results)
+    return get_gemini_scheduler().run(
+        lambda: summarize_workflow(get_model(api_key), workflow, steps, results),
+        session_id=get_session_id(),
+        priority=PRIORITY_INTERACTIVE,
+        tokens=estimate_summary_tokens(prompt),
+        timeout=120
+    )
 
+def show_workflow_step(result, status, output):
+    if result is None:
+        status.caption("⏳ running")
+        return
+    note = result["error"] if result["status"] in ("skipped", "timeout", "error") else f"exit code {result['exit_code']}"
+    status.caption(f"{WORKFLOW_STATUS_ICONS[result['status']]} {result['status']} · {result['elapsed']:.1f}s · {note}")
+    if result["output"]:
+        output.code(result["output"], language="text")
+
+@tab_fragment
 def create_troubleshooting_workflow():
     st.header("🔄 Automated Troubleshooting")
     
-    workflows = {
-        "Network Connectivity": [
-            {"command": "ipconfig /all", "description": "Check network configuration"},
-            {"command": "ping 8.8.8.8", "description": "Test internet connectivity"},
-            {"command": "nslookup google.com", "description": "Test DNS resolution"},
-            {"command": "tracert 8.8.8.8", "description": "Check network path"}
-        ],
-        "System Performance": [
-            {"command": "tasklist", "description": "List running processes"},
-            {"command": "wmic cpu get loadpercentage", "description": "Check CPU usage"},
-            {"command": "wmic memorychip get capacity", "description": "Check memory"},
-            {"command": "wmic diskdrive get status", "description": "Check disk health"}
-        ],
-        "Service Issues": [
-            {"command": "net start", "description": "List running services"},
-            {"command": "sc query", "description": "Check service status"},
-            {"command": "eventvwr.msc", "description": "Check event logs"},
-            {"command": "dism /online /cleanup-image /scanhealth", "description": "Check system health"}
-        ]
-    }
-    
-    workflow = st.selectbox("Select Troubleshooting Workflow", list(workflows.keys()))
+    workflow = st.selectbox("Select Troubleshooting Workflow", list(TROUBLESHOOTING_WORKFLOWS.keys()))
     
     if workflow:
-        steps = workflows[workflow]
+        steps = TROUBLESHOOTING_WORKFLOWS[workflow]
+        col1, col2 = st.columns(2)
+        target = col1.selectbox("Run on", DIAGNOSTIC_TARGETS, key="workflow_target")
+        summarize = col2.checkbox("Summarize results with Gemini", value=True, key="workflow_summarize")
+        panels = {}
         for i, step in enumerate(steps, 1):
             with st.expander(f"Step {i}: {step['description']}"):
                 st.code(step['command'], language="batch")
-                if st.button(f"Run Step {i}"):
-                    st.info(f"Command copied: {step['command']}")
-                    # Save to history
+                panels[step["id"]] = (st.empty(), st.empty())
+        
+        previous = st.session_state.get("workflow_run")
+        if st.button("Run Workflow", key="run_workflow"):
+            executor, host, _ = get_diagnostic_executor(target, "")
+            outputs = {step["id"]: [] for step in steps}
+            results = {}
+            last_draw = {}
+            started = time.perf_counter()
+            for kind, step_id, payload in run_workflow(steps, executor, host=host):
+                status, output = panels[step_id]
+                if kind == "start":
+                    show_workflow_step(None, status, output)
+                elif kind == "output":
+                    outputs[step_id].append(payload)
+                    if time.monotonic() - last_draw.get(step_id, 0) > 0.25:
+                        output.code("".join(outputs[step_id]), language="text")
+                        last_draw[step_id] = time.monotonic()
+                else:
+                    results[step_id] = payload
+                    show_workflow_step(payload, status, output)
+            elapsed = time.perf_counter() - started
+            for step in steps:
+                if results[step["id"]]["status"] != "skipped":
                     save_command_history(step['command'], step['description'])
+            summary = None
+            if summarize:
+                with st.spinner("Summarizing results..."):
+                    try:
+                        summary = summarize_workflow_results(workflow, steps, results)
+                    except Exception as e:
+                        summary = f"Error: {e}"
+            previous = {"workflow": workflow, "results": results, "elapsed": elapsed, "summary": summary}
+            st.session_state.workflow_run = previous
+        elif previous and previous["workflow"] == workflow:
+            for step in steps:
+                show_workflow_step(previous["results"][step["id"]], *panels[step["id"]])
+        
+        if previous and previous["workflow"] == workflow:
+            total = sum(result["elapsed"] for result in previous["results"].values())
+            st.caption(f"Finished in {previous['elapsed']:.1f}s; the steps took {total:.1f}s in total")
+            if previous["summary"]:
+                st.markdown("### Summary")
+                st.markdown(previous["summary"])
+
+@tab_fragment
+def create_command_assistant(add_to_favorites):
+    col1, col2, col3 = st.columns([1, 8, 1])
+    with col2:
+        st.markdown("""
+        <div class="app-header">
+            <div class="app-title">
+                <span>🖥️ Windows Command Helper</span>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Fix: Add proper label and hide it
+        st.text_input(
+            label="Command Input",  # Add label
+            key="question_input",
+            placeholder="Ask a question about Windows commands...",
+            help="Press Enter or click 'Get Answer' to submit",
+            label_visibility="collapsed",  # Hide the label but keep it accessible
+            on_change=submit_question
+        )
+
+        col_submit, col_stream, col_structured = st.columns([1, 1, 1])
+        with col_submit:
+            st.button("Get Answer", on_click=submit_question)
+        with col_structured:
+            structured = st.toggle(
+                "Structured output",
+                key="structured_output",
+                help="Ask Gemini for JSON instead of free text (no streaming)"
+            )
+        with col_stream:
+            st.toggle("Stream response", value=True, key="stream_responses", disabled=structured)
+        
+        # Only a submission calls the model; other widget clicks reuse the session's answer
+        submitted_question = st.session_state.get("submitted_question")
+        if submitted_question:
+            answers = get_session_answers()
+            if submitted_question not in answers:
+                if st.session_state.get("stream_responses", True) and not structured:
+                    # Fill in each section as its chunks arrive, command first
+                    live_response = st.empty()
+                    def show_partial_response(sections):
+                        with live_response.container():
+                            if sections["command"]:
+                                st.code(sections["command"], language="batch")
+                            if sections["explanation"]:
+                                st.write(sections["explanation"])
+                    answers[submitted_question] = get_gemini_response(
+                        submitted_question,
+                        on_update=show_partial_response,
+                        similarity_threshold=st.session_state.get("similarity_threshold")
+                    )
+                    live_response.empty()
+                else:
+                    with st.spinner("Getting response..."):
+                        answers[submitted_question] = get_gemini_response(
+                            submitted_question,
+                            similarity_threshold=st.session_state.get("similarity_threshold"),
+                            structured=structured
+                        )
+                get_prefetcher().record(submitted_question, bool(
+                    answers[submitted_question].get("cached") or answers[submitted_question].get("intent")), structured)
+                if answers[submitted_question]["command"]:
+                    # Save to command history once per answer, not once per rerun
+                    save_command_history(answers[submitted_question]["command"], answers[submitted_question]["explanation"])
+                    # Let the History tab fragment pick up the new entry
+                    st.rerun(scope="app")
+            response = answers[submitted_question]
+
+            if response["command"]:
+                st.markdown("""
+                <div class='custom-container'>
+                    <h3 style='margin-top: 0; color: white;'>Command:</h3>
+                """, unsafe_allow_html=True)
+                
+                st.code(response["command"], language="batch")
+                
+                # Copies in the browser and times its own "Copied!" toast, so clicking it never reruns the app
+                show_html_widget(copy_button_html(response["command"]), height=45)
+                
+                if response.get("intent"):
+                    st.caption("⚡ Answered instantly from the built-in command templates")
+                elif response.get("matched_question"):
+                    st.caption(
+                        f"⚡ Answered from a similar question: \"{response['matched_question']}\" "
+                        f"(similarity {response['similarity']:.2f})"
+                    )
+                elif response.get("cached"):
+                    st.caption("⚡ Served from answer cache")
+                
+                st.markdown(f"""
+                    <h3 style='color: white;'>Explanation:</h3>
+                """, unsafe_allow_html=True)
+                
+                st.write(response["explanation"])
+                if response.get("security_note"):
+                    st.warning(f"🔒 Security Note: {response['security_note']}")
+                if response.get("alternatives"):
+                    st.markdown(f"**Alternatives:** {response['alternatives']}")
+                st.markdown("</div>", unsafe_allow_html=True)
+                
+                # Add favorite button
+                col1, col2 = st.columns([6, 1])
+                with col2:
+                    if st.button("⭐ Favorite"):
+                        add_to_favorites(response["command"], response["explanation"])
+                        st.toast("Added to favorites!")
+                        # The Favorites tab is its own fragment, so refresh the whole app
+                        st.rerun(scope="app")
+            else:
+                st.warning(response["explanation"])
+
+@tab_fragment
+def create_favorites_tab(show_favorites):
+    st.header("⭐ Favorite Commands")
+    show_favorites()  # Now this will work because we have the function
 
 def main():
+    started = time.perf_counter()
+    prune_anonymous_users()
     # Get favorites functions first
     add_to_favorites, show_favorites = add_command_favorites()
     
+    # Sidebar widgets can't live inside a fragment
+    create_sidebar_menu()
+    
     # Create tabs after getting the functions
     tabs = st.tabs([
         "Command Assistant", 
@@ -563,75 +1611,7 @@ def main():
     ])
     
     with tabs[0]:
-        create_sidebar_menu()
-        
-        col1, col2, col3 = st.columns([1, 8, 1])
-        with col2:
-            st.markdown("""
-            <div class="app-header">
-                <div class="app-title">
-                    <span>🖥️ Windows Command Helper</span>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Fix: Add proper label and hide it
-            user_question = st.text_input(
-                label="Command Input",  # Add label
-                key="question_input",
-                placeholder="Ask a question about Windows commands...",
-                help="Press Enter or click 'Get Answer' to submit",
-                label_visibility="collapsed"  # Hide the label but keep it accessible
-            )
-
-            submit_button = st.button("Get Answer")
-            
-            if (user_question and submit_button) or (user_question and st.session_state.get('question_input') == user_question):
-                with st.spinner("Getting response..."):
-                    response = get_gemini_response(user_question)
-
-                if response["command"]:
-                    st.markdown("""
-                    <div class='custom-container'>
-                        <h3 style='margin-top: 0; color: white;'>Command:</h3>
-                    """, unsafe_allow_html=True)
-                    
-                    st.code(response["command"], language="batch")
-                    
-                    # Updated copy button with inline tooltip
-                    copy_button_key = f"copy_button_{response['command']}"
-                    if st.button("📋 Copy command", key=copy_button_key):
-                        st.session_state[f"copied_{copy_button_key}"] = True
-                        st.session_state[f"show_tooltip_{copy_button_key}"] = True
-                        
-                    if st.session_state.get(f"show_tooltip_{copy_button_key}", False):
-                        st.markdown("<span class='copy-tooltip show'>Copied!</span>", unsafe_allow_html=True)
-                        
-                        st.session_state[f"show_tooltip_{copy_button_key}"] = False
-                        
-                        import time
-                        time.sleep(2)
-                        
-                        st.session_state[f"copied_{copy_button_key}"] = False
-                        
-                    
-                    
-                    st.markdown(f"""
-                        <h3 style='color: white;'>Explanation:</h3>
-                    """, unsafe_allow_html=True)
-                    
-                    st.write(response["explanation"])
-                    st.markdown("</div>", unsafe_allow_html=True)
-                    
-                    # Save to command history
-                    save_command_history(response["command"], response["explanation"])
-                    
-                    # Add favorite button
-                    col1, col2 = st.columns([6, 1])
-                    with col2:
-                        if st.button("⭐ Favorite"):
-                            add_to_favorites(response["command"], response["explanation"])
-                            st.success("Added to favorites!")
+        create_command_assistant(add_to_favorites)
     
     with tabs[1]:
         create_diagnostic_report()
@@ -653,12 +1633,21 @@ def main():
     
     # Add new Favorites tab
     with tabs[7]:
-        st.header("⭐ Favorite Commands")
-        show_favorites()  # Now this will work because we have the function
+        create_favorites_tab(show_favorites)
 
     create_help_system()
     create_command_search()
+    show_cache_stats()
+    show_scheduler_stats()
     create_troubleshooting_workflow()
+    elapsed = time.perf_counter() - started
+    st.session_state.setdefault("render_times", {})["app"] = elapsed
+    get_metrics().observe("app_run_seconds", elapsed)
+    # Old answers go first when the session is over its memory budget
+    session_bytes = enforce_budget(st.session_state, evictable=("answers",))
+    get_metrics().observe("session_state_bytes", session_bytes)
+    show_render_times()
+    show_metrics_panel(session_bytes)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,351 @@
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_CAPACITY = 3600
+DEFAULT_INTERVAL = 5.0
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+# Windows performance counters behind each System Monitor metric
+COUNTER_PATHS = {
+    "CPU Usage": "\\Processor(_Total)\\% Processor Time",
+    "Memory Usage": "\\Memory\\Available MBytes",
+    "Disk IO": "\\PhysicalDisk(_Total)\\Disk Reads/sec",
+    "Network": "\\Network Interface(*)\\Bytes Total/sec",
+}
+
+METRIC_UNITS = {
+    "CPU Usage": "%",
+    "Memory Usage": "MB free",
+    "Disk IO": "reads/s",
+    "Network": "B/s",
+}
+
+
+class RingBuffer:
+    """Fixed-size time series backed by two numpy arrays.
+
+    Appends overwrite the oldest sample once the buffer is full, so memory
+    stays constant however long a collector runs.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, value):
+        with self._lock:
+            self._times[self._next] = timestamp
+            self._values[self._next] = value
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def snapshot(self, since=None):
+        # Copies in time order, so readers never see a half-written sample
+        with self._lock:
+            if self._count < self.capacity:
+                times = self._times[:self._count].copy()
+                values = self._values[:self._count].copy()
+            else:
+                times = np.concatenate((self._times[self._next:], self._times[:self._next]))
+                values = np.concatenate((self._values[self._next:], self._values[:self._next]))
+        if since is not None:
+            start = np.searchsorted(times, since)
+            times, values = times[start:], values[start:]
+        return times, values
+
+    def downsample(self, max_points, since=None):
+        """Returns (times, mins, avgs, maxs) with at most max_points buckets."""
+        times, values = self.snapshot(since)
+        if len(values) <= max_points:
+            return times, values, values, values
+        edges = np.linspace(0, len(values), max_points + 1).astype(np.int64)[:-1]
+        counts = np.diff(np.append(edges, len(values)))
+        return (
+            times[edges + counts - 1],
+            np.minimum.reduceat(values, edges),
+            np.add.reduceat(values, edges) / counts,
+            np.maximum.reduceat(values, edges),
+        )
+
+
+class _RateTracker:
+    # Turns cumulative counters (bytes sent, reads completed) into per-second rates
+    def __init__(self):
+        self._last = {}
+
+    def rate(self, name, counter, now):
+        previous = self._last.get(name)
+        self._last[name] = (counter, now)
+        if previous is None or now <= previous[1]:
+            return None
+        return max(0.0, (counter - previous[0]) / (now - previous[1]))
+
+
+class LocalSource:
+    """Samples the machine running the app, via psutil when installed or /proc on Linux."""
+
+    label = "This server"
+
+    def __init__(self):
+        try:
+            import psutil
+        except ImportError:
+            psutil = None
+        self._psutil = psutil
+        self._rates = _RateTracker()
+        self._last_cpu = None
+
+    def read(self):
+        now = time.monotonic()
+        samples = {}
+        readers = (
+            ("CPU Usage", self._cpu),
+            ("Memory Usage", self._memory),
+            ("Disk IO", lambda: self._rates.rate("disk", self._disk_reads(), now)),
+            ("Network", lambda: self._rates.rate("net", self._network_bytes(), now)),
+        )
+        for metric, reader in readers:
+            try:
+                value = reader()
+            except (OSError, ValueError, AttributeError):
+                continue
+            if value is not None:
+                samples[metric] = value
+        return samples
+
+    def _cpu(self):
+        if self._psutil is not None:
+            return self._psutil.cpu_percent(interval=None)
+        with open("/proc/stat") as f:
+            fields = [float(v) for v in f.readline().split()[1:]]
+        idle, total = fields[3] + fields[4], sum(fields)
+        previous, self._last_cpu = self._last_cpu, (idle, total)
+        if previous is None or total <= previous[1]:
+            return None
+        return 100.0 * (1.0 - (idle - previous[0]) / (total - previous[1]))
+
+    def _memory(self):
+        if self._psutil is not None:
+            return self._psutil.virtual_memory().available / 2 ** 20
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+        return None
+
+    def _disk_reads(self):
+        if self._psutil is not None:
+            return self._psutil.disk_io_counters().read_count
+        # Whole disks only; partitions would be counted twice
+        disks = set(os.listdir("/sys/block"))
+        with open("/proc/diskstats") as f:
+            return sum(int(parts[3]) for parts in (line.split() for line in f) if parts[2] in disks)
+
+    def _network_bytes(self):
+        if self._psutil is not None:
+            counters = self._psutil.net_io_counters()
+            return counters.bytes_sent + counters.bytes_recv
+        total = 0
+        with open("/proc/net/dev") as f:
+            for line in f.readlines()[2:]:
+                name, data = line.split(":", 1)
+                if name.strip() != "lo":
+                    fields = data.split()
+                    total += int(fields[0]) + int(fields[8])
+        return total
+
+
+class RemoteCounterSource:
+    """Reads the System Monitor's Get-Counter paths from a remote host.
+
+    run(host, command) is any remote runner returning a dict with "stdout",
+    such as remote_exec.SessionPool.run. All counters come back from one
+    round trip, one summed value per counter.
+    """
+
+    def __init__(self, run, host):
+        self.run = run
+        self.host = host
+        self.label = host
+        paths = ", ".join(f"'{path}'" for path in COUNTER_PATHS.values())
+        # Each line is "<index> <value>" so a counter that fails doesn't shift the others
+        self.command = (
+            f"$paths = @({paths}); for ($i = 0; $i -lt $paths.Count; $i++) {{ "
+            "$sum = (Get-Counter $paths[$i]).CounterSamples | Measure-Object -Property CookedValue -Sum "
+            "| Select-Object -ExpandProperty Sum; \"$i $sum\" }"
+        )
+
+    def read(self):
+        metrics = list(COUNTER_PATHS)
+        samples = {}
+        for line in self.run(self.host, self.command)["stdout"].splitlines():
+            parts = line.split()
+            if len(parts) != 2 or not parts[0].isdigit() or int(parts[0]) >= len(metrics):
+                continue
+            try:
+                samples[metrics[int(parts[0])]] = float(parts[1])
+            except ValueError:
+                continue
+        return samples
+
+
+class SimulatedSource:
+    """Random-walk metrics for demos and load tests."""
+
+    label = "Simulated"
+
+    def __init__(self, seed=None):
+        self._random = random.Random(seed)
+        self._values = {"CPU Usage": 20.0, "Memory Usage": 4096.0, "Disk IO": 50.0, "Network": 1e5}
+
+    def read(self):
+        for metric, value in self._values.items():
+            self._values[metric] = max(0.0, value * (1 + self._random.uniform(-0.1, 0.1)))
+        self._values["CPU Usage"] = min(self._values["CPU Usage"], 100.0)
+        return dict(self._values)
+
+
+class MetricCollector:
+    """Samples a source on a background thread into one ring buffer per metric.
+
+    The thread stops by itself once nobody has read a snapshot for
+    idle_timeout seconds, so abandoned sessions don't leave collectors running.
+    Each subscriber asks for its own interval and the source is sampled at the
+    shortest one; interval is used while nobody has asked.
+    """
+
+    def __init__(self, source, interval=DEFAULT_INTERVAL, capacity=DEFAULT_CAPACITY,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, clock=time.time):
+        self.source = source
+        self.interval = interval
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.buffers = {metric: RingBuffer(capacity) for metric in COUNTER_PATHS}
+        self.last_error = None
+        self.samples = 0
+        self._last_read = time.monotonic()
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._last_read = time.monotonic()
+            self._thread = threading.Thread(target=self._loop, name="metric-collector", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def subscribe(self, subscriber, interval):
+        with self._lock:
+            faster = interval < self._current_interval()
+            self._subscribers[subscriber] = [interval, time.monotonic()]
+        if faster:
+            self._wake.set()
+
+    def current_interval(self):
+        with self._lock:
+            return self._current_interval()
+
+    def _current_interval(self):
+        # Subscribers that haven't read for idle_timeout no longer count
+        now = time.monotonic()
+        for subscriber, (_, last_read) in list(self._subscribers.items()):
+            if now - last_read > self.idle_timeout:
+                del self._subscribers[subscriber]
+        return min((interval for interval, _ in self._subscribers.values()), default=self.interval)
+
+    def sample(self):
+        timestamp = self.clock()
+        try:
+            values = self.source.read()
+        except Exception as e:
+            self.last_error = str(e)
+            return
+        self.last_error = None
+        self.samples += 1
+        for metric, value in values.items():
+            if metric in self.buffers:
+                self.buffers[metric].append(timestamp, value)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            if started - self._last_read > self.idle_timeout:
+                break
+            self.sample()
+            # A subscriber asking for a shorter interval ends the wait early
+            while not self._stop.is_set():
+                remaining = self.current_interval() - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                self._wake.wait(remaining)
+                self._wake.clear()
+
+    def snapshot(self, metric, window_seconds=None, max_points=120, subscriber=None):
+        """Returns {"times", "min", "avg", "max", "latest"} for a metric without blocking the sampler."""
+        self._last_read = time.monotonic()
+        if subscriber is not None:
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers[subscriber][1] = self._last_read
+        since = None if window_seconds is None else self.clock() - window_seconds
+        times, mins, avgs, maxs = self.buffers[metric].downsample(max_points, since)
+        return {
+            "times": times,
+            "min": mins,
+            "avg": avgs,
+            "max": maxs,
+            "latest": float(avgs[-1]) if len(avgs) else None,
+        }
+
+
+class CollectorRegistry:
+    """One collector per monitored target, shared by every session watching it."""
+
+    def __init__(self):
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, create_source, interval=DEFAULT_INTERVAL, subscriber=None):
+        # The interval is the subscriber's own; other sessions keep theirs
+        with self._lock:
+            collector = self._collectors.get(key)
+            if collector is None or not collector.running:
+                collector = MetricCollector(create_source(), interval=interval)
+                self._collectors[key] = collector
+        if subscriber is not None:
+            collector.subscribe(subscriber, interval)
+        return collector.start()
+
+    def stop(self, key):
+        with self._lock:
+            collector = self._collectors.pop(key, None)
+        if collector is not None:
+            collector.stop()
+
+    def running(self):
+        with self._lock:
+            return [key for key, collector in self._collectors.items() if collector.running]
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_CALLS_PER_HOUR = int(os.environ.get("PREFETCH_CALLS_PER_HOUR", "60"))
+DEFAULT_QUEUE_SIZE = 50
+# A question found answered is checked again after this long, in case its answer expired or was evicted
+DEFAULT_RECHECK_INTERVAL = 600
+
+
+class Prefetcher:
+    """Answers likely questions in the background, before anyone asks them.
+
+    `fetch(question, mode)` makes the model call and stores the answer
+    wherever interactive lookups read it; `is_cached(question, mode)` says
+    whether that is still needed. Both come from the caller, so prefetched
+    answers are cached exactly like interactive ones. `mode` is whatever
+    else the answer depends on (the caller's prompt mode), passed through
+    unchanged. The newest requests are fetched first, and at most
+    `calls_per_hour` fetches are made in any rolling hour; requests past the
+    budget are dropped rather than queued.
+    """
+
+    def __init__(self, fetch, is_cached, catalog=(), calls_per_hour=DEFAULT_CALLS_PER_HOUR,
+                 queue_size=DEFAULT_QUEUE_SIZE, recheck_interval=DEFAULT_RECHECK_INTERVAL, clock=time.monotonic):
+        self.fetch = fetch
+        self.is_cached = is_cached
+        self.catalog = set(catalog)
+        self.calls_per_hour = calls_per_hour
+        self.recheck_interval = recheck_interval
+        self.clock = clock
+        self._queue = deque(maxlen=queue_size)
+        self._queued = set()
+        # When each (question, mode) was last known to be answered, so repeated requests don't queue it again
+        self._done = {}
+        self._fetched = set()
+        self._calls = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stats = {"requested": 0, "fetched": 0, "already_cached": 0, "failed": 0, "over_budget": 0,
+                       "lookups": 0, "hits": 0, "prefetch_hits": 0}
+
+    def _calls_last_hour(self, now):
+        while self._calls and now - self._calls[0] > 3600:
+            self._calls.popleft()
+        return len(self._calls)
+
+    def request(self, questions, mode=None):
+        """Queues questions to be answered in the background, ahead of older requests."""
+        if self.calls_per_hour <= 0:
+            return
+        with self._cond:
+            now = self.clock()
+            added = False
+            for question in reversed(list(questions)):
+                item = (question, mode)
+                done_at = self._done.get(item)
+                if item in self._queued or (done_at is not None and now - done_at < self.recheck_interval):
+                    continue
+                self._done.pop(item, None)
+                if len(self._queue) == self._queue.maxlen:
+                    self._queued.discard(self._queue.pop())
+                self._queue.appendleft(item)
+                self._queued.add(item)
+                self._stats["requested"] += 1
+                added = True
+            if added:
+                self._start_worker()
+                self._cond.notify()
+
+    def _start_worker(self):
+        # Caller holds the lock
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, name="prefetch", daemon=True)
+            self._worker.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                item = self._queue.popleft()
+                self._queued.discard(item)
+            question, mode = item
+            try:
+                cached = self.is_cached(question, mode)
+            except Exception:
+                # A cache that can't be read shouldn't stop prefetching
+                cached = False
+            if cached:
+                with self._cond:
+                    self._done[item] = self.clock()
+                    self._stats["already_cached"] += 1
+                continue
+            with self._cond:
+                now = self.clock()
+                if self._calls_last_hour(now) >= self.calls_per_hour:
+                    # Out of budget: the rest of the queue would be dropped too, so drop it now
+                    self._stats["over_budget"] += 1 + len(self._queue)
+                    self._queue.clear()
+                    self._queued.clear()
+                    continue
+                self._calls.append(now)
+            try:
+                result = self.fetch(question, mode)
+            except Exception:
+                with self._cond:
+                    self._stats["failed"] += 1
+                continue
+            with self._cond:
+                if result and result.get("command"):
+                    self._done[item] = self.clock()
+                    self._fetched.add(item)
+                    self._stats["fetched"] += 1
+                else:
+                    self._stats["failed"] += 1
+
+    def record(self, question, hit, mode=None):
+        """Counts an asked question; only questions from the catalog feed the hit rate."""
+        if question not in self.catalog:
+            return
+        with self._cond:
+            self._stats["lookups"] += 1
+            if hit:
+                self._stats["hits"] += 1
+                if (question, mode) in self._fetched:
+                    self._stats["prefetch_hits"] += 1
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queued"] = len(self._queue)
+            stats["calls_last_hour"] = self._calls_last_hour(self.clock())
+        stats["calls_per_hour"] = self.calls_per_hour
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
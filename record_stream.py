@@ -0,0 +1,173 @@
+import csv
+import json
+import re
+import time
+from itertools import chain
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_PAGE_SIZE = 50
+RECORD_FORMATS = ("csv", "json")
+
+# Windows PowerShell 5.1's ConvertTo-Json writes dates as "\/Date(1700000000000)\/"
+JSON_DATE_REGEX = re.compile(r"^/Date\((-?\d+)([+-]\d{4})?\)/$")
+
+
+def _chunks(stream, chunk_size):
+    if isinstance(stream, str):
+        return iter((stream,))
+    if hasattr(stream, "read"):
+        return iter(lambda: stream.read(chunk_size), "")
+    return iter(stream)
+
+
+def _lines(chunks):
+    # Re-splits chunks after each "\n", keeping it, so csv sees the original lines. Not splitlines(),
+    # which also breaks at form feeds, "\x1c"-"\x1e", "\x85" and "\u2028" inside a field.
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+def _json_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    if isinstance(value, str):
+        match = JSON_DATE_REGEX.match(value)
+        if match:
+            try:
+                return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(int(match.group(1)) // 1000))
+            except (OverflowError, OSError, ValueError):
+                # Out of the platform's range; the raw text still sorts and filters
+                return value
+    return value
+
+
+def iter_csv_records(chunks):
+    """Records from ConvertTo-Csv / Export-Csv output, with or without its "#TYPE" line."""
+    reader = csv.reader(_lines(chunks))
+    header = None
+    for row in reader:
+        if not row:
+            continue
+        if header is None:
+            if row[0].startswith("#TYPE"):
+                continue
+            header = row
+            continue
+        yield dict(zip(header, row))
+
+
+def iter_json_records(chunks):
+    """Objects from ConvertTo-Json output: one array, one object, or one object per line.
+
+    Objects are decoded one at a time as their text arrives, so the whole
+    array is never held in memory. Nested values become compact JSON text.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+    chunks = iter(chunks)
+    done = False
+    while True:
+        # Skip whitespace and the punctuation of a top-level array
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos == len(buffer):
+            if done:
+                return
+            buffer, pos = next(chunks, None), 0
+            if buffer is None:
+                return
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as error:
+            if done:
+                raise ValueError(f"Invalid JSON near character {error.pos}") from error
+            more = next(chunks, None)
+            if more is None:
+                done = True
+            else:
+                buffer, pos = buffer[pos:] + more, 0
+            continue
+        if not isinstance(value, dict):
+            raise ValueError("Expected JSON objects, one per record")
+        # Most records have nothing to convert, which is cheaper to see in the raw text
+        if buffer.find("/Date(", pos, end) != -1 or buffer.find("{", pos + 1, end) != -1 or buffer.find("[", pos, end) != -1:
+            for key, item in value.items():
+                if type(item) in (dict, list) or (type(item) is str and item.startswith("/Date(")):
+                    value[key] = _json_value(item)
+        yield value
+        pos = end
+
+
+def detect_format(text):
+    return "json" if text.lstrip()[:1] in ("[", "{") else "csv"
+
+
+def iter_records(stream, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Records from CSV or JSON text; `stream` is a string, a text file or an iterable of chunks.
+
+    With no `fmt` the format is guessed from the first non-blank character.
+    """
+    chunks = _chunks(stream, chunk_size)
+    head = ""
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+    chunks = chain((head,), chunks)
+    fmt = fmt or detect_format(head)
+    if fmt not in RECORD_FORMATS:
+        raise ValueError(f"Unknown record format: {fmt}")
+    return iter_json_records(chunks) if fmt == "json" else iter_csv_records(chunks)
+
+
+def matches(record, filters):
+    # Filters are {column: text}; a record matches when each column contains its text, ignoring case
+    for column, text in filters.items():
+        value = record.get(column)
+        if value is None or text not in str(value).lower():
+            return False
+    return True
+
+
+def page_records(records, filters=None, page=0, page_size=DEFAULT_PAGE_SIZE):
+    """Filters records in one pass, keeping only those on the requested page.
+
+    Returns the page's rows along with the columns seen, the number of
+    records read and the number matching, so memory stays at one page
+    whatever the size of the input. A page past the end is clamped to the
+    last one.
+    """
+    page = max(0, page)
+    filters = {column: text.lower() for column, text in (filters or {}).items() if text}
+    start = page * page_size
+    columns = {}
+    rows = []
+    last_page_rows = []
+    total = matched = 0
+    for record in records:
+        total += 1
+        for column in record:
+            if column not in columns:
+                columns[column] = None
+        if filters and not matches(record, filters):
+            continue
+        if start <= matched < start + page_size:
+            rows.append(record)
+        # Kept in case the requested page turns out to be past the end
+        if matched % page_size == 0:
+            last_page_rows = []
+        last_page_rows.append(record)
+        matched += 1
+    pages = max(1, (matched + page_size - 1) // page_size)
+    if page >= pages:
+        page, rows = pages - 1, last_page_rows
+    return {"columns": list(columns), "rows": rows, "page": page, "pages": pages,
+            "matched": matched, "total": total}
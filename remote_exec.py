@@ -0,0 +1,228 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+DEFAULT_MAX_WORKERS = int(os.environ.get("REMOTE_MAX_WORKERS", "16"))
+DEFAULT_HOST_TIMEOUT = float(os.environ.get("REMOTE_HOST_TIMEOUT", "30"))
+DEFAULT_MAX_IDLE_PER_HOST = 2
+
+HOST_REGEX = re.compile(r"^[A-Za-z0-9][A-Za-z0-9.\-:]{0,253}$")
+HOST_SEPARATOR_REGEX = re.compile(r"[\s,;]+")
+
+
+def parse_hosts(text):
+    # Accepts one host per line, or comma/space separated; "#" starts a comment
+    hosts = []
+    invalid = []
+    seen = set()
+    for line in text.splitlines():
+        line = line.split("#", 1)[0]
+        for host in HOST_SEPARATOR_REGEX.split(line.strip()):
+            if not host or host.lower() in seen:
+                continue
+            seen.add(host.lower())
+            (hosts if HOST_REGEX.match(host) else invalid).append(host)
+    return hosts, invalid
+
+
+class WinRMTransport:
+    """Opens pywinrm sessions and runs PowerShell over them."""
+
+    def __init__(self, username, password, transport="ntlm", timeout=DEFAULT_HOST_TIMEOUT):
+        self.username = username
+        self.password = password
+        self.transport = transport
+        self.timeout = timeout
+
+    def connect(self, host):
+        import winrm
+
+        # WinRM needs the read timeout to be longer than the operation timeout
+        operation_timeout = max(1, int(self.timeout))
+        return winrm.Session(
+            host,
+            auth=(self.username, self.password),
+            transport=self.transport,
+            operation_timeout_sec=operation_timeout,
+            read_timeout_sec=operation_timeout + 5,
+        )
+
+    def run(self, session, command):
+        result = session.run_ps(command)
+        return {
+            "exit_code": result.status_code,
+            "stdout": result.std_out.decode("utf-8", errors="replace"),
+            "stderr": result.std_err.decode("utf-8", errors="replace"),
+        }
+
+
+class FakeTransport:
+    """Stands in for WinRM so fan-out can be exercised without Windows hosts.
+
+    Each host gets a stable pseudo-random latency in [min_latency, max_latency].
+    Hosts listed in failing_hosts exit with code 1 and hosts in hanging_hosts
+    sleep for hang_seconds, which is enough to trip a per-host timeout.
+    """
+
+    def __init__(self, min_latency=0.05, max_latency=0.5, failing_hosts=(), hanging_hosts=(),
+                 unreachable_hosts=(), hang_seconds=3600.0, sleep=time.sleep):
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.failing_hosts = set(failing_hosts)
+        self.hanging_hosts = set(hanging_hosts)
+        self.unreachable_hosts = set(unreachable_hosts)
+        self.hang_seconds = hang_seconds
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.runs = 0
+
+    def latency(self, host):
+        fraction = (zlib.crc32(host.encode("utf-8")) % 1000) / 1000
+        return self.min_latency + fraction * (self.max_latency - self.min_latency)
+
+    def connect(self, host):
+        with self._lock:
+            self.connects += 1
+        if host in self.unreachable_hosts:
+            raise ConnectionError(f"Could not connect to {host}:5985")
+        return {"host": host}
+
+    def run(self, session, command):
+        host = session["host"]
+        with self._lock:
+            self.runs += 1
+        self.sleep(self.hang_seconds if host in self.hanging_hosts else self.latency(host))
+        if host in self.failing_hosts:
+            return {"exit_code": 1, "stdout": "", "stderr": f"{command.split()[0]} : Access is denied."}
+        return {"exit_code": 0, "stdout": f"{host}: {command}\nOK\n", "stderr": ""}
+
+
+class SessionPool:
+    """Keeps idle sessions per host so repeated runs skip the WinRM handshake.
+
+    A session is checked out by one worker at a time. Sessions that raised or
+    timed out are discarded instead of being returned.
+    """
+
+    def __init__(self, transport, max_idle_per_host=DEFAULT_MAX_IDLE_PER_HOST):
+        self.transport = transport
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0, "discarded": 0}
+
+    def acquire(self, host):
+        with self._lock:
+            if self._idle[host]:
+                self._stats["reused"] += 1
+                return self._idle[host].pop()
+        session = self.transport.connect(host)
+        with self._lock:
+            self._stats["created"] += 1
+        return session
+
+    def release(self, host, session):
+        with self._lock:
+            if len(self._idle[host]) < self.max_idle_per_host:
+                self._idle[host].append(session)
+
+    def discard(self, host, session):
+        with self._lock:
+            self._stats["discarded"] += 1
+
+    def run(self, host, command):
+        session = self.acquire(host)
+        try:
+            result = self.transport.run(session, command)
+        except Exception:
+            self.discard(host, session)
+            raise
+        self.release(host, session)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, idle=sum(len(sessions) for sessions in self._idle.values()))
+
+
+def _host_result(host, status, elapsed, exit_code=None, stdout="", stderr="", error=None):
+    return {
+        "host": host,
+        "status": status,
+        "exit_code": exit_code,
+        "elapsed": round(elapsed, 3),
+        "stdout": stdout,
+        "stderr": stderr,
+        "error": error,
+    }
+
+
+def fan_out(hosts, command, pool, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_HOST_TIMEOUT,
+            clock=time.monotonic):
+    """Runs command on every host concurrently, yielding one result per host as it finishes.
+
+    Status is "ok" (exit code 0), "failed" (non-zero exit), "error" (connection
+    or transport error) or "timeout". The timeout clock for a host starts when
+    a worker picks it up, not when it is queued. A timed-out call cannot be
+    interrupted, so its worker keeps running in the background and its session
+    is never returned to the pool.
+    """
+    started = {}
+    abandoned = set()
+    lock = threading.Lock()
+
+    def run_host(host):
+        with lock:
+            started[host] = clock()
+        try:
+            session = pool.acquire(host)
+        except Exception as e:
+            return _host_result(host, "error", clock() - started[host], error=str(e))
+        try:
+            result = pool.transport.run(session, command)
+        except Exception as e:
+            pool.discard(host, session)
+            return _host_result(host, "error", clock() - started[host], error=str(e))
+        with lock:
+            timed_out = host in abandoned
+        if timed_out:
+            pool.discard(host, session)
+        else:
+            pool.release(host, session)
+        status = "ok" if result["exit_code"] == 0 else "failed"
+        return _host_result(host, status, clock() - started[host], **result)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(hosts) or 1)),
+                                  thread_name_prefix="remote")
+    try:
+        futures = {executor.submit(run_host, host): host for host in hosts}
+        pending = set(futures)
+        while pending:
+            now = clock()
+            with lock:
+                deadlines = [started[futures[f]] + timeout for f in pending if futures[f] in started]
+            wait_for = max(0.0, min(deadlines) - now) if deadlines else timeout
+            done, pending = wait(pending, timeout=min(wait_for, 0.5), return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+            now = clock()
+            expired = []
+            with lock:
+                for future in pending:
+                    host = futures[future]
+                    if host in started and now - started[host] >= timeout:
+                        abandoned.add(host)
+                        expired.append(future)
+            for future in expired:
+                pending.discard(future)
+                host = futures[future]
+                yield _host_result(host, "timeout", now - started[host], error=f"No response within {timeout:g}s")
+    finally:
+        # Don't wait for hung hosts; queued hosts are cancelled if the caller stops early
+        executor.shutdown(wait=False, cancel_futures=True)
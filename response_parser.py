@@ -0,0 +1,133 @@
+import re
+
+SECTIONS = ("command", "explanation", "security_note", "alternatives")
+
+# Matches "[Command]", "**Security Note:** ...", "### Alternatives", "Explanation:" and so on.
+# Every token before the tail is fixed-width, so matching is linear in the line length.
+SECTION_HEADER_REGEX = re.compile(
+    r"(?:#{1,6} ?)?(\[|\*\*|__)? ?(command|explanation|security note|alternatives?) ?(\]|\*\*|__)? ?(:)? ?(?:\*\*|__)?(.*)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+SECTION_NAMES = {
+    "command": "command",
+    "explanation": "explanation",
+    "security note": "security_note",
+    "alternative": "alternatives",
+    "alternatives": "alternatives",
+}
+
+
+def match_section_header(line):
+    match = SECTION_HEADER_REGEX.match(line.lstrip())
+    if not match:
+        return None, None
+    opening, label, _, colon, rest = match.groups()
+    # A bare word like "Explanation of ipconfig" is content, not a header
+    if not (opening or colon or not rest.strip()):
+        return None, None
+    return SECTION_NAMES[label.lower()], rest.strip()
+
+
+class StreamingResponseParser:
+    """Incrementally splits a streamed model reply into its four sections.
+
+    Handles both the labelled layout the prompt asks for ("[Command]",
+    "Security Note: ...") and the positional layout the old regex expected
+    (command on the first line, explanation after it).
+    """
+
+    def __init__(self):
+        self.sections = {name: [] for name in SECTIONS}
+        self._current = None
+        self._in_fence = False
+        # Pieces of the current unfinished line; joined once its newline arrives
+        self._pending = []
+
+    def feed(self, chunk):
+        # Returns the names of the sections that gained a complete line
+        updated = []
+        # Only scan the new chunk so a long line arriving in pieces stays linear
+        if "\n" not in chunk:
+            self._pending.append(chunk)
+            return updated
+        self._pending.append(chunk)
+        lines = "".join(self._pending).split("\n")
+        self._pending = [lines.pop()]
+        for line in lines:
+            section = self._consume_line(line)
+            if section and section not in updated:
+                updated.append(section)
+        return updated
+
+    def _consume_line(self, line):
+        if line.strip().startswith("```"):
+            self._in_fence = not self._in_fence
+            return None
+
+        section, rest = match_section_header(line)
+        if section and not self._in_fence:
+            self._current = section
+            if rest:
+                self.sections[section].append(rest)
+                return section
+            return None
+
+        if not line.strip():
+            # Leading and repeated blank lines carry nothing
+            lines = self.sections.get(self._current)
+            if not lines or not lines[-1].strip():
+                return None
+
+        if self._current is None:
+            # Positional layout: the first real line is the command
+            self._current = "command"
+        elif self._current == "command" and self.sections["command"] and not self._in_fence:
+            # Outside a code block the command is a single line
+            self._current = "explanation"
+
+        section = self._current
+        self.sections[section].append(line)
+        return section
+
+    def _render(self, name, lines):
+        text = "\n".join(lines).strip()
+        if name == "command":
+            text = text.replace("`", "").strip()
+        return text
+
+    def _may_become_header(self, partial):
+        partial = partial.strip().lstrip("#[*_ ").lower()
+        return any(label.startswith(partial) for label in SECTION_NAMES)
+
+    def snapshot(self):
+        # Current view including the partially received line
+        sections = {name: list(lines) for name, lines in self.sections.items()}
+        pending = "".join(self._pending)
+        if pending.strip() and not pending.strip().startswith("```"):
+            section, rest = match_section_header(pending)
+            if section and not self._in_fence:
+                if rest:
+                    sections[section].append(rest)
+            elif not self._in_fence and self._may_become_header(pending):
+                # Hold back "[Com" until we know whether it is a header
+                pass
+            elif self._current == "command" and sections["command"] and not self._in_fence:
+                sections["explanation"].append(pending)
+            else:
+                sections[self._current or "command"].append(pending)
+        return {name: self._render(name, lines) for name, lines in sections.items()}
+
+    def close(self):
+        pending = "".join(self._pending)
+        if pending:
+            self._consume_line(pending)
+            self._pending = []
+        return {name: self._render(name, lines) for name, lines in self.sections.items()}
+
+
+def parse_streamed_response(chunks):
+    parser = StreamingResponseParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
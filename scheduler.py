@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_PREFETCH = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BATCH: "batch",
+    PRIORITY_PREFETCH: "prefetch",
+}
+
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "15"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+DEFAULT_MAX_CONCURRENT = int(os.environ.get("GEMINI_MAX_CONCURRENT", "4"))
+
+
+def is_quota_error(error):
+    # google.api_core raises ResourceExhausted for HTTP 429
+    text = f"{type(error).__name__} {error}".lower()
+    return "resourceexhausted" in text or "429" in text or "quota" in text or "rate limit" in text
+
+
+class TokenBucket:
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now):
+        # Seconds until `amount` can be taken; requests larger than the bucket wait for a full one
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+
+class _Ticket:
+    def __init__(self, session_id, priority, tokens, enqueued_at):
+        self.session_id = session_id
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued_at = enqueued_at
+        self.granted = threading.Event()
+
+
+class GeminiScheduler:
+    """Admission control for every Gemini call in the process.
+
+    Callers queue for a slot and then make the call on their own thread, so
+    streaming callbacks still run inside the Streamlit script context.
+    Slots are granted by priority, then round-robin across sessions, within
+    request-per-minute and token-per-minute buckets and a concurrency cap.
+    Quota errors put the whole scheduler into exponential backoff.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 base_backoff=2.0, max_backoff=60.0, clock=time.monotonic):
+        self.max_concurrent = max_concurrent
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._requests = TokenBucket(requests_per_minute, clock)
+        self._tokens = TokenBucket(tokens_per_minute, clock)
+        self._queues = {priority: OrderedDict() for priority in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._backoff_until = 0.0
+        self._consecutive_quota_errors = 0
+        self._waits = deque(maxlen=500)
+        self._counters = {"granted": 0, "completed": 0, "failed": 0, "quota_errors": 0, "timeouts": 0}
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="gemini-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def run(self, fn, session_id="default", priority=PRIORITY_INTERACTIVE, tokens=1, max_retries=3, timeout=None):
+        for attempt in range(max_retries + 1):
+            self._acquire(session_id, priority, tokens, timeout)
+            success = quota_error = False
+            try:
+                result = fn()
+                success = True
+            except Exception as e:
+                quota_error = is_quota_error(e)
+                if not quota_error or attempt == max_retries:
+                    raise
+                continue
+            finally:
+                # Also on BaseException: a Streamlit rerun or stop raised from a streaming
+                # callback must not keep the slot
+                self._release(success=success, quota_error=quota_error)
+            return result
+
+    def _acquire(self, session_id, priority, tokens, timeout):
+        with self._cond:
+            ticket = _Ticket(session_id, priority, tokens, self.clock())
+            self._queues[priority].setdefault(session_id, deque()).append(ticket)
+            self._cond.notify_all()
+
+        if ticket.granted.wait(timeout):
+            return
+
+        with self._cond:
+            if ticket.granted.is_set():
+                return
+            queue = self._queues[priority][session_id]
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[priority][session_id]
+            self._counters["timeouts"] += 1
+        raise TimeoutError("Timed out waiting for a free Gemini request slot. Please try again.")
+
+    def _release(self, success, quota_error):
+        with self._cond:
+            self._in_flight -= 1
+            if success:
+                self._counters["completed"] += 1
+                self._consecutive_quota_errors = 0
+            else:
+                self._counters["failed"] += 1
+            if quota_error:
+                self._counters["quota_errors"] += 1
+                self._consecutive_quota_errors += 1
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (self._consecutive_quota_errors - 1))
+                self._backoff_until = max(self._backoff_until, self.clock() + backoff)
+            self._cond.notify_all()
+
+    def _next_ticket(self):
+        # Highest priority first, then the session that has waited longest for a turn
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if sessions:
+                session_id, queue = next(iter(sessions.items()))
+                return queue[0]
+        return None
+
+    def _pop(self, ticket):
+        sessions = self._queues[ticket.priority]
+        queue = sessions.pop(ticket.session_id)
+        queue.popleft()
+        if queue:
+            # Back of the line so other sessions get a turn
+            sessions[ticket.session_id] = queue
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                ticket = self._next_ticket()
+                if ticket is None or self._in_flight >= self.max_concurrent:
+                    self._cond.wait()
+                    continue
+
+                now = self.clock()
+                delay = max(
+                    self._backoff_until - now,
+                    self._requests.delay(1, now),
+                    self._tokens.delay(ticket.tokens, now),
+                )
+                if delay > 0:
+                    # Wakes early if a higher-priority ticket arrives
+                    self._cond.wait(delay)
+                    continue
+
+                self._pop(ticket)
+                self._requests.take(1, now)
+                self._tokens.take(ticket.tokens, now)
+                self._in_flight += 1
+                self._counters["granted"] += 1
+                self._waits.append(now - ticket.enqueued_at)
+                ticket.granted.set()
+
+    def metrics(self):
+        with self._cond:
+            depth = {
+                PRIORITY_NAMES[priority]: sum(len(queue) for queue in sessions.values())
+                for priority, sessions in self._queues.items()
+            }
+            waits = sorted(self._waits)
+            metrics = dict(self._counters)
+            metrics.update(
+                queue_depth=sum(depth.values()),
+                queue_depth_by_priority=depth,
+                waiting_sessions=len({s for sessions in self._queues.values() for s in sessions}),
+                in_flight=self._in_flight,
+                backoff_remaining=max(0.0, self._backoff_until - self.clock()),
+            )
+        if waits:
+            metrics["wait_avg"] = sum(waits) / len(waits)
+            metrics["wait_p95"] = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+            metrics["wait_max"] = waits[-1]
+        else:
+            metrics["wait_avg"] = metrics["wait_p95"] = metrics["wait_max"] = 0.0
+        return metrics
@@ -0,0 +1,355 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.environ.get("SEMANTIC_CACHE_INDEX", ".cache/semantic_index.npz")
+DEFAULT_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+HASH_DIM = 2 ** 18
+NGRAM_SIZES = (3, 4)
+
+# Filler that carries no meaning for matching "how do I flush dns" against "flush dns"
+STOPWORDS = {
+    "a", "an", "the", "how", "do", "does", "i", "can", "to", "in", "on", "of", "for", "my", "me",
+    "what", "is", "are", "show", "using", "use", "with", "windows", "command", "cmd", "please",
+    "cache", "ipconfig",
+}
+
+# Words that mean the same thing in a question, so "clear dns cache" and "ipconfig /flushdns"
+# both read as "flush dns"
+SYNONYMS = {
+    "clear": "flush", "purge": "flush", "flushdns": "flush dns", "registerdns": "register dns",
+    "displaydns": "display dns", "reboot": "restart", "terminate": "kill", "delete": "remove",
+    "erase": "remove", "launch": "start",
+}
+
+# Verbs that change what a command does; two questions must use the same ones to share an answer
+ACTION_WORDS = {
+    "start", "stop", "restart", "enable", "disable", "add", "remove", "create", "install", "uninstall",
+    "block", "unblock", "allow", "deny", "open", "close", "kill", "lock", "unlock", "reset", "release",
+    "renew", "flush", "register", "set", "change", "rename", "map", "unmap", "mount", "dismount",
+    "connect", "disconnect", "suspend", "resume", "pause", "grant", "revoke", "export", "import",
+}
+
+# "c:", "d drive" and "drive e"; "a drive" is read as an article
+DRIVE_REGEX = re.compile(r"\b([a-z]):|\b([b-z]) drive\b|\bdrive ([a-z])\b")
+NUMBER_REGEX = re.compile(r"\b\d+(?:\.\d+)*\b")
+# server01, dc-2, fs01.corp.example.com and \\fileserver, but not plain words
+HOST_REGEX = re.compile(r"\\\\[a-z0-9.-]+|\b[a-z][a-z0-9-]*\.[a-z0-9.-]*[a-z]\b|\b[a-z][a-z-]*\d[a-z0-9-]*\b")
+
+
+def question_words(question):
+    words = []
+    for word in re.findall(r"[a-z0-9]+", normalize_question(question)):
+        words.extend(SYNONYMS.get(word, word).split())
+    return [w for w in words if w not in STOPWORDS]
+
+
+def question_params(question):
+    """What a question's answer depends on beyond its wording: drives, numbers, hosts and actions.
+
+    "check disk space on C drive" and "... on D drive" are nearly the same
+    text but need different commands, so a stored answer is only served to
+    a question with the same parameters.
+    """
+    text = normalize_question(question)
+    params = {f"drive:{next(g for g in match.groups() if g)}" for match in DRIVE_REGEX.finditer(text)}
+    params.update(f"number:{number}" for number in NUMBER_REGEX.findall(text))
+    params.update("host:" + host.lstrip("\\") for host in HOST_REGEX.findall(text))
+    params.update(f"action:{word}" for word in question_words(question) if word in ACTION_WORDS)
+    return frozenset(params)
+
+
+def question_ngrams(question):
+    words = question_words(question)
+    text = f" {' '.join(words)} "
+    grams = {}
+    for n in NGRAM_SIZES:
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            grams[gram] = grams.get(gram, 0) + 1
+    return grams
+
+
+def vectorize(question, dim=HASH_DIM):
+    # Hashed character n-grams with sublinear term frequency, as parallel index/weight arrays
+    buckets = {}
+    for gram, count in question_ngrams(question).items():
+        bucket = zlib.crc32(gram.encode("utf-8")) & (dim - 1)
+        buckets[bucket] = buckets.get(bucket, 0) + count
+    if not buckets:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    indices = np.fromiter(buckets.keys(), dtype=np.int32, count=len(buckets))
+    counts = np.fromiter(buckets.values(), dtype=np.float32, count=len(buckets))
+    return indices, 1.0 + np.log(counts)
+
+
+class _Segment:
+    # Immutable block of documents with a prebuilt inverted index
+
+    def __init__(self, indptr, indices, weights, idf, dim):
+        self.size = len(indptr) - 1
+        doc_ids = np.repeat(np.arange(self.size, dtype=np.int32), np.diff(indptr))
+        order = np.argsort(indices, kind="stable")
+        self.posting_docs = doc_ids[order]
+        self.posting_weights = weights[order]
+        self.posting_ptr = np.searchsorted(indices[order], np.arange(dim + 1)).astype(np.int64)
+        weighted = weights * idf[indices]
+        self.norms = np.sqrt(np.bincount(doc_ids, weights=weighted * weighted, minlength=self.size))
+        self.norms[self.norms == 0] = 1.0
+
+    def score(self, query_indices, query_weights, max_postings):
+        doc_parts = []
+        value_parts = []
+        for bucket, weight in zip(query_indices, query_weights):
+            start, end = self.posting_ptr[bucket], self.posting_ptr[bucket + 1]
+            # Very common n-grams have near-zero idf and the longest postings
+            if start == end or end - start > max_postings:
+                continue
+            doc_parts.append(self.posting_docs[start:end])
+            value_parts.append(self.posting_weights[start:end] * weight)
+        if not doc_parts:
+            return None
+        return np.bincount(
+            np.concatenate(doc_parts), weights=np.concatenate(value_parts), minlength=self.size
+        ) / self.norms
+
+
+class SemanticCache:
+    """Near-duplicate question lookup over TF-IDF character n-gram vectors.
+
+    Documents live in CSR arrays (indptr/indices/weights) split into a large
+    base segment and a small tail segment, so adding a question only rebuilds
+    the tail. Everything is persisted as one .npz file of plain arrays.
+
+    A match is only served within the same `scope` (the prompt and mode the
+    answer was generated with) and when both questions have the same
+    drives, numbers, hosts and action verbs.
+
+    Several processes can share the file: each save first merges in the
+    questions other processes saved since this one last read it. An index
+    that can't be read is logged and replaced, never raised.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, threshold=DEFAULT_THRESHOLD, dim=HASH_DIM,
+                 save_every=20, save_interval=60.0):
+        self.path = path
+        self.threshold = threshold
+        self.dim = dim
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._indptr = [0]
+        self._indices = []
+        self._weights = []
+        self._entries = []
+        self._params = []
+        self._df = np.zeros(dim, dtype=np.int32)
+        self._keys = {}
+        self._base = None
+        self._base_size = 0
+        self._tail = None
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+        self._stats = {"lookups": 0, "hits": 0}
+        # (mtime, size) of the file as last read or written, to notice saves by other processes
+        self._disk_stamp = None
+        if path and Path(path).exists():
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _idf(self, indices=None):
+        df = self._df if indices is None else self._df[indices]
+        return np.log((1 + len(self._entries)) / (1 + df)).astype(np.float32) + 1.0
+
+    def add(self, question, response, scope=None):
+        key = (scope, normalize_question(question))
+        indices, weights = vectorize(question, self.dim)
+        with self._lock:
+            if key in self._keys or not len(indices):
+                return
+            self._extend([(key, {"question": question, "response": response, "scope": scope}, indices, weights)])
+            self._unsaved += 1
+            # Each save rewrites the whole file, so space them out as the index grows
+            if self._unsaved >= max(self.save_every, len(self._entries) // 10) or (
+                time.monotonic() - self._last_save > self.save_interval
+            ):
+                self._save()
+
+    def _extend(self, documents):
+        # Caller holds the lock; documents are (key, entry, indices, weights) for new questions
+        if not documents:
+            return
+        for key, entry, indices, weights in documents:
+            self._keys[key] = len(self._entries)
+            self._entries.append(entry)
+            self._params.append(question_params(entry["question"]))
+            self._indices.append(indices)
+            self._weights.append(weights)
+            self._indptr.append(self._indptr[-1] + len(indices))
+        np.add.at(self._df, np.concatenate([indices for _, _, indices, _ in documents]), 1)
+        self._tail = None
+
+    def _build(self, start, end):
+        indptr = np.asarray(self._indptr[start:end + 1], dtype=np.int64) - self._indptr[start]
+        indices = np.concatenate(self._indices[start:end])
+        weights = np.concatenate(self._weights[start:end])
+        return _Segment(indptr, indices, weights, self._idf(), self.dim)
+
+    def _segments(self):
+        total = len(self._entries)
+        # Fold the tail into the base once it stops being small
+        if self._base is None or total - self._base_size > max(1000, self._base_size // 20):
+            self._base = self._build(0, total) if total else None
+            self._base_size = total
+            self._tail = None
+        elif self._tail is None and total > self._base_size:
+            self._tail = self._build(self._base_size, total)
+        return [(0, self._base), (self._base_size, self._tail)]
+
+    def lookup(self, question, threshold=None, scope=None, count=True):
+        threshold = self.threshold if threshold is None else threshold
+        query_indices, query_weights = vectorize(question, self.dim)
+        params = question_params(question)
+        with self._lock:
+            if count:
+                self._stats["lookups"] += 1
+            if not self._entries or not len(query_indices):
+                return None
+            idf = self._idf(query_indices)
+            query_weights = query_weights * idf
+            query_weights = query_weights * idf / np.linalg.norm(query_weights)
+            max_postings = max(1000, len(self._entries) // 20)
+
+            best_score, best_id = 0.0, None
+            for offset, segment in self._segments():
+                if segment is None:
+                    continue
+                scores = segment.score(query_indices, query_weights, max_postings)
+                if scores is None:
+                    continue
+                # Best first among those over the threshold, skipping other scopes and parameters
+                candidates = np.flatnonzero(scores >= max(threshold, best_score))
+                for doc in candidates[np.argsort(-scores[candidates], kind="stable")]:
+                    doc_id = offset + int(doc)
+                    if self._entries[doc_id].get("scope") == scope and self._params[doc_id] == params:
+                        if scores[doc] > best_score:
+                            best_score, best_id = float(scores[doc]), doc_id
+                        break
+
+            if best_id is None or best_score < threshold:
+                return None
+            if count:
+                self._stats["hits"] += 1
+            entry = self._entries[best_id]
+            return {"question": entry["question"], "response": dict(entry["response"]), "score": min(best_score, 1.0)}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            # Another process saved since this one last looked; keep its questions too
+            if self._stamp() not in (None, self._disk_stamp):
+                self._merge()
+            self._write()
+        except OSError as e:
+            # Answers keep being served from memory; the next save tries again
+            logger.warning("Could not save the semantic cache index to %s: %s", self.path, e)
+            return
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _write(self):
+        blob = [json.dumps(entry).encode("utf-8") for entry in self._entries]
+        offsets = np.zeros(len(blob) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in blob], out=offsets[1:])
+        directory = Path(self.path).parent
+        directory.mkdir(parents=True, exist_ok=True)
+        # A temporary file of its own, so processes saving at once never write into the same one
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=Path(self.path).name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    dim=np.int64(self.dim),
+                    indptr=np.asarray(self._indptr, dtype=np.int64),
+                    indices=np.concatenate(self._indices) if self._indices else np.empty(0, dtype=np.int32),
+                    weights=(np.concatenate(self._weights) if self._weights
+                             else np.empty(0, dtype=np.float32)).astype(np.float16),
+                    entry_offsets=offsets,
+                    entry_blob=np.frombuffer(b"".join(blob), dtype=np.uint8),
+                )
+            # Readers never see a half-written index
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._disk_stamp = self._stamp()
+
+    def _read(self):
+        """(key, entry, indices, weights) for each question in the file, or None if it can't be read."""
+        # Recorded even if the read fails, so a damaged file is reported once, not on every save
+        self._disk_stamp = self._stamp()
+        try:
+            with np.load(self.path) as data:
+                if int(data["dim"]) != self.dim:
+                    logger.warning("Ignoring the semantic cache index at %s, built for another dimension", self.path)
+                    return None
+                indptr = data["indptr"]
+                indices = data["indices"]
+                weights = data["weights"].astype(np.float32)
+                offsets = data["entry_offsets"]
+                blob = data["entry_blob"].tobytes()
+            documents = []
+            for i in range(len(indptr) - 1):
+                entry = json.loads(blob[offsets[i]:offsets[i + 1]])
+                documents.append(((entry.get("scope"), normalize_question(entry["question"])), entry,
+                                  indices[indptr[i]:indptr[i + 1]], weights[indptr[i]:indptr[i + 1]]))
+        except (OSError, EOFError, ValueError, KeyError, TypeError, IndexError, zipfile.BadZipFile) as e:
+            # Truncated or corrupt; the next save replaces it
+            logger.warning("Could not read the semantic cache index at %s, starting empty: %s", self.path, e)
+            return None
+        return documents
+
+    def _merge(self):
+        documents, seen = [], set(self._keys)
+        for document in self._read() or ():
+            if document[0] not in seen:
+                seen.add(document[0])
+                documents.append(document)
+        self._extend(documents)
+
+    def _load(self):
+        with self._lock:
+            self._merge()
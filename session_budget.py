@@ -0,0 +1,114 @@
+import os
+import sys
+from collections import OrderedDict
+
+DEFAULT_SESSION_BUDGET_BYTES = int(float(os.environ.get("SESSION_MEMORY_BUDGET_MB", "4")) * 2 ** 20)
+# Largest share of the budget the answers of one session may take
+ANSWERS_BUDGET_FRACTION = 0.5
+DEFAULT_MAX_ANSWERS = 50
+
+
+def estimate_size(value, _seen=None):
+    """Rough deep size in bytes of plain data: dicts, lists, tuples, sets and scalars.
+
+    Other objects count their own size only, except those with an `nbytes`
+    attribute that keep a running total themselves.
+    """
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in value)
+    return size
+
+
+class BoundedDict:
+    """Least-recently-used mapping that evicts its oldest entries past a count or a size.
+
+    The newest entry is always kept, even if it alone is over `max_bytes`.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ANSWERS, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = sys.getsizeof(self)
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, key):
+        value, _ = self._entries[key]
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self._entries else default
+
+    def __setitem__(self, key, value):
+        if key in self._entries:
+            del self[key]
+        size = estimate_size(key) + estimate_size(value)
+        self._entries[key] = (value, size)
+        self.nbytes += size
+        self.shrink(self.max_bytes)
+
+    def __delitem__(self, key):
+        _, size = self._entries.pop(key)
+        self.nbytes -= size
+
+    def shrink(self, max_bytes):
+        """Evicts the oldest entries until under max_entries and max_bytes."""
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or (max_bytes is not None and self.nbytes > max_bytes)
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
+
+
+def session_usage(state):
+    """Estimated bytes held by each key of a session state, largest first."""
+    usage = []
+    for key in list(state.keys()):
+        try:
+            usage.append((key, estimate_size(state[key])))
+        except KeyError:
+            # Widget state can disappear between listing and reading
+            continue
+    return sorted(usage, key=lambda item: -item[1])
+
+
+def enforce_budget(state, budget=DEFAULT_SESSION_BUDGET_BYTES, evictable=()):
+    """Shrinks the session's BoundedDicts, in the order given, until it fits the budget.
+
+    Returns the estimated total afterwards; it can stay over budget when
+    the rest of the session state alone is larger.
+    """
+    usage = dict(session_usage(state))
+    total = sum(usage.values())
+    for key in evictable:
+        if total <= budget:
+            break
+        bounded = state.get(key)
+        if not isinstance(bounded, BoundedDict):
+            continue
+        before = bounded.nbytes
+        bounded.shrink(max(0, bounded.nbytes - (total - budget)))
+        total -= before - bounded.nbytes
+    return total
@@ -0,0 +1,344 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_STATE_PATH = os.environ.get("SHARED_STATE_DB", ".cache/shared_state.db")
+DEFAULT_BACKEND = os.environ.get("SHARED_STATE_BACKEND", "sqlite")
+# How long a value read from the backend is trusted before it is read again
+DEFAULT_READ_TTL = float(os.environ.get("SHARED_STATE_READ_TTL", "2"))
+# Writes are buffered and sent to the backend in one batch at most this often
+DEFAULT_FLUSH_INTERVAL = float(os.environ.get("SHARED_STATE_FLUSH_INTERVAL", "0.5"))
+DEFAULT_BATCH_SIZE = 100
+BUSY_TIMEOUT_SECONDS = 5.0
+
+
+def connect_sqlite(db_path, busy_timeout=BUSY_TIMEOUT_SECONDS):
+    """Opens a connection that several processes on one machine can share.
+
+    WAL mode lets readers carry on while another process writes, and the
+    busy timeout makes a writer wait for the lock instead of failing.
+    """
+    if db_path != ":memory:":
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False)
+    if db_path != ":memory:":
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL: a power cut can lose the last commits but never corrupts the file
+        conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SQLiteKV:
+    """Namespaced key-value tables in one SQLite file, shared by every process on the machine."""
+
+    def __init__(self, db_path=DEFAULT_STATE_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS kv (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, namespace, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def items(self, namespace):
+        # Oldest write first
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM kv WHERE namespace = ? ORDER BY updated_at, rowid", (namespace,)
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def count(self, namespace):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM kv WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    def write_many(self, namespace, puts, deletes=()):
+        """Applies a batch of puts ({key: value}) and deletes in one transaction."""
+        now = time.time()
+        with self._lock, self._conn:
+            if deletes:
+                self._conn.executemany(
+                    "DELETE FROM kv WHERE namespace = ? AND key = ?", [(namespace, key) for key in deletes]
+                )
+            if puts:
+                # The batch's order is kept by nudging each timestamp forward
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                    [(namespace, key, json.dumps(value), now + i * 1e-6) for i, (key, value) in enumerate(puts.items())],
+                )
+
+    def clear(self, namespace):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+
+    def clear_prefix(self, prefix):
+        """Deletes every namespace whose name starts with `prefix`."""
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM kv WHERE namespace LIKE ? ESCAPE '\\'", (f"{escaped}%",))
+
+
+class MemoryKV:
+    """In-process stand-in with the same interface as SQLiteKV.
+
+    Nothing is shared between processes; it is for single-process runs,
+    benchmarks, and as the template for a networked key-value backend.
+    """
+
+    def __init__(self, db_path=None):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        with self._lock:
+            value = self._data.get(namespace, {}).get(key)
+        return None if value is None else json.loads(value)
+
+    def items(self, namespace):
+        with self._lock:
+            items = list(self._data.get(namespace, {}).items())
+        return [(key, json.loads(value)) for key, value in items]
+
+    def count(self, namespace):
+        with self._lock:
+            return len(self._data.get(namespace, {}))
+
+    def write_many(self, namespace, puts, deletes=()):
+        # Values are stored as JSON, as SQLiteKV does, so callers can't share mutable objects by accident
+        with self._lock:
+            table = self._data.setdefault(namespace, {})
+            for key in deletes:
+                table.pop(key, None)
+            for key, value in puts.items():
+                table.pop(key, None)
+                table[key] = json.dumps(value)
+
+    def clear(self, namespace):
+        with self._lock:
+            self._data.pop(namespace, None)
+
+    def clear_prefix(self, prefix):
+        with self._lock:
+            for namespace in [name for name in self._data if name.startswith(prefix)]:
+                del self._data[namespace]
+
+
+KV_BACKENDS = {
+    "sqlite": SQLiteKV,
+    "memory": MemoryKV,
+}
+
+
+def open_kv(backend=DEFAULT_BACKEND, db_path=DEFAULT_STATE_PATH):
+    # ":memory:" can't be shared between connections, so it always means the in-process backend
+    if db_path == ":memory:":
+        backend = "memory"
+    try:
+        return KV_BACKENDS[backend](db_path)
+    except KeyError:
+        raise ValueError(f"Unknown shared state backend: {backend}") from None
+
+
+_DELETED = object()
+_MISSING = object()
+
+
+class SharedState:
+    """One namespace of a key-value backend, with read-through caching and batched writes.
+
+    Reads are served from a local cache and only go to the backend for keys
+    not seen within `read_ttl` seconds (None trusts cached values until they
+    are evicted, for content-addressed data). Writes update the local cache
+    at once and reach the backend in batches from a background thread, so a
+    rerun never waits on the backend to save something.
+    """
+
+    def __init__(self, kv, namespace, read_ttl=DEFAULT_READ_TTL, max_entries=None,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, batch_size=DEFAULT_BATCH_SIZE, clock=time.monotonic):
+        self.kv = kv
+        self.namespace = namespace
+        self.read_ttl = read_ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.clock = clock
+        self._local = OrderedDict()
+        self._snapshot = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+        self._stats = {"local_hits": 0, "backend_reads": 0, "misses": 0, "evictions": 0, "flushes": 0,
+                       "writes": 0}
+        # Bumped whenever the namespace's contents may have changed, so callers can rebuild derived data
+        self.version = 0
+
+    def _fresh(self, fetched_at, now):
+        return self.read_ttl is None or now - fetched_at < self.read_ttl
+
+    def _peek(self, key, now):
+        # Caller holds the lock; returns _MISSING when the backend has to be asked
+        pending = self._pending.get(key, _MISSING)
+        if pending is not _MISSING:
+            return None if pending is _DELETED else pending
+        entry = self._local.get(key)
+        if entry is not None and self._fresh(entry[1], now):
+            self._local.move_to_end(key)
+            return entry[0]
+        return _MISSING
+
+    def peek(self, key):
+        """The value if it is cached locally, without going to the backend."""
+        with self._lock:
+            value = self._peek(key, self.clock())
+            if value is _MISSING:
+                return None
+            self._stats["local_hits"] += 1
+            return value
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            value = self._peek(key, now)
+            if value is not _MISSING:
+                self._stats["local_hits"] += 1
+                return value
+        value = self.kv.get(self.namespace, key)
+        with self._lock:
+            self._stats["backend_reads"] += 1
+            if value is None:
+                # Misses aren't cached; another process may write the key any moment
+                self._stats["misses"] += 1
+                self._local.pop(key, None)
+            elif key not in self._pending:
+                self._remember(key, value, now)
+        return value
+
+    def items(self):
+        """Every (key, value) in the namespace, oldest write first, including writes not yet flushed."""
+        now = self.clock()
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is None or not self._fresh(snapshot[1], now):
+            items = self.kv.items(self.namespace)
+            with self._lock:
+                if snapshot is None or items != snapshot[0]:
+                    self.version += 1
+                snapshot = self._snapshot = (items, now)
+        with self._lock:
+            if not self._pending:
+                return list(snapshot[0])
+            merged = OrderedDict((key, value) for key, value in snapshot[0] if key not in self._pending)
+            for key, value in self._pending.items():
+                if value is not _DELETED:
+                    merged[key] = value
+        return list(merged.items())
+
+    def put(self, key, value):
+        self._write(key, value)
+
+    def delete(self, key):
+        self._write(key, _DELETED)
+
+    def _write(self, key, value):
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = value
+            self._stats["writes"] += 1
+            self.version += 1
+            if value is _DELETED:
+                self._local.pop(key, None)
+            else:
+                self._remember(key, value, self.clock())
+            full = len(self._pending) >= self.batch_size
+        if full or self.flush_interval is None:
+            self.flush()
+        else:
+            self._start_flusher()
+            self._wake.set()
+
+    def _remember(self, key, value, now):
+        self._local[key] = (value, now)
+        self._local.move_to_end(key)
+        if self.max_entries is not None:
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name=f"shared-state-{self.namespace}",
+                                             daemon=True)
+            # Only buffered writes need sending at exit; write-through namespaces are never held here
+            atexit.register(self.flush)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait()
+            # Let writes that arrive close together share one transaction
+            time.sleep(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # flush() put the batch back; it goes out with the next write or at exit
+                pass
+
+    def flush(self):
+        """Sends every buffered write to the backend in one batch."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            puts = {key: value for key, value in batch.items() if value is not _DELETED}
+            deletes = [key for key, value in batch.items() if value is _DELETED]
+            try:
+                self.kv.write_many(self.namespace, puts, deletes)
+            except Exception:
+                with self._lock:
+                    # Newer writes made while flushing win over the failed batch
+                    self._pending = {**batch, **self._pending}
+                raise
+            with self._lock:
+                self._stats["flushes"] += 1
+                # The next items() call sees the batch from the backend
+                self._snapshot = None
+
+    def clear(self):
+        with self._flush_lock, self._lock:
+            self._pending.clear()
+            self._local.clear()
+            self._snapshot = None
+            self.version += 1
+            self.kv.clear(self.namespace)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, local_entries=len(self._local), pending=len(self._pending))
+        stats["backend_entries"] = self.kv.count(self.namespace)
+        return stats
@@ -0,0 +1,92 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ad_query import build_ad_query, build_ldap_filter, days_ago_filetime, escape_ldap  # noqa: E402
+
+NOW = 1700000000
+
+
+@pytest.mark.parametrize("value, escaped", [
+    ("Smith", "Smith"),
+    ("a*b", "a\\2ab"),
+    ("(admin)", "\\28admin\\29"),
+    ("back\\slash", "back\\5cslash"),
+    ("nul\0", "nul\\00"),
+])
+def test_escape_ldap(value, escaped):
+    assert escape_ldap(value) == escaped
+
+
+def test_days_ago_filetime():
+    # 1601-01-01 is FILETIME zero; one day is 864e9 hundred-nanosecond ticks
+    assert days_ago_filetime(0, now=0) == 11644473600 * 10 ** 7
+    assert days_ago_filetime(1, now=NOW) - days_ago_filetime(2, now=NOW) == 864 * 10 ** 9
+
+
+def test_no_conditions_match_everything():
+    assert build_ldap_filter("Users", {}) == "(name=*)"
+
+
+def test_one_condition_is_not_wrapped():
+    assert build_ldap_filter("Users", {"Locked out": None}) == "(lockoutTime>=1)"
+
+
+def test_conditions_are_anded():
+    ldap = build_ldap_filter("Users", {
+        "Enabled": None,
+        "Name starts with": "j*(",
+        "No logon for N days": 90,
+    }, now=NOW)
+    assert ldap == (
+        "(&(!(userAccountControl:1.2.840.113556.1.4.803:=2))(name=j\\2a\\28*)"
+        f"(lastLogonTimestamp<={days_ago_filetime(90, now=NOW)}))"
+    )
+
+
+@pytest.mark.parametrize("conditions, message", [
+    ({"Name starts with": "   "}, "enter a value"),
+    ({"No logon for N days": 0}, "at least 1"),
+])
+def test_missing_inputs_are_rejected(conditions, message):
+    with pytest.raises(ValueError, match=message):
+        build_ldap_filter("Users", conditions)
+
+
+def test_query_requests_only_extra_properties():
+    command = build_ad_query("Users", {"Department is": "O'Brien & Co"},
+                             properties=["Name", "SamAccountName", "mail", "Department"])
+    assert command == (
+        "Get-ADUser -LDAPFilter '(department=O''Brien & Co)' -ResultPageSize 1000 "
+        "-Properties mail,Department | Select-Object Name,SamAccountName,mail,Department "
+        "| ConvertTo-Csv -NoTypeInformation"
+    )
+
+
+def test_query_with_base_scope_and_json_output():
+    command = build_ad_query("Computers", search_base="OU=Servers,DC=corp,DC=example,DC=com", scope="OneLevel",
+                             page_size=500, result_size=100, output="json")
+    assert command.startswith(
+        "Get-ADComputer -LDAPFilter '(name=*)' -SearchBase 'OU=Servers,DC=corp,DC=example,DC=com' "
+        "-SearchScope OneLevel -ResultPageSize 500 -ResultSetSize 100 -Properties OperatingSystem,LastLogonDate"
+    )
+    assert command.endswith("| ForEach-Object { $_ | ConvertTo-Json -Compress -Depth 2 }")
+
+
+def test_quotes_in_the_search_base_stay_inside_the_string():
+    command = build_ad_query("Users", search_base="OU=Staff'; Remove-ADUser x; ',DC=corp")
+    assert "-SearchBase 'OU=Staff''; Remove-ADUser x; '',DC=corp' -SearchScope Subtree" in command
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"scope": "Everything"}, "Unknown search scope"),
+    ({"output": "xml"}, "Unknown output format"),
+    ({"search_base": "corp.example.com"}, "not a distinguished name"),
+    ({"page_size": 0}, "Page size"),
+])
+def test_query_rejects_bad_options(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        build_ad_query("Users", **kwargs)
@@ -0,0 +1,139 @@
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batch import compact_output, read_questions, run_batch, scan_output  # noqa: E402
+from scheduler import GeminiScheduler  # noqa: E402
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class StubModel:
+    """Answers every question at once; `errors` maps a question to the errors its calls raise in turn."""
+
+    def __init__(self, errors=None):
+        self.errors = {question: list(raised) for question, raised in (errors or {}).items()}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def start_chat(self):
+        return self
+
+    def send_message(self, prompt, **kwargs):
+        with self._lock:
+            self.calls.append(prompt)
+            for asked, raised in self.errors.items():
+                if asked in prompt and raised:
+                    raise raised.pop(0)
+        return StubResponse("ipconfig /all\nShows the IP configuration.")
+
+
+def records(path):
+    return [json.loads(line) for line in Path(path).read_text(encoding="utf-8").splitlines()]
+
+
+def test_read_questions_skips_blanks_and_comments(tmp_path):
+    path = tmp_path / "questions.txt"
+    path.write_text("# header\nflush dns\n\n  list services  \n", encoding="utf-8")
+    assert read_questions(path) == ["flush dns", "list services"]
+
+
+def test_read_questions_jsonl(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text('{"question": "flush dns", "id": 1}\n"list services"\n', encoding="utf-8")
+    assert read_questions(path) == ["flush dns", "list services"]
+
+
+@pytest.mark.parametrize("line, message", [
+    ('{"question": "flush dns"', "not valid JSON"),
+    ('{"prompt": "flush dns"}', 'no "question" field'),
+    ('{"question": 42}', 'no "question" field'),
+])
+def test_read_questions_reports_bad_lines(tmp_path, line, message):
+    path = tmp_path / "questions.jsonl"
+    path.write_text('{"question": "list services"}\n' + line + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=f":2: {message}"):
+        read_questions(path)
+
+
+def test_run_batch_answers_each_question_once(tmp_path):
+    output = tmp_path / "answers.jsonl"
+    model = StubModel()
+    summary = run_batch(["flush dns", "list services", "flush dns", "bad;question"], model, output,
+                        concurrency=2, sleep=lambda seconds: None)
+    assert summary["ok"] == 2 and summary["invalid"] == 1 and summary["api_calls"] == 2
+    assert sorted(record["question"] for record in records(output)) == ["bad;question", "flush dns", "list services"]
+
+    # Everything finished, so a second run asks nothing
+    summary = run_batch(["flush dns", "list services", "bad;question"], model, output, sleep=lambda seconds: None)
+    assert summary["skipped"] == 3 and len(model.calls) == 2
+
+
+def test_resume_retries_failures_without_duplicates(tmp_path):
+    output = tmp_path / "answers.jsonl"
+    output.write_text(
+        json.dumps({"question": "flush dns", "status": "ok", "command": "ipconfig /flushdns"}) + "\n"
+        + json.dumps({"question": "list services", "status": "error", "command": None}) + "\n"
+        # A run killed mid-write leaves half a record
+        + '{"question": "show ro',
+        encoding="utf-8",
+    )
+    model = StubModel()
+    summary = run_batch(["flush dns", "list services", "show routes"], model, output, sleep=lambda seconds: None)
+
+    assert summary["skipped"] == 1 and summary["ok"] == 2 and len(model.calls) == 2
+    written = records(output)
+    # The kept record stays first; the new ones follow in the order they finished
+    assert written[0]["question"] == "flush dns"
+    assert sorted(record["question"] for record in written) == ["flush dns", "list services", "show routes"]
+    assert all(record["status"] == "ok" for record in written)
+    assert scan_output(output) == ({"flush dns": "ok", "list services": "ok", "show routes": "ok"}, False)
+
+
+def test_compact_output_keeps_latest_record(tmp_path):
+    output = tmp_path / "answers.jsonl"
+    lines = [
+        {"question": "a", "status": "error"},
+        {"question": "b", "status": "ok"},
+        {"question": "a", "status": "ok"},
+    ]
+    output.write_text("\n".join(json.dumps(line) for line in lines) + "\nnot json\n" + json.dumps(
+        {"question": "c", "status": "ok"}), encoding="utf-8")
+    assert scan_output(output)[1] is True
+
+    compact_output(output)
+    assert records(output) == [lines[1], lines[2], {"question": "c", "status": "ok"}]
+    assert scan_output(output) == ({"b": "ok", "a": "ok", "c": "ok"}, False)
+    assert not (tmp_path / "answers.jsonl.tmp").exists()
+
+
+def test_retries_with_backoff(tmp_path):
+    sleeps = []
+    model = StubModel({"flush dns": [ConnectionError("reset"), ConnectionError("reset")]})
+    summary = run_batch(["flush dns"], model, tmp_path / "answers.jsonl", retries=3, backoff=1.0,
+                        sleep=sleeps.append)
+    assert summary["ok"] == 1 and summary["api_calls"] == 3 and len(model.calls) == 3
+    # Doubling each time, with up to 50% jitter either way
+    assert len(sleeps) == 2 and 0.5 <= sleeps[0] <= 1.5 and 1.0 <= sleeps[1] <= 3.0
+
+
+def test_quota_errors_are_retried_in_one_layer(tmp_path):
+    # The scheduler backs off after a quota error; the batch loop counts the attempts
+    scheduler = GeminiScheduler(requests_per_minute=6000, base_backoff=0.01, max_backoff=0.01)
+    sleeps = []
+    model = StubModel({"flush dns": [RuntimeError("429 Resource exhausted")] * 10})
+    summary = run_batch(["flush dns"], model, tmp_path / "answers.jsonl", retries=2, sleep=sleeps.append,
+                        scheduler=scheduler)
+    assert summary["error"] == 1 and summary["api_calls"] == 3
+    assert len(model.calls) == 3
+    assert sleeps == []
+    assert scheduler.metrics()["quota_errors"] == 3
@@ -0,0 +1,171 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from diagnostics import (  # noqa: E402
+    TIMEOUT_GRACE,
+    LocalExecutor,
+    RemoteExecutor,
+    ReplayExecutor,
+    ResultCache,
+    run_diagnostics,
+)
+from remote_exec import FakeTransport, SessionPool  # noqa: E402
+
+RECORDINGS = {
+    "ipconfig /all": {"output": "Windows IP Configuration\nHost Name . . : WS01\n", "exit_code": 0, "duration": 0.5},
+    "ping -n 4 gateway": {"output": "Request timed out.\n" * 4, "exit_code": 1, "duration": 2.0},
+    "netstat -ano": {"output": "x" * 1000, "exit_code": 0, "duration": 0.5},
+    "tracert example.com": {"output": "hop\n" * 30, "exit_code": 0, "duration": 30.0},
+}
+
+
+def replay(**kwargs):
+    # Replayed durations are only counted, not waited for
+    return ReplayExecutor(RECORDINGS, sleep=lambda seconds: None, **kwargs)
+
+
+def collect(events):
+    output, done = {}, {}
+    for kind, name, payload in events:
+        if kind == "output":
+            output[name] = output.get(name, "") + payload
+        else:
+            assert name not in done
+            done[name] = payload
+    return output, done
+
+
+def test_statuses_and_streamed_output():
+    commands = {"IP": "ipconfig /all", "Ping": "ping -n 4 gateway", "Trace": "tracert example.com"}
+    output, done = collect(run_diagnostics(commands, replay(), timeout=10))
+    assert {name: result["status"] for name, result in done.items()} == {
+        "IP": "ok", "Ping": "failed", "Trace": "timeout"}
+    assert output["IP"] == done["IP"]["output"] == RECORDINGS["ipconfig /all"]["output"]
+    assert done["Ping"]["exit_code"] == 1
+    # A timed-out command keeps what it wrote before the timeout
+    assert done["Trace"]["error"] == "No result within 10s"
+    assert 0 < len(done["Trace"]["output"]) < len(RECORDINGS["tracert example.com"]["output"])
+
+
+def test_output_is_capped():
+    _, done = collect(run_diagnostics({"Netstat": "netstat -ano"}, replay(), max_output_bytes=300))
+    result = done["Netstat"]
+    assert result["truncated"] and result["status"] == "ok"
+    assert len(result["output"]) == 300
+
+
+def test_executor_errors_are_results():
+    class BrokenExecutor:
+        def run(self, command, emit, timeout, max_output_bytes):
+            raise FileNotFoundError("no such command")
+
+    _, done = collect(run_diagnostics({"IP": "ipconfig /all"}, BrokenExecutor()))
+    assert done["IP"]["status"] == "error" and done["IP"]["error"] == "no such command"
+
+
+def test_hung_executor_is_abandoned():
+    release = threading.Event()
+
+    class HungExecutor:
+        def run(self, command, emit, timeout, max_output_bytes):
+            release.wait()
+            return {"exit_code": 0, "output": "", "timed_out": False, "truncated": False}
+
+    # A clock running 20 times fast, so the grace period passes in a fraction of a second
+    start = time.monotonic()
+    clock = lambda: start + (time.monotonic() - start) * 20  # noqa: E731
+    try:
+        _, done = collect(run_diagnostics({"IP": "ipconfig /all", "Ping": "ping -n 4 gateway"}, HungExecutor(),
+                                          timeout=1, clock=clock))
+    finally:
+        release.set()
+    assert {result["status"] for result in done.values()} == {"timeout"}
+    assert all(result["elapsed"] >= 1 + TIMEOUT_GRACE for result in done.values())
+
+
+def test_cached_results_are_kept_per_scope():
+    cache = ResultCache(ttl=60)
+    executor = replay()
+    commands = {"IP": "ipconfig /all", "Ping": "ping -n 4 gateway", "Trace": "tracert example.com"}
+    collect(run_diagnostics(commands, executor, host="ws01", cache=cache, timeout=10, cache_scope="alice"))
+
+    events = list(run_diagnostics(commands, executor, host="ws01", cache=cache, timeout=10, cache_scope="alice"))
+    _, done = collect(events)
+    # Finished results come back first without output events; the timeout is run again
+    assert [kind for kind, _, _ in events[:2]] == ["done", "done"]
+    assert done["IP"]["cached"] and done["Ping"]["cached"] and not done["Trace"]["cached"]
+
+    _, done = collect(run_diagnostics(commands, executor, host="ws01", cache=cache, timeout=10, cache_scope="bob"))
+    assert not any(result["cached"] for result in done.values())
+
+
+def test_cache_expires():
+    now = [0.0]
+    cache = ResultCache(ttl=10, clock=lambda: now[0])
+    cache.put("ws01", "ipconfig /all", {"status": "ok"})
+    now[0] = 5
+    assert cache.get("ws01", "ipconfig /all")["age"] == 5
+    now[0] = 11
+    assert cache.get("ws01", "ipconfig /all") is None
+
+
+def test_remote_executor_times_out_and_discards_the_session():
+    release = threading.Event()
+    transport = FakeTransport(hanging_hosts={"ws01"}, hang_seconds=60, sleep=release.wait)
+    pool = SessionPool(transport)
+    try:
+        _, done = collect(run_diagnostics({"IP": "ipconfig /all"}, RemoteExecutor(pool, "ws01"), host="ws01",
+                                          timeout=0.2))
+    finally:
+        release.set()
+    assert done["IP"]["status"] == "timeout"
+    time.sleep(0.1)
+    assert pool.stats()["idle"] == 0 and pool.stats()["discarded"] == 1
+
+
+@pytest.mark.skipif(os.name == "nt", reason="uses a POSIX shell")
+class TestLocalExecutor:
+    def test_output_cap_kills_the_command(self):
+        output = []
+        started = time.monotonic()
+        outcome = LocalExecutor(encoding="utf-8").run("yes", output.append, timeout=30, max_output_bytes=5000)
+        assert outcome["truncated"] and not outcome["timed_out"]
+        assert len(outcome["output"]) == 5000 and "".join(output) == outcome["output"]
+        assert time.monotonic() - started < 5
+
+    def test_timeout_kills_the_whole_process_group(self):
+        # The background sleep is a grandchild; killing only the shell would leave it running
+        outcome = LocalExecutor(encoding="utf-8").run("sleep 30 & echo $!; wait", lambda text: None, timeout=0.5)
+        assert outcome["timed_out"]
+        pid = int(outcome["output"].split()[0])
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and is_running(pid):
+            time.sleep(0.05)
+        assert not is_running(pid)
+
+    def test_exit_code_and_merged_stderr(self):
+        outcome = LocalExecutor(encoding="utf-8").run("echo out; echo err >&2; exit 3", lambda text: None)
+        assert outcome["exit_code"] == 3
+        assert outcome["output"].split() == ["out", "err"]
+
+
+def is_running(pid):
+    # A killed process may linger as a zombie until something reaps it
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+    except OSError:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from command_catalog import TROUBLESHOOTING_CATEGORIES  # noqa: E402
+from intent_matcher import IntentMatcher, extract_params  # noqa: E402
+
+# The same templates main.py hands the matcher
+TEMPLATES = {
+    "ip_config": "ipconfig /all",
+    "port_scan": "Test-NetConnection -ComputerName {target} -Port {port}",
+    "dns_check": "Resolve-DnsName {hostname}",
+    "traceroute": "tracert {target}",
+}
+
+
+@pytest.fixture
+def matcher():
+    return IntentMatcher(TEMPLATES, TROUBLESHOOTING_CATEGORIES)
+
+
+@pytest.mark.parametrize("question, command", [
+    ("check connectivity to port 8080 on localhost", "Test-NetConnection -ComputerName localhost -Port 8080"),
+    ("is port 443 open on web01", "Test-NetConnection -ComputerName web01 -Port 443"),
+    ("test connectivity to server web01 port 443", "Test-NetConnection -ComputerName web01 -Port 443"),
+    ("check dns for host dc01", "Resolve-DnsName dc01"),
+    ("check dns for server dc01.corp.example.com", "Resolve-DnsName dc01.corp.example.com"),
+    ("resolve the ip of server02", "Resolve-DnsName server02"),
+    ("traceroute to google.com", "tracert google.com"),
+    ("trace route to 10.0.0.1", "tracert 10.0.0.1"),
+    ("show my ip config", "ipconfig /all"),
+    ("show ip config on this machine", "ipconfig /all"),
+    ("flush dns", "ipconfig /flushdns"),
+])
+def test_template_answers(matcher, question, command):
+    assert matcher.match(question)["command"] == command
+
+
+@pytest.mark.parametrize("question", [
+    # No machine is named, only the keywords that usually come before one
+    "traceroute to host",
+    "check connectivity to port 8080",
+    # ipconfig only describes this machine
+    "show me the ip config of server02",
+    "show the ip configuration on web01.corp.example.com",
+    # Changes and explanations go to the model
+    "change my ip address",
+    "explain traceroute to google.com",
+])
+def test_falls_back_to_model(matcher, question):
+    assert matcher.match(question) is None
+
+
+@pytest.mark.parametrize("question, target", [
+    ("check connectivity to port 8080 on localhost", "localhost"),
+    ("check dns for host dc01", "dc01"),
+    ("ping server the", None),
+    ("connect to the host on 8080", None),
+])
+def test_keywords_are_not_targets(question, target):
+    assert extract_params(question).get("target") == target
+
+
+def test_unsafe_targets_are_dropped():
+    assert "target" not in extract_params("traceroute to a;b")
+
+
+def test_match_without_count_leaves_stats(matcher):
+    matcher.match("show my ip config", count=False)
+    assert matcher.stats()["lookups"] == 0
+    matcher.match("show my ip config")
+    assert matcher.stats()["hits"] == 1
@@ -0,0 +1,65 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from metrics_collector import CollectorRegistry, MetricCollector, RingBuffer, SimulatedSource  # noqa: E402
+
+
+def test_ring_buffer_keeps_the_newest_samples_in_order():
+    buffer = RingBuffer(capacity=4)
+    for i in range(6):
+        buffer.append(float(i), i * 10.0)
+    times, values = buffer.snapshot()
+    assert times.tolist() == [2.0, 3.0, 4.0, 5.0] and values.tolist() == [20.0, 30.0, 40.0, 50.0]
+    assert buffer.snapshot(since=4.0)[0].tolist() == [4.0, 5.0]
+
+
+def test_downsample_buckets_min_avg_max():
+    buffer = RingBuffer(capacity=10)
+    for i in range(6):
+        buffer.append(float(i), float(i))
+    times, mins, avgs, maxs = buffer.downsample(3)
+    assert times.tolist() == [1.0, 3.0, 5.0]
+    assert mins.tolist() == [0.0, 2.0, 4.0] and avgs.tolist() == [0.5, 2.5, 4.5] and maxs.tolist() == [1.0, 3.0, 5.0]
+
+
+def test_each_subscriber_keeps_its_own_interval():
+    registry = CollectorRegistry()
+    try:
+        fast = registry.get("sim", SimulatedSource, interval=1, subscriber="alice")
+        slow = registry.get("sim", SimulatedSource, interval=60, subscriber="bob")
+        assert fast is slow
+        # Bob's slower rate doesn't slow Alice's charts down
+        assert fast.current_interval() == 1
+        registry.get("sim", SimulatedSource, interval=30, subscriber="alice")
+        assert fast.current_interval() == 30
+    finally:
+        registry.stop("sim")
+
+
+def test_subscribers_that_stop_reading_no_longer_count():
+    collector = MetricCollector(SimulatedSource(seed=1), interval=5, idle_timeout=0.3)
+    collector.subscribe("alice", 1)
+    collector.subscribe("bob", 2)
+    time.sleep(0.2)
+    collector.snapshot("CPU Usage", subscriber="bob")
+    time.sleep(0.2)
+    assert collector.current_interval() == 2
+    time.sleep(0.4)
+    assert collector.current_interval() == 5
+
+
+def test_shorter_interval_takes_effect_without_waiting_out_the_old_one():
+    collector = MetricCollector(SimulatedSource(seed=1), interval=60).start()
+    try:
+        deadline = time.monotonic() + 5
+        while collector.samples < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        collector.subscribe("alice", 0.05)
+        while collector.samples < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert collector.samples >= 3
+    finally:
+        collector.stop()
@@ -0,0 +1,88 @@
+import ast
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter: time.sleep has to be wrapped before anything else imports it,
+# so sleep=time.sleep defaults pick the wrapper up too
+RUNTIME_SCRIPT = """
+import json, sys, time, traceback
+from pathlib import Path
+
+real_sleep = time.sleep
+script_sleeps = []
+
+def recording_sleep(seconds):
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        frame = traceback.extract_stack(limit=2)[0]
+        # The fake's own latency stands in for waiting on the network, which is not a sleep in the app
+        if Path(frame.filename).name != "fake_gemini.py":
+            script_sleeps.append(f"{seconds:g}s at {frame.filename}:{frame.lineno}")
+    real_sleep(seconds)
+
+time.sleep = recording_sleep
+sys.path[:0] = ["benchmarks"]
+
+import fake_gemini
+from bench_blocking import interactions
+from streamlit.testing.v1 import AppTest
+
+fake_gemini.install()
+at = AppTest.from_file("main.py", default_timeout=120)
+results = []
+for label, interact in interactions(at):
+    before = len(script_sleeps)
+    interact()
+    results.append({"label": label, "sleeps": script_sleeps[before:],
+                    "exceptions": [str(e.value) for e in at.exception]})
+print(json.dumps(results))
+"""
+
+
+def sleep_calls(path):
+    tree = ast.parse(path.read_text(encoding="utf-8"), str(path))
+    found = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            if name == "sleep":
+                found.append(f"{path.name}:{node.lineno}")
+    return found
+
+
+def test_main_has_no_sleep_calls():
+    # A sleep on the script thread holds the session's rerun and a server thread for its whole
+    # duration; timers belong in the browser or in st.fragment(run_every=...)
+    assert sleep_calls(REPO_ROOT / "main.py") == []
+
+
+def test_script_runs_never_sleep(tmp_path):
+    pytest.importorskip("streamlit.testing.v1")
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_KEY": "test-key",
+        "FAKE_GEMINI_LATENCY": "0.01",
+        "ANSWER_CACHE_DB": ":memory:",
+        "SEMANTIC_CACHE_INDEX": "",
+        "METRICS_PROM_FILE": "",
+        "PREFETCH_CALLS_PER_HOUR": "0",
+        "COMMAND_HISTORY_DB": str(tmp_path / "history.db"),
+        "SHARED_STATE_DB": str(tmp_path / "shared_state.db"),
+    })
+    result = subprocess.run([sys.executable, "-c", RUNTIME_SCRIPT], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, timeout=600)
+    assert result.returncode == 0, result.stderr
+    results = json.loads(result.stdout.strip().splitlines()[-1])
+    # Background threads (collectors, replay workers) may sleep; the script thread may not
+    assert {r["label"]: r["sleeps"] for r in results if r["sleeps"]} == {}
+    assert {r["label"]: r["exceptions"] for r in results if r["exceptions"]} == {}
+    assert len(results) == 7
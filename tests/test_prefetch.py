@@ -0,0 +1,52 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+pytest.importorskip("streamlit.testing.v1")
+
+# The app with the fake model, rerun until the sidebar's prefetches have been fetched
+APP_SCRIPT = """
+import sys, time
+sys.path.insert(0, "benchmarks")
+import fake_gemini
+from streamlit.testing.v1 import AppTest
+
+fake_gemini.install(latency=0.01)
+at = AppTest.from_file("main.py", default_timeout=120)
+at.run()
+deadline = time.monotonic() + 60
+while time.monotonic() < deadline:
+    at.run()
+    caption = next(c.value for c in at.caption if "answers prefetched" in c.value)
+    if " 0 queued" in caption:
+        break
+    time.sleep(0.2)
+print(caption)
+"""
+
+
+def test_prefetch_thread_runs_without_script_context(tmp_path):
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_KEY": "test-key",
+        "ANSWER_CACHE_DB": ":memory:",
+        "SEMANTIC_CACHE_INDEX": "",
+        "METRICS_PROM_FILE": "",
+        "PREFETCH_CALLS_PER_HOUR": "100",
+        "COMMAND_HISTORY_DB": str(tmp_path / "history.db"),
+        "SHARED_STATE_DB": str(tmp_path / "shared_state.db"),
+    })
+    result = subprocess.run([sys.executable, "-c", APP_SCRIPT], cwd=REPO_ROOT, env=env, capture_output=True,
+                            text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    fetched = int(re.search(r"(\d+) answers prefetched", result.stdout).group(1))
+    assert fetched > 0
+    # Streamlit warns when a thread it doesn't manage touches st.cache_resource; AppTest's own
+    # main thread always has the warning
+    assert not re.search(r"Thread '(?!MainThread')[^']*': missing ScriptRunContext", result.stderr)
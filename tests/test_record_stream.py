@@ -0,0 +1,128 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from record_stream import iter_records, page_records  # noqa: E402
+
+CSV = (
+    '#TYPE Selected.Microsoft.ActiveDirectory.Management.ADUser\r\n'
+    '"Name","Department","Description"\r\n'
+    '"Ann Lee","Finance","Payroll, EMEA"\r\n'
+    '"Bob Ray","Engineering","Two\r\nlines"\r\n'
+    '"Cy Oh","Engineering","Form\x0cfeed and line separator"\r\n'
+)
+
+CSV_RECORDS = [
+    {"Name": "Ann Lee", "Department": "Finance", "Description": "Payroll, EMEA"},
+    {"Name": "Bob Ray", "Department": "Engineering", "Description": "Two\r\nlines"},
+    {"Name": "Cy Oh", "Department": "Engineering", "Description": "Form\x0cfeed and line separator"},
+]
+
+# Windows PowerShell 5.1's ConvertTo-Json, indented, with its escaped date format
+JSON_ARRAY = """[
+    {
+        "Name":  "Ann Lee",
+        "Enabled":  true,
+        "LastLogonDate":  "\\/Date(1700000000000)\\/",
+        "MemberOf":  ["CN=Staff", "CN=Finance"]
+    },
+    {
+        "Name":  "Bob Ray",
+        "Enabled":  false,
+        "LastLogonDate":  null,
+        "Manager":  {"Name": "Ann Lee"}
+    }
+]
+"""
+
+JSON_RECORDS = [
+    {"Name": "Ann Lee", "Enabled": True, "LastLogonDate": "2023-11-14 22:13:20",
+     "MemberOf": '["CN=Staff","CN=Finance"]'},
+    {"Name": "Bob Ray", "Enabled": False, "LastLogonDate": None, "Manager": '{"Name":"Ann Lee"}'},
+]
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10000])
+def test_csv_across_chunk_sizes(size):
+    assert list(iter_records(chunked(CSV, size))) == CSV_RECORDS
+
+
+def test_csv_only_splits_lines_at_newlines():
+    text = "Name,Description\r\na,x\x0cy\x1cz\x85w\r\n"
+    assert list(iter_records(text, "csv")) == [{"Name": "a", "Description": "x\x0cy\x1cz\x85w"}]
+
+
+def test_csv_without_trailing_newline():
+    assert list(iter_records("Name\nAnn\nBob", "csv")) == [{"Name": "Ann"}, {"Name": "Bob"}]
+
+
+@pytest.mark.parametrize("size", [1, 5, 17, 64, 10000])
+def test_json_array_across_chunk_sizes(size):
+    assert list(iter_records(chunked(JSON_ARRAY, size))) == JSON_RECORDS
+
+
+def test_json_one_object_per_line():
+    lines = "".join(json.dumps(record) + "\n" for record in ({"Name": "Ann"}, {"Name": "Bob"}))
+    assert list(iter_records(chunked(lines, 4))) == [{"Name": "Ann"}, {"Name": "Bob"}]
+
+
+def test_json_single_object():
+    assert list(iter_records('  {"Name": "Ann"}')) == [{"Name": "Ann"}]
+
+
+def test_json_date_out_of_range_is_kept():
+    stamp = "9" * 30
+    text = '{"When": "\\/Date(%s)\\/"}' % stamp
+    assert list(iter_records(text)) == [{"When": f"/Date({stamp})/"}]
+
+
+@pytest.mark.parametrize("text, message", [
+    ('[{"Name": "Ann"}, {"Name": ', "Invalid JSON"),
+    ('[{"Name": "Ann"}, 42]', "Expected JSON objects"),
+])
+def test_bad_json_raises(text, message):
+    with pytest.raises(ValueError, match=message):
+        list(iter_records(chunked(text, 3)))
+
+
+def test_file_objects_are_read_in_chunks(tmp_path):
+    path = tmp_path / "users.csv"
+    path.write_text(CSV, encoding="utf-8", newline="")
+    with path.open(encoding="utf-8", newline="") as f:
+        assert list(iter_records(f, chunk_size=8)) == CSV_RECORDS
+
+
+def test_format_is_detected_after_leading_blanks():
+    assert list(iter_records(["", "  \n", '[{"Name": "Ann"}]'])) == [{"Name": "Ann"}]
+    with pytest.raises(ValueError, match="Unknown record format"):
+        iter_records("Name\nAnn\n", "xml")
+
+
+def users(count):
+    return ({"Name": f"User {i}", "Department": "Engineering" if i % 3 == 0 else "Sales"} for i in range(count))
+
+
+def test_page_records_filters_and_pages():
+    page = page_records(users(100), {"Department": "ENG"}, page=1, page_size=10)
+    assert page["total"] == 100 and page["matched"] == 34 and page["pages"] == 4
+    assert [row["Name"] for row in page["rows"]] == [f"User {i}" for i in range(30, 60, 3)]
+    assert page["columns"] == ["Name", "Department"]
+
+
+def test_page_past_the_end_shows_the_last_page():
+    page = page_records(users(100), {"Department": "eng"}, page=99, page_size=10)
+    assert page["page"] == 3
+    assert [row["Name"] for row in page["rows"]] == ["User 90", "User 93", "User 96", "User 99"]
+
+
+def test_no_matches_is_one_empty_page():
+    page = page_records(users(10), {"Name": "nobody"})
+    assert page["rows"] == [] and page["pages"] == 1 and page["page"] == 0 and page["matched"] == 0
@@ -0,0 +1,110 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from remote_exec import FakeTransport, SessionPool, fan_out, parse_hosts  # noqa: E402
+
+COMMAND = "Get-Service -Name WinRM"
+TIMEOUT = 0.3
+
+
+@pytest.fixture
+def release():
+    # Hung hosts wait on this instead of sleeping, so they can be let go when the test ends
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def run(hosts, pool, **kwargs):
+    started = time.monotonic()
+    results = list(fan_out(hosts, COMMAND, pool, **kwargs))
+    return results, time.monotonic() - started
+
+
+def test_parse_hosts():
+    hosts, invalid = parse_hosts("web01, web02;WEB01\n# comment\ndb01.corp.example.com  bad_host! # old\n\n")
+    assert hosts == ["web01", "web02", "db01.corp.example.com"]
+    assert invalid == ["bad_host!"]
+
+
+def test_every_host_gets_one_result_with_its_status(release):
+    transport = FakeTransport(min_latency=0.01, max_latency=0.05, failing_hosts={"bad"}, hanging_hosts={"hung"},
+                              unreachable_hosts={"gone"}, hang_seconds=60, sleep=release.wait)
+    results, elapsed = run(["web01", "bad", "hung", "gone", "web02"], SessionPool(transport), timeout=TIMEOUT)
+
+    by_host = {result["host"]: result for result in results}
+    assert len(results) == 5
+    assert {host: result["status"] for host, result in by_host.items()} == {
+        "web01": "ok", "bad": "failed", "hung": "timeout", "gone": "error", "web02": "ok"}
+    assert by_host["bad"]["exit_code"] == 1 and "Access is denied" in by_host["bad"]["stderr"]
+    assert "web01: Get-Service" in by_host["web01"]["stdout"]
+    assert "Could not connect" in by_host["gone"]["error"]
+    # The hung host doesn't hold up the rest, and the run ends soon after its timeout
+    assert results[-1]["host"] == "hung"
+    assert TIMEOUT <= by_host["hung"]["elapsed"] < TIMEOUT + 0.5
+    assert elapsed < TIMEOUT + 1.0
+
+
+def test_results_arrive_fastest_first():
+    transport = FakeTransport(min_latency=0.01, max_latency=0.2)
+    hosts = [f"host{i:02d}" for i in range(12)]
+    results, _ = run(hosts, SessionPool(transport), max_workers=len(hosts), timeout=5)
+    latencies = [transport.latency(result["host"]) for result in results]
+    assert all(b >= a - 0.02 for a, b in zip(latencies, latencies[1:]))
+
+
+def test_timeout_starts_when_a_worker_picks_the_host_up():
+    # Together the hosts take far longer than the timeout, but each one alone fits in it
+    transport = FakeTransport(min_latency=TIMEOUT * 0.5, max_latency=TIMEOUT * 0.5)
+    results, elapsed = run([f"queued{i}" for i in range(6)], SessionPool(transport), max_workers=2,
+                           timeout=TIMEOUT)
+    assert [result["status"] for result in results] == ["ok"] * 6
+    assert elapsed > TIMEOUT
+
+
+def test_sessions_are_reused_unless_discarded(release):
+    transport = FakeTransport(min_latency=0.01, max_latency=0.02, hanging_hosts={"hung"}, unreachable_hosts={"gone"},
+                              hang_seconds=60, sleep=release.wait)
+    pool = SessionPool(transport)
+    hosts = ["web01", "web02", "hung", "gone"]
+    run(hosts, pool, timeout=TIMEOUT)
+    connects = transport.connects
+
+    run(hosts, pool, timeout=TIMEOUT)
+    # Only the timed-out and unreachable hosts connect again
+    assert transport.connects - connects == 2
+    assert pool.stats()["reused"] == 2
+
+
+def test_pool_discards_sessions_that_raise():
+    class BrokenTransport(FakeTransport):
+        def run(self, session, command):
+            raise ConnectionResetError("reset by peer")
+
+    pool = SessionPool(BrokenTransport())
+    with pytest.raises(ConnectionResetError):
+        pool.run("web01", COMMAND)
+    assert pool.stats() == {"created": 1, "reused": 0, "discarded": 1, "idle": 0}
+
+
+def test_idle_sessions_per_host_are_capped():
+    pool = SessionPool(FakeTransport(), max_idle_per_host=1)
+    first, second = pool.acquire("web01"), pool.acquire("web01")
+    pool.release("web01", first)
+    pool.release("web01", second)
+    assert pool.stats()["idle"] == 1
+
+
+def test_stopping_early_cancels_queued_hosts():
+    transport = FakeTransport(min_latency=0.05, max_latency=0.05)
+    results = fan_out([f"host{i}" for i in range(20)], COMMAND, SessionPool(transport), max_workers=2, timeout=5)
+    next(results)
+    results.close()
+    time.sleep(0.2)
+    assert transport.connects < 20
@@ -0,0 +1,127 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from response_parser import StreamingResponseParser, parse_streamed_response  # noqa: E402
+
+EMPTY = {"command": "", "explanation": "", "security_note": "", "alternatives": ""}
+
+LABELLED = (
+    "[Command]\n"
+    "ipconfig /flushdns\n"
+    "\n"
+    "[Explanation]\n"
+    "Clears the DNS resolver cache.\n"
+    "\n"
+    "[Security Note]\n"
+    "Needs an elevated prompt.\n"
+    "\n"
+    "[Alternatives]\n"
+    "Clear-DnsClientCache\n"
+)
+
+LABELLED_SECTIONS = {
+    "command": "ipconfig /flushdns",
+    "explanation": "Clears the DNS resolver cache.",
+    "security_note": "Needs an elevated prompt.",
+    "alternatives": "Clear-DnsClientCache",
+}
+
+FENCED = (
+    "Command:\n"
+    "```powershell\n"
+    "Get-Service |\n"
+    "  Where-Object Status -eq Running\n"
+    "Explanation: not a header inside the code block\n"
+    "```\n"
+    "Explanation: Lists the running services.\n"
+)
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_labelled_layout():
+    assert parse_streamed_response([LABELLED]) == LABELLED_SECTIONS
+
+
+def test_labelled_layout_inline_markdown_headers():
+    text = "**Command:** `netstat -ano`\n**Explanation:** Shows open connections.\n### Security Note\nNone.\n"
+    assert parse_streamed_response([text]) == {
+        "command": "netstat -ano",
+        "explanation": "Shows open connections.",
+        "security_note": "None.",
+        "alternatives": "",
+    }
+
+
+def test_positional_layout():
+    text = "ipconfig /flushdns\nClears the DNS resolver cache.\nRun it from an elevated prompt.\n"
+    assert parse_streamed_response(chunked(text, 4)) == {
+        "command": "ipconfig /flushdns",
+        "explanation": "Clears the DNS resolver cache.\nRun it from an elevated prompt.",
+        "security_note": "",
+        "alternatives": "",
+    }
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_headers_split_across_chunks(size):
+    assert parse_streamed_response(chunked(LABELLED, size)) == LABELLED_SECTIONS
+
+
+def test_partial_header_is_held_back():
+    parser = StreamingResponseParser()
+    parser.feed("[Com")
+    assert parser.snapshot() == EMPTY
+    parser.feed("mand]\nipcon")
+    assert parser.snapshot()["command"] == "ipcon"
+    parser.feed("fig /all\n[Expl")
+    assert parser.snapshot() == dict(EMPTY, command="ipconfig /all")
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_code_fence_split_across_chunks(size):
+    assert parse_streamed_response(chunked(FENCED, size)) == {
+        "command": "Get-Service |\n  Where-Object Status -eq Running\nExplanation: not a header inside the code block",
+        "explanation": "Lists the running services.",
+        "security_note": "",
+        "alternatives": "",
+    }
+
+
+def test_open_code_fence_mid_stream():
+    parser = StreamingResponseParser()
+    parser.feed("Command:\n``")
+    parser.feed("`\nGet-Pro")
+    assert parser.snapshot()["command"] == "Get-Pro"
+    parser.feed("cess | Sort-Object CPU\n")
+    assert parser.snapshot()["command"] == "Get-Process | Sort-Object CPU"
+
+
+@pytest.mark.parametrize("chunks", [[], [""], ["", "", ""], ["\n\n  \n"]])
+def test_empty_stream(chunks):
+    assert parse_streamed_response(chunks) == EMPTY
+
+
+def test_partial_stream_without_newline():
+    parser = StreamingResponseParser()
+    assert parser.feed("ipconfig /all\nShows") == ["command"]
+    assert parser.snapshot() == dict(EMPTY, command="ipconfig /all", explanation="Shows")
+    # A reply cut off mid-line keeps what arrived
+    assert parser.close() == dict(EMPTY, command="ipconfig /all", explanation="Shows")
+
+
+def test_stream_cut_off_after_header():
+    assert parse_streamed_response(["[Command]\nping 8.8.8.8\n[Explanation]\n"]) == dict(EMPTY, command="ping 8.8.8.8")
+
+
+def test_feed_reports_updated_sections():
+    parser = StreamingResponseParser()
+    assert parser.feed("[Command]\n") == []
+    assert parser.feed("ipconfig /flushdns\n[Explanation]\nClears") == ["command"]
+    assert parser.feed(" the cache.\nSecurity Note: none\n") == ["explanation", "security_note"]
@@ -0,0 +1,67 @@
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from semantic_cache import SemanticCache  # noqa: E402
+
+FLUSH = {"command": "ipconfig /flushdns", "explanation": "Clears the DNS resolver cache."}
+SERVICES = {"command": "net start", "explanation": "Lists running services."}
+
+
+def test_paraphrase_is_served():
+    cache = SemanticCache(path=None)
+    cache.add("how do I flush dns", FLUSH)
+    assert cache.lookup("flush dns please")["response"] == FLUSH
+
+
+@pytest.mark.parametrize("question", ["check disk D:", "how do I clear dns"])
+def test_different_parameters_or_scope_miss(question):
+    cache = SemanticCache(path=None)
+    cache.add("check disk C:", {"command": "chkdsk C:"})
+    cache.add("how do I flush dns", FLUSH, scope="structured")
+    assert cache.lookup(question) is None
+
+
+def test_processes_sharing_a_file_keep_each_others_questions(tmp_path):
+    path = tmp_path / "index.npz"
+    first = SemanticCache(path, save_every=1)
+    second = SemanticCache(path, save_every=1)
+    first.add("how do I flush dns", FLUSH)
+    # Saved after the first process, without having read its question
+    second.add("list running services", SERVICES)
+
+    reloaded = SemanticCache(path)
+    assert len(reloaded) == 2
+    assert reloaded.lookup("flush dns please")["response"] == FLUSH
+    assert reloaded.lookup("list the running services")["response"] == SERVICES
+    # Each save wrote a temporary file of its own and renamed it into place
+    assert [p.name for p in tmp_path.iterdir()] == ["index.npz"]
+
+
+@pytest.mark.parametrize("content", [b"", b"PK\x03\x04truncated", b"not an index at all"])
+def test_unreadable_index_starts_empty(tmp_path, caplog, content):
+    path = tmp_path / "index.npz"
+    path.write_bytes(content)
+    with caplog.at_level(logging.WARNING, logger="semantic_cache"):
+        cache = SemanticCache(path, save_every=1)
+    assert len(cache) == 0
+    assert "starting empty" in caplog.text
+
+    cache.add("how do I flush dns", FLUSH)
+    assert caplog.text.count("starting empty") == 1
+    assert len(SemanticCache(path)) == 1
+
+
+def test_failed_save_keeps_serving(tmp_path, caplog):
+    # A file where the index's directory should be makes every save fail
+    blocker = tmp_path / "blocked"
+    blocker.write_text("", encoding="utf-8")
+    cache = SemanticCache(blocker / "index.npz", save_every=1)
+    with caplog.at_level(logging.WARNING, logger="semantic_cache"):
+        cache.add("how do I flush dns", FLUSH)
+    assert "Could not save" in caplog.text
+    assert cache.lookup("flush dns please")["response"] == FLUSH
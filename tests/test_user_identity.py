@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from history_store import HistoryStore  # noqa: E402
+from shared_state import SQLiteKV  # noqa: E402
+
+pytest.importorskip("streamlit.testing.v1")
+
+# Each app session runs in a fresh interpreter, so a reload can also land on another app process
+SESSION_SCRIPT = """
+import json, sys
+from streamlit.testing.v1 import AppTest
+
+uid, question = sys.argv[1], sys.argv[2]
+at = AppTest.from_file("main.py", default_timeout=120)
+if uid:
+    at.query_params["uid"] = uid
+at.run()
+if question:
+    at.text_input(key="question_input").set_value(question).run()
+    next(button for button in at.button if button.label == "⭐ Favorite").click().run()
+print(json.dumps({
+    "uid": at.query_params.get("uid"),
+    "user_id": at.session_state["user_id"],
+    "labels": [expander.label for expander in at.expander],
+    "exceptions": [str(e.value) for e in at.exception],
+}))
+"""
+
+
+@pytest.fixture
+def app_env(tmp_path):
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_KEY": "test-key",
+        "ANSWER_CACHE_DB": ":memory:",
+        "SEMANTIC_CACHE_INDEX": "",
+        "METRICS_PROM_FILE": "",
+        "PREFETCH_CALLS_PER_HOUR": "0",
+        "COMMAND_HISTORY_DB": str(tmp_path / "history.db"),
+        "SHARED_STATE_DB": str(tmp_path / "shared_state.db"),
+    })
+    return env
+
+
+def run_session(env, uid="", question=""):
+    result = subprocess.run([sys.executable, "-c", SESSION_SCRIPT, uid, question], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    session = json.loads(result.stdout.strip().splitlines()[-1])
+    assert session["exceptions"] == []
+    return session
+
+
+def has_favorite(session, command):
+    return any(label.startswith(f"⭐ {command}") for label in session["labels"])
+
+
+def has_history(session, command):
+    return any(f" - {command}" in label for label in session["labels"])
+
+
+def test_reload_keeps_history_and_favorites(app_env):
+    # "flush dns" is answered from the built-in aliases, so no model is needed
+    first = run_session(app_env, question="flush dns")
+    assert len(first["uid"]) == 32 and first["user_id"] == f"anon:{first['uid']}"
+    assert has_favorite(first, "ipconfig /flushdns")
+
+    reloaded = run_session(app_env, uid=first["uid"])
+    assert reloaded["user_id"] == first["user_id"]
+    assert has_favorite(reloaded, "ipconfig /flushdns")
+    assert has_history(reloaded, "ipconfig /flushdns")
+
+    other = run_session(app_env)
+    assert other["uid"] != first["uid"]
+    assert not has_favorite(other, "ipconfig /flushdns")
+    assert not has_history(other, "ipconfig /flushdns")
+
+
+def test_stale_anonymous_users_are_pruned(app_env):
+    history = HistoryStore(app_env["COMMAND_HISTORY_DB"])
+    kv = SQLiteKV(app_env["SHARED_STATE_DB"])
+    stale, recent = "anon:" + "a" * 32, "anon:" + "b" * 32
+    kv.write_many("anonymous_users", {stale: time.time() - 31 * 86400, recent: time.time()})
+    for user_id in (stale, recent, "session:0123"):
+        history.append("tracert example.com", "Lists the hops.", user_id=user_id)
+        kv.write_many(f"favorites:{user_id}", {"tracert example.com": {"command": "tracert example.com"}})
+
+    run_session(app_env)
+
+    assert history.count(user_id=stale) == 0 and kv.count(f"favorites:{stale}") == 0
+    assert kv.get("anonymous_users", stale) is None
+    # Per-session ids from before ids were kept in the URL can't be reached again
+    assert history.count(user_id="session:0123") == 0 and kv.count("favorites:session:0123") == 0
+    assert history.count(user_id=recent) == 1 and kv.count(f"favorites:{recent}") == 1
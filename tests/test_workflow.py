@@ -0,0 +1,104 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from diagnostics import ReplayExecutor  # noqa: E402
+from workflow import build_summary_prompt, run_workflow, step_dependencies, validate_workflow  # noqa: E402
+
+CONNECTIVITY = [
+    {"id": "ping", "command": "ping -n 4 gateway", "description": "Ping the gateway", "stop_if": "timeout"},
+    {"id": "ipconfig", "command": "ipconfig /all", "description": "Show IP configuration"},
+    {"id": "tracert", "command": "tracert example.com", "description": "Trace the route",
+     "when": {"ping": "failed"}},
+    {"id": "dns", "command": "nslookup example.com", "description": "Look up a name", "after": ["ipconfig"]},
+    {"id": "report", "command": "netstat -s", "description": "Protocol statistics",
+     "after": ["dns", "tracert"], "when": {"dns": ["ok", "failed"]}},
+]
+
+
+def replay(ping_exit_code=0, ping_duration=1.0):
+    recordings = {
+        "ping -n 4 gateway": {"output": "Reply from 10.0.0.1\n", "exit_code": ping_exit_code,
+                              "duration": ping_duration},
+        "nslookup example.com": {"output": "Address: 93.184.216.34\n", "exit_code": 0, "duration": 0.5},
+    }
+    # Replayed durations are only counted, not waited for
+    return ReplayExecutor(recordings, sleep=lambda seconds: None)
+
+
+def run(steps, executor, **kwargs):
+    events = list(run_workflow(steps, executor, **kwargs))
+    results = {step_id: payload for kind, step_id, payload in events if kind == "done"}
+    return events, results
+
+
+def test_steps_start_after_their_dependencies():
+    events, results = run(CONNECTIVITY, replay(ping_exit_code=1), timeout=10)
+    position = {}
+    for i, (kind, step_id, _) in enumerate(events):
+        position.setdefault((kind, step_id), i)
+    for step in CONNECTIVITY:
+        for dependency in step_dependencies(step):
+            assert position[("done", dependency)] < position[("start", step["id"])]
+    assert {step_id: result["status"] for step_id, result in results.items()} == {
+        "ping": "failed", "ipconfig": "ok", "tracert": "ok", "dns": "ok", "report": "ok"}
+    assert [kind for kind, step_id, _ in events].count("done") == len(CONNECTIVITY)
+
+
+def test_when_skips_steps_whose_condition_fails():
+    events, results = run(CONNECTIVITY, replay(ping_exit_code=0), timeout=10)
+    assert results["tracert"]["status"] == "skipped"
+    assert results["tracert"]["error"] == "Only runs when ping is failed"
+    assert ("start", "tracert", None) not in events
+    # A skipped dependency still counts as finished
+    assert results["report"]["status"] == "ok"
+
+
+def test_stop_if_ends_the_workflow():
+    # Ping's replay outlasts the timeout, which the first step treats as decisive
+    _, results = run(CONNECTIVITY[:1] + [dict(step, after=["ping"]) for step in CONNECTIVITY[1:]],
+                     replay(ping_duration=60), timeout=5)
+    assert results["ping"]["status"] == "timeout"
+    for step_id in ("ipconfig", "tracert", "dns", "report"):
+        assert results[step_id]["status"] == "skipped"
+        assert results[step_id]["error"] == "Stopped after ping timeout"
+
+
+def test_independent_steps_run_side_by_side():
+    # Each step waits for all the others to start, which only works if they run at once
+    barrier = threading.Barrier(4, timeout=5)
+
+    class BarrierExecutor:
+        def run(self, command, emit, timeout, max_output_bytes):
+            barrier.wait()
+            return {"exit_code": 0, "output": "", "timed_out": False, "truncated": False}
+
+    steps = [{"id": f"step{i}", "command": f"echo {i}", "description": ""} for i in range(4)]
+    _, results = run(steps, BarrierExecutor(), max_workers=4)
+    assert all(result["status"] == "ok" for result in results.values())
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([{"id": "a", "command": "x"}, {"id": "a", "command": "y"}], "unique"),
+    ([{"id": "a", "command": "x", "after": ["missing"]}], "unknown steps: missing"),
+    ([{"id": "a", "command": "x", "after": ["b"]}, {"id": "b", "command": "y", "when": {"a": "ok"}}],
+     "dependency cycle"),
+    ([{"id": "a", "command": "x", "after": ["a"]}], "dependency cycle through a"),
+])
+def test_invalid_workflows_are_rejected(steps, message):
+    with pytest.raises(ValueError, match=message):
+        validate_workflow(steps)
+    with pytest.raises(ValueError, match=message):
+        next(run_workflow(steps, replay()))
+
+
+def test_summary_prompt_leaves_out_skipped_steps():
+    _, results = run(CONNECTIVITY, replay(ping_exit_code=0), timeout=10)
+    prompt = build_summary_prompt("No internet access", CONNECTIVITY, results)
+    assert "## Ping the gateway (ping -n 4 gateway) - ok" in prompt
+    assert "Trace the route" not in prompt
+    assert "Address: 93.184.216.34" in prompt
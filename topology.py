@@ -0,0 +1,401 @@
+import hashlib
+import ipaddress
+import math
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from html import escape
+
+# networkx is imported inside the functions that need it, like the rest of the app's heavy modules
+
+SPRING_LAYOUT_MAX_NODES = 200
+LAYOUT_CACHE_SIZE = 32
+
+ARP_INTERFACE_REGEX = re.compile(r"^Interface:\s*(\d+\.\d+\.\d+\.\d+)", re.IGNORECASE)
+ARP_ENTRY_REGEX = re.compile(
+    r"^\s*(\d+\.\d+\.\d+\.\d+)\s+([0-9a-f]{2}(?:[-:][0-9a-f]{2}){5})\s+(\w+)", re.IGNORECASE
+)
+IPV4_REGEX = re.compile(r"\b(\d+\.\d+\.\d+\.\d+)\b")
+PROPERTY_REGEX = re.compile(r"^(\w+)\s*:\s?(.*)$")
+
+NODE_STYLES = {
+    "internet": {"color": "#8e44ad", "radius": 16},
+    "gateway": {"color": "#e67e22", "radius": 12},
+    "subnet": {"color": "#2980b9", "radius": 10},
+    "local": {"color": "#27ae60", "radius": 10},
+    "dns": {"color": "#c0392b", "radius": 8},
+    "host": {"color": "#7f8c8d", "radius": 5},
+}
+
+# When one address shows up in several roles, the highest-ranked one wins
+KIND_RANK = {"host": 0, "dns": 1, "local": 2, "gateway": 3}
+
+
+def parse_arp(text):
+    """Parses `arp -a` output into [{"interface", "ip", "mac", "type"}]."""
+    entries = []
+    interface = None
+    for line in text.splitlines():
+        match = ARP_INTERFACE_REGEX.match(line.strip())
+        if match:
+            interface = match.group(1)
+            continue
+        match = ARP_ENTRY_REGEX.match(line)
+        if match:
+            ip, mac, kind = match.groups()
+            entries.append({"interface": interface, "ip": ip, "mac": mac.lower().replace(":", "-"), "type": kind.lower()})
+    return entries
+
+
+def parse_powershell_output(text):
+    """Parses PowerShell table or list (Format-List) output into a list of dicts."""
+    lines = [line.rstrip() for line in text.splitlines()]
+    # Table output has a header row followed by a row of dashes
+    for i in range(1, len(lines)):
+        if lines[i].strip() and set(lines[i].replace(" ", "")) == {"-"}:
+            return _parse_table(lines[i - 1], lines[i], lines[i + 1:])
+    return _parse_list(lines)
+
+
+def _parse_table(header, rule, rows):
+    # Column boundaries come from the dash runs, which line up with the headers
+    spans = [(m.start(), m.end()) for m in re.finditer(r"-+", rule)]
+    names = [header[start:end + 1].strip() or header.split()[i] for i, (start, end) in enumerate(spans)]
+    records = []
+    for row in rows:
+        if not row.strip():
+            continue
+        values = row.split()
+        if len(values) == len(names):
+            records.append(dict(zip(names, values)))
+            continue
+        record = {}
+        for i, (name, (start, _)) in enumerate(zip(names, spans)):
+            end = spans[i + 1][0] if i + 1 < len(spans) else len(row)
+            record[name] = row[start:end].strip()
+        records.append(record)
+    return records
+
+
+def _parse_list(lines):
+    records = []
+    record = {}
+    key = None
+    for line in lines:
+        if not line.strip():
+            if record:
+                records.append(record)
+            record, key = {}, None
+            continue
+        match = PROPERTY_REGEX.match(line.strip()) if not line.startswith(" " * 8) else None
+        if match:
+            key, value = match.group(1), match.group(2).strip()
+            record[key] = value
+        elif key is not None:
+            # Continuation lines hold extra values, e.g. a second DNS server
+            record[key] = f"{record[key]} {line.strip()}".strip()
+    if record:
+        records.append(record)
+    return records
+
+
+def parse_routes(text):
+    """Parses Get-NetRoute output into [{"prefix", "next_hop", "metric"}]."""
+    routes = []
+    for record in parse_powershell_output(text):
+        prefix = record.get("DestinationPrefix")
+        if not prefix:
+            continue
+        try:
+            network = ipaddress.ip_network(prefix, strict=False)
+        except ValueError:
+            continue
+        if network.version != 4:
+            continue
+        routes.append({
+            "prefix": str(network),
+            "next_hop": record.get("NextHop", "0.0.0.0"),
+            "metric": record.get("RouteMetric", ""),
+        })
+    return routes
+
+
+def parse_ip_configuration(text):
+    """Parses Get-NetIPConfiguration output into [{"alias", "addresses", "gateways", "dns"}]."""
+    configs = []
+    for record in parse_powershell_output(text):
+        addresses = IPV4_REGEX.findall(record.get("IPv4Address", ""))
+        if not addresses:
+            continue
+        configs.append({
+            "alias": record.get("InterfaceAlias", ""),
+            "addresses": addresses,
+            "gateways": IPV4_REGEX.findall(record.get("IPv4DefaultGateway", "")),
+            "dns": IPV4_REGEX.findall(record.get("DNSServer", "")),
+        })
+    return configs
+
+
+def detect_output_kind(text):
+    # Uploaded files can be any of the three; tell them apart by their headers
+    if "Internet Address" in text and "Physical Address" in text:
+        return "arp"
+    if "DestinationPrefix" in text:
+        return "routes"
+    if "IPv4Address" in text or "InterfaceAlias" in text:
+        return "ip_configuration"
+    return None
+
+
+def _is_host_address(address):
+    ip = ipaddress.ip_address(address)
+    return not (ip.is_multicast or ip.is_loopback or ip.is_unspecified or address.endswith(".255"))
+
+
+def build_topology(arp_entries=(), routes=(), ip_configs=()):
+    """Builds an nx.Graph of hosts, gateways and subnets.
+
+    Nodes carry a "kind" attribute: internet, gateway, subnet, local (this
+    machine's addresses), dns or host. Hosts hang off the most specific
+    subnet containing them; gateways link their subnet to whatever the route
+    reaches, with the default route leading to "Internet".
+    """
+    import networkx as nx
+
+    G = nx.Graph()
+    # prefix length -> {network address as int: node name}, for longest-prefix lookups
+    subnets = defaultdict(dict)
+
+    def add_subnet(prefix):
+        network = ipaddress.ip_network(prefix, strict=False)
+        if network.prefixlen in (0, 32) or network.is_multicast or network.is_loopback:
+            return None
+        if not G.has_node(str(network)):
+            G.add_node(str(network), kind="subnet", label=str(network))
+            subnets[network.prefixlen][int(network.network_address)] = str(network)
+        return str(network)
+
+    def add_internet():
+        G.add_node("Internet", kind="internet", label="Internet")
+        return "Internet"
+
+    def subnet_for(address, fallback_prefix=24):
+        ip = ipaddress.ip_address(address)
+        for prefixlen in sorted(subnets, reverse=True):
+            mask = (0xFFFFFFFF << (32 - prefixlen)) & 0xFFFFFFFF
+            subnet = subnets[prefixlen].get(int(ip) & mask)
+            if subnet:
+                return subnet
+        if not ip.is_private:
+            # Public servers, e.g. 8.8.8.8 as a DNS server, are reached through the Internet
+            return add_internet()
+        return add_subnet(f"{address}/{fallback_prefix}")
+
+    def add_address(address, kind, **attrs):
+        if G.has_node(address):
+            if KIND_RANK[kind] > KIND_RANK[G.nodes[address]["kind"]]:
+                # An address seen both as a plain host and as a gateway is a gateway
+                G.nodes[address]["kind"] = kind
+            G.nodes[address].update(attrs)
+            return
+        G.add_node(address, kind=kind, label=address, **attrs)
+        subnet = subnet_for(address)
+        if subnet:
+            G.add_edge(address, subnet)
+
+    for route in routes:
+        add_subnet(route["prefix"])
+    for config in ip_configs:
+        for address in config["addresses"]:
+            add_address(address, "local", alias=config["alias"])
+        for gateway in config["gateways"]:
+            add_address(gateway, "gateway")
+            G.add_edge(gateway, add_internet())
+        for server in config["dns"]:
+            if _is_host_address(server) and server not in config["gateways"]:
+                add_address(server, "dns")
+    for route in routes:
+        hop = route["next_hop"]
+        if hop in ("0.0.0.0", "") or not IPV4_REGEX.fullmatch(hop):
+            continue
+        add_address(hop, "gateway")
+        if route["prefix"] == "0.0.0.0/0":
+            G.add_edge(hop, add_internet())
+        elif G.has_node(route["prefix"]):
+            G.add_edge(hop, route["prefix"])
+    for entry in arp_entries:
+        if entry["interface"] and not G.has_node(entry["interface"]):
+            add_address(entry["interface"], "local")
+        if entry["type"] == "dynamic" and _is_host_address(entry["ip"]):
+            if G.has_node(entry["ip"]):
+                G.nodes[entry["ip"]]["mac"] = entry["mac"]
+            else:
+                add_address(entry["ip"], "host", mac=entry["mac"])
+    return G
+
+
+def graph_fingerprint(G):
+    digest = hashlib.sha1()
+    for node in sorted(G.nodes):
+        digest.update(f"n{node}\0{G.nodes[node].get('kind')}\n".encode("utf-8"))
+    for edge in sorted(tuple(sorted(edge)) for edge in G.edges):
+        digest.update(f"e{edge[0]}\0{edge[1]}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _address_key(node):
+    try:
+        return (0, int(ipaddress.ip_address(node)))
+    except ValueError:
+        try:
+            return (1, int(ipaddress.ip_network(node).network_address))
+        except ValueError:
+            return (2, node)
+
+
+def hierarchical_layout(G):
+    """O(n) layout: subnets on a ring, each subnet's members on a sunflower spiral around it.
+
+    Members are placed in address order, so adding a host only moves hosts
+    that sort after it within its own subnet.
+    """
+    subnets = sorted((n for n, d in G.nodes(data=True) if d["kind"] == "subnet"), key=_address_key)
+    pos = {}
+    ring = max(1.0, len(subnets) / math.pi) * 3.0
+    for i, subnet in enumerate(subnets):
+        angle = 2 * math.pi * i / max(1, len(subnets))
+        pos[subnet] = (ring * math.cos(angle), ring * math.sin(angle))
+
+    golden_angle = math.pi * (3 - math.sqrt(5))
+    placed = set(pos)
+    for subnet in subnets:
+        cx, cy = pos[subnet]
+        members = sorted((n for n in G.neighbors(subnet) if G.nodes[n]["kind"] not in ("subnet", "internet")),
+                         key=_address_key)
+        members = [n for n in members if n not in placed]
+        for k, node in enumerate(members, 1):
+            radius = 0.35 * math.sqrt(k)
+            pos[node] = (cx + radius * math.cos(k * golden_angle), cy + radius * math.sin(k * golden_angle))
+            placed.add(node)
+
+    rest = [n for n in G.nodes if n not in placed]
+    for k, node in enumerate(sorted(rest, key=_address_key)):
+        neighbours = [pos[n] for n in G.neighbors(node) if n in pos]
+        if neighbours:
+            # Internet and stray gateways sit just outside whatever they connect to
+            x = sum(p[0] for p in neighbours) / len(neighbours)
+            y = sum(p[1] for p in neighbours) / len(neighbours)
+            scale = 1.0 + 1.5 / max(1.0, math.hypot(x, y))
+            pos[node] = (x * scale + 0.01 * k, y * scale + 1.0)
+        else:
+            pos[node] = (0.0, -ring - 2.0 - k * 0.5)
+    return pos
+
+
+class LayoutCache:
+    """Node positions keyed by graph fingerprint.
+
+    A graph that is not cached starts from the most recent layout. With the
+    spring layout, nodes it already placed stay fixed and only new nodes
+    move. Graphs too large for a spring layout use hierarchical_layout,
+    which keeps existing nodes in place by construction.
+    """
+
+    def __init__(self, max_entries=LAYOUT_CACHE_SIZE, spring_max_nodes=SPRING_LAYOUT_MAX_NODES):
+        self.max_entries = max_entries
+        self.spring_max_nodes = spring_max_nodes
+        self._layouts = OrderedDict()
+        self._last = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "incremental": 0, "full": 0}
+
+    def layout(self, G):
+        key = graph_fingerprint(G)
+        with self._lock:
+            if key in self._layouts:
+                self._layouts.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._layouts[key]
+            previous = self._last
+
+        if G.number_of_nodes() > self.spring_max_nodes:
+            pos = hierarchical_layout(G)
+            kind = "full"
+        else:
+            pos, kind = self._spring(G, previous)
+
+        with self._lock:
+            self.stats[kind] += 1
+            self._layouts[key] = pos
+            self._last = pos
+            while len(self._layouts) > self.max_entries:
+                self._layouts.popitem(last=False)
+        return pos
+
+    def _spring(self, G, previous):
+        import networkx as nx
+
+        known = [node for node in G.nodes if previous and node in previous]
+        if known and len(known) < G.number_of_nodes():
+            initial = {node: previous[node] for node in known}
+            pos = nx.spring_layout(G, pos=initial, fixed=known, seed=42, iterations=30)
+            return {node: tuple(float(v) for v in xy) for node, xy in pos.items()}, "incremental"
+        pos = nx.spring_layout(G, seed=42)
+        return {node: tuple(float(v) for v in xy) for node, xy in pos.items()}, "full"
+
+
+def render_svg(G, pos, width=900, height=700, labels=None):
+    """Draws the graph as an SVG string, with no rasterisation step.
+
+    Labels are drawn for every node in small graphs; in large ones only for
+    gateways, subnets and local addresses; every node keeps its details in a
+    <title> element for viewers that show them.
+    """
+    if not pos:
+        return f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}"></svg>'
+    labels = G.number_of_nodes() <= 60 if labels is None else labels
+    xs = [p[0] for p in pos.values()]
+    ys = [p[1] for p in pos.values()]
+    margin = 40
+    span_x = (max(xs) - min(xs)) or 1.0
+    span_y = (max(ys) - min(ys)) or 1.0
+    scale = min((width - 2 * margin) / span_x, (height - 2 * margin) / span_y)
+    min_x, min_y = min(xs), min(ys)
+
+    def project(node):
+        x, y = pos[node]
+        return margin + (x - min_x) * scale, height - margin - (y - min_y) * scale
+
+    points = {node: project(node) for node in G.nodes}
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="11">',
+        '<rect width="100%" height="100%" fill="#0e1117"/>',
+        '<g stroke="#555" stroke-width="1">',
+    ]
+    parts.extend(
+        f'<line x1="{points[a][0]:.1f}" y1="{points[a][1]:.1f}" x2="{points[b][0]:.1f}" y2="{points[b][1]:.1f}"/>'
+        for a, b in G.edges
+    )
+    parts.append("</g>")
+    for node, data in G.nodes(data=True):
+        style = NODE_STYLES.get(data.get("kind"), NODE_STYLES["host"])
+        x, y = points[node]
+        title = escape(" · ".join(str(v) for v in (data.get("label", node), data.get("alias"), data.get("mac")) if v))
+        parts.append(
+            f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{style["radius"]}" fill="{style["color"]}"><title>{title}</title></circle>'
+        )
+        if labels or data.get("kind") != "host":
+            parts.append(
+                f'<text x="{x + style["radius"] + 3:.1f}" y="{y + 4:.1f}" fill="#fafafa">'
+                f'{escape(str(data.get("label", node)))}</text>'
+            )
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def topology_summary(G):
+    counts = defaultdict(int)
+    for _, data in G.nodes(data=True):
+        counts[data.get("kind")] += 1
+    return dict(counts)
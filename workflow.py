@@ -0,0 +1,192 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from diagnostics import DEFAULT_MAX_OUTPUT_BYTES, DEFAULT_TIMEOUT, TIMEOUT_GRACE, run_command
+
+DEFAULT_MAX_WORKERS = 4
+# Each step's output is cut to this many characters in the summary prompt
+SUMMARY_OUTPUT_CHARS = 1500
+SUMMARY_MAX_OUTPUT_TOKENS = 512
+
+SUMMARY_PROMPT_TEMPLATE = """You are helping troubleshoot a Windows machine: {workflow}.
+These diagnostic steps were run, with their status and output:
+
+{steps}
+
+Summarize what the results show in a few sentences, name the most likely cause
+of the problem if there is one, and suggest the next command to run."""
+
+
+def _statuses(value):
+    return (value,) if isinstance(value, str) else tuple(value)
+
+
+def step_dependencies(step):
+    # A step waits for the steps it lists in "after" and for any step its condition refers to
+    return list(dict.fromkeys(list(step.get("after", ())) + list(step.get("when", {}))))
+
+
+def validate_workflow(steps):
+    """Raises ValueError for unknown or duplicate step ids and for dependency cycles."""
+    ids = [step["id"] for step in steps]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Workflow step ids must be unique")
+    known = set(ids)
+    for step in steps:
+        missing = [dependency for dependency in step_dependencies(step) if dependency not in known]
+        if missing:
+            raise ValueError(f"Step {step['id']} depends on unknown steps: {', '.join(missing)}")
+
+    visiting, done = set(), set()
+
+    def visit(step_id):
+        if step_id in done:
+            return
+        if step_id in visiting:
+            raise ValueError(f"Workflow has a dependency cycle through {step_id}")
+        visiting.add(step_id)
+        for dependency in step_dependencies(by_id[step_id]):
+            visit(dependency)
+        visiting.discard(step_id)
+        done.add(step_id)
+
+    by_id = {step["id"]: step for step in steps}
+    for step_id in ids:
+        visit(step_id)
+
+
+def _skipped(step, host, reason):
+    return {
+        "name": step["id"],
+        "host": host,
+        "command": step["command"],
+        "status": "skipped",
+        "exit_code": None,
+        "elapsed": 0.0,
+        "output": "",
+        "truncated": False,
+        "error": reason,
+        "cached": False,
+    }
+
+
+def run_workflow(steps, executor, host="localhost", max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT,
+                 max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES, clock=time.monotonic):
+    """Runs a workflow's steps as a dependency graph, yielding events as they happen.
+
+    A step is a dict with "id", "command" and "description", plus optional
+    "after" (ids it waits for), "when" ({id: status or statuses} that must all
+    hold for it to run) and "stop_if" (statuses of this step that end the
+    workflow). Steps whose dependencies have finished run concurrently.
+
+    Events are ("start", id, None), ("output", id, text) and ("done", id,
+    result), where result is a diagnostics result with the step's elapsed
+    time. Steps that don't run get a "done" result with status "skipped".
+    When a decisive step stops the workflow, steps already running finish
+    but no new ones start.
+    """
+    validate_workflow(steps)
+    by_id = {step["id"]: step for step in steps}
+    results = {}
+    waiting = [step["id"] for step in steps]
+    running = {}
+    stopped_by = None
+    events = queue.Queue()
+    lock = threading.Lock()
+
+    def run_step(step):
+        with lock:
+            running[step["id"]] = clock()
+        events.put(("start", step["id"], None))
+        result = run_command(executor, step["id"], step["command"],
+                             lambda text: events.put(("output", step["id"], text)),
+                             host=host, timeout=timeout, max_output_bytes=max_output_bytes, clock=clock)
+        events.put(("done", step["id"], result))
+
+    def ready():
+        # Resolves every waiting step whose dependencies have finished: skip it or start it
+        progress = True
+        while progress:
+            progress = False
+            for step_id in list(waiting):
+                step = by_id[step_id]
+                if stopped_by is not None:
+                    reason = f"Stopped after {stopped_by} {results[stopped_by]['status']}"
+                elif any(dependency not in results for dependency in step_dependencies(step)):
+                    continue
+                else:
+                    reason = None
+                    for dependency, statuses in step.get("when", {}).items():
+                        if results[dependency]["status"] not in _statuses(statuses):
+                            reason = f"Only runs when {dependency} is {' or '.join(_statuses(statuses))}"
+                            break
+                waiting.remove(step_id)
+                progress = True
+                if reason:
+                    results[step_id] = _skipped(step, host, reason)
+                    yield ("done", step_id, results[step_id])
+                else:
+                    with lock:
+                        # Queued until a worker picks it up; the timeout starts then
+                        running[step_id] = None
+                    pool.submit(run_step, step)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(steps) or 1)), thread_name_prefix="workflow")
+    try:
+        yield from ready()
+        while waiting or running:
+            try:
+                kind, step_id, payload = events.get(timeout=0.5)
+            except queue.Empty:
+                # Backstop for executors that can't be interrupted, as in run_diagnostics
+                now = clock()
+                with lock:
+                    overdue = [step_id for step_id, started in running.items()
+                               if started is not None and now - started > timeout + TIMEOUT_GRACE]
+                for step_id in overdue:
+                    kind, payload = "done", dict(_skipped(by_id[step_id], host, f"No result within {timeout:g}s"),
+                                                 status="timeout", elapsed=round(now - running[step_id], 3))
+                    events.put((kind, step_id, payload))
+                continue
+            if step_id in results:
+                continue
+            if kind == "done":
+                with lock:
+                    running.pop(step_id, None)
+                results[step_id] = payload
+                if stopped_by is None and payload["status"] in _statuses(by_id[step_id].get("stop_if", ())):
+                    stopped_by = step_id
+            yield (kind, step_id, payload)
+            if kind == "done":
+                yield from ready()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def build_summary_prompt(workflow, steps, results):
+    sections = []
+    for step in steps:
+        result = results.get(step["id"])
+        if result is None or result["status"] == "skipped":
+            continue
+        output = result["output"].strip() or result["error"] or "(no output)"
+        if len(output) > SUMMARY_OUTPUT_CHARS:
+            # The end of a command's output usually holds its verdict
+            output = "...\n" + output[-SUMMARY_OUTPUT_CHARS:]
+        sections.append(f"## {step['description']} ({step['command']}) - {result['status']}, "
+                        f"{result['elapsed']:.1f}s\n{output}")
+    return SUMMARY_PROMPT_TEMPLATE.format(workflow=workflow, steps="\n\n".join(sections))
+
+
+def estimate_summary_tokens(prompt):
+    # Same rough budget as command_assistant.estimate_tokens
+    return len(prompt) // 4 + SUMMARY_MAX_OUTPUT_TOKENS
+
+
+def summarize_workflow(model, workflow, steps, results):
+    """Asks the model for one summary of every step's output."""
+    prompt = build_summary_prompt(workflow, steps, results)
+    response = model.start_chat().send_message(prompt)
+    return response.text.strip()